@@ -1,20 +1,71 @@
+import threading
+from datetime import datetime, timedelta, timezone
 import boto3
+from app.scheduler import scheduler
 
-def get_assumed_clients(role_arn, region):
-    sts = boto3.client('sts')
+SERVICES = ['ec2', 'cloudwatch', 's3', 'rds', 'lambda', 'cloudformation', 'ce', 'cloudtrail']
+# Refresh assumed-role credentials this long before they expire
+CREDENTIAL_REFRESH_MARGIN = timedelta(minutes=5)
+
+_credentials = {}
+_clients = {}
+_lock = threading.Lock()
+# boto3's default session is not thread-safe and clients are created from scheduler worker threads,
+# so every client comes from this one session and only while holding _lock
+_session = None
+_sts = None
+
+
+def _new_client(service, **kwargs):
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session.client(service, **kwargs)
+
+
+def get_role_credentials(role_arn):
+    global _sts
+    with _lock:
+        creds = _credentials.get(role_arn)
+        if creds and creds['Expiration'] - CREDENTIAL_REFRESH_MARGIN > datetime.now(timezone.utc):
+            return creds
+        if _sts is None:
+            _sts = _new_client('sts')
+        sts = _sts
+    # Clients themselves are thread-safe, only their creation needs the lock
     assumed = sts.assume_role(
         RoleArn=role_arn,
         RoleSessionName="DiscordBotSession"
     )
     creds = assumed['Credentials']
-    services = ['ec2', 'cloudwatch', 's3', 'rds', 'lambda', 'cloudformation', 'ce']
+    with _lock:
+        _credentials[role_arn] = creds
+        for key in [k for k in _clients if k[0] == role_arn]:
+            del _clients[key]
+    return creds
+
+def get_assumed_client(role_arn, region, service):
+    creds = get_role_credentials(role_arn)
+    key = (role_arn, region, service)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _new_client(
+                service,
+                region_name=region,
+                aws_access_key_id=creds['AccessKeyId'],
+                aws_secret_access_key=creds['SecretAccessKey'],
+                aws_session_token=creds['SessionToken']
+            )
+            _clients[key] = client
+    return client
+
+def get_assumed_clients(role_arn, region):
     return {
-        'cf' if svc == 'cloudformation' else svc: boto3.client(
-            svc,
-            region_name=region,
-            aws_access_key_id=creds['AccessKeyId'],
-            aws_secret_access_key=creds['SecretAccessKey'],
-            aws_session_token=creds['SessionToken']
-        )
-        for svc in services
+        'cf' if svc == 'cloudformation' else svc: get_assumed_client(role_arn, region, svc)
+        for svc in SERVICES
     }
+
+async def run_aws(func, *args, **kwargs):
+    # Priority and fairness key come from the caller's context, see app.scheduler.aws_work
+    return await scheduler.submit(func, args, kwargs)
@@ -0,0 +1,165 @@
+import asyncio
+import time
+import discord
+from app.aws_clients import run_aws
+from app.discord_output import output
+
+EC2_BATCH_SIZE = 50
+RDS_CONCURRENCY = 5
+POLL_INITIAL_DELAY = 5
+POLL_MAX_DELAY = 30
+POLL_BACKOFF = 1.5
+# Interaction tokens expire after 15 minutes, stop polling a little before that
+POLL_TIMEOUT = 14 * 60
+
+EC2_TARGET_STATES = {'start': 'running', 'stop': 'stopped'}
+# Only these states accept the call, one instance in any other state fails the whole batch
+EC2_ACTIONABLE_STATES = {'start': 'stopped', 'stop': 'running'}
+# Already on the way to the target, tracked but not called again
+EC2_TRANSITION_STATES = {'start': 'pending', 'stop': 'stopping'}
+RDS_TARGET_STATES = {'start': 'available', 'stop': 'stopped'}
+# start_db_instance only accepts stopped instances and stop_db_instance only available ones
+RDS_ACTIONABLE_STATES = {'start': 'stopped', 'stop': 'available'}
+# States that end in the target on their own, waited on rather than called again
+RDS_TRANSITION_STATES = {
+    'start': (
+        'starting', 'configuring-enhanced-monitoring', 'configuring-iam-database-auth', 'configuring-log-exports',
+        'backing-up', 'modifying', 'rebooting', 'upgrading', 'maintenance', 'storage-optimization',
+    ),
+    'stop': ('stopping',),
+}
+
+
+def parse_names(names):
+    if not names:
+        return []
+    return [n.strip() for n in names.split(',') if n.strip()]
+
+def parse_tags(tags):
+    selectors = {}
+    if not tags:
+        return selectors
+    for pair in tags.replace(',', ' ').split():
+        if '=' not in pair:
+            raise ValueError(f"Invalid tag selector `{pair}`, expected `key=value`.")
+        key, value = pair.split('=', 1)
+        selectors.setdefault(key, []).append(value)
+    return selectors
+
+def resolve_ec2_instances(ec2, names, tags):
+    filters = [{'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}]
+    if names:
+        filters.append({'Name': 'tag:Name', 'Values': names})
+    for key, values in tags.items():
+        filters.append({'Name': f'tag:{key}', 'Values': values})
+    instances = {}
+    for page in ec2.get_paginator('describe_instances').paginate(Filters=filters):
+        for r in page['Reservations']:
+            for i in r['Instances']:
+                name = next((t['Value'] for t in i.get('Tags', []) if t['Key'] == 'Name'), i['InstanceId'])
+                instances[i['InstanceId']] = {'name': name, 'state': i['State']['Name']}
+    return instances
+
+def ec2_power(ec2, instance_ids, action):
+    call = ec2.start_instances if action == 'start' else ec2.stop_instances
+    errors = {}
+    for i in range(0, len(instance_ids), EC2_BATCH_SIZE):
+        batch = instance_ids[i:i + EC2_BATCH_SIZE]
+        try:
+            call(InstanceIds=batch)
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'IncorrectInstanceState':
+                errors.update((instance_id, e) for instance_id in batch)
+                continue
+            # An instance changed state since it was listed, retry one at a time so only that one fails
+            for instance_id in batch:
+                try:
+                    call(InstanceIds=[instance_id])
+                except Exception as e:
+                    errors[instance_id] = e
+    return errors
+
+def ec2_states(ec2, instance_ids):
+    states = {}
+    for page in ec2.get_paginator('describe_instances').paginate(InstanceIds=instance_ids):
+        for r in page['Reservations']:
+            for i in r['Instances']:
+                states[i['InstanceId']] = i['State']['Name']
+    return states
+
+def resolve_rds_instances(rds, names, tags):
+    kwargs = {}
+    if names:
+        kwargs['Filters'] = [{'Name': 'db-instance-id', 'Values': names}]
+    instances = {}
+    for page in rds.get_paginator('describe_db_instances').paginate(**kwargs):
+        for db in page['DBInstances']:
+            db_tags = {t['Key']: t['Value'] for t in db.get('TagList', [])}
+            if any(db_tags.get(key) not in values for key, values in tags.items()):
+                continue
+            instances[db['DBInstanceIdentifier']] = {'name': db['DBInstanceIdentifier'], 'state': db['DBInstanceStatus']}
+    return instances
+
+async def rds_power(rds, db_ids, action, limit=RDS_CONCURRENCY):
+    call = rds.start_db_instance if action == 'start' else rds.stop_db_instance
+    semaphore = asyncio.Semaphore(limit)
+    errors = {}
+
+    async def run(db_id):
+        async with semaphore:
+            try:
+                await run_aws(call, DBInstanceIdentifier=db_id)
+            except Exception as e:
+                errors[db_id] = e
+
+    await asyncio.gather(*(run(db_id) for db_id in db_ids))
+    return errors
+
+def rds_states(rds, db_ids):
+    states = {}
+    paginator = rds.get_paginator('describe_db_instances')
+    for page in paginator.paginate(Filters=[{'Name': 'db-instance-id', 'Values': db_ids}]):
+        for db in page['DBInstances']:
+            states[db['DBInstanceIdentifier']] = db['DBInstanceStatus']
+    return states
+
+def build_progress_embed(title, resources, target_state, finished=False):
+    done = sum(1 for r in resources.values() if r['state'] == target_state)
+    if finished and done == len(resources):
+        color = discord.Color.green()
+    elif finished:
+        color = discord.Color.orange()
+    else:
+        color = discord.Color.blurple()
+    embed = discord.Embed(title=title, description=f"**{done}/{len(resources)}** reached `{target_state}`", color=color)
+    lines = [
+        f"{'✅' if r['state'] == target_state else '⏳'} `{r['name']}` **{r['state']}**"
+        for r in resources.values()
+    ]
+    value = ""
+    for line in lines:
+        if len(value) + len(line) + 1 > 1000:
+            value += "\n..."
+            break
+        value = f"{value}\n{line}" if value else line
+    embed.add_field(name="Resources", value=value or "None", inline=False)
+    return embed
+
+async def wait_for_states(interaction, message, title, resources, target_state, fetch_states):
+    delay = POLL_INITIAL_DELAY
+    deadline = time.monotonic() + POLL_TIMEOUT
+    while True:
+        pending = [rid for rid, r in resources.items() if r['state'] != target_state]
+        if not pending or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+        states = await run_aws(fetch_states, pending)
+        changed = False
+        for rid, state in states.items():
+            if resources[rid]['state'] != state:
+                resources[rid]['state'] = state
+                changed = True
+        if changed:
+            output.edit_followup(interaction, message, embed=build_progress_embed(title, resources, target_state))
+    await output.edit_followup(interaction, message, embed=build_progress_embed(title, resources, target_state, finished=True))
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+import discord
+from app.aws_clients import run_aws
+from app.discord_output import output
+
+POLL_MIN_INTERVAL = 3
+POLL_MAX_INTERVAL = 30
+POLL_BACKOFF = 1.5
+WATCH_TIMEOUT = 2 * 60 * 60
+EVENTS_SHOWN = 15
+
+ACTIVE_STATUSES = [
+    'CREATE_IN_PROGRESS', 'CREATE_FAILED', 'CREATE_COMPLETE',
+    'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED', 'ROLLBACK_COMPLETE',
+    'DELETE_IN_PROGRESS', 'DELETE_FAILED',
+    'UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_COMPLETE',
+    'UPDATE_FAILED', 'UPDATE_ROLLBACK_IN_PROGRESS', 'UPDATE_ROLLBACK_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
+    'REVIEW_IN_PROGRESS', 'IMPORT_IN_PROGRESS', 'IMPORT_COMPLETE',
+    'IMPORT_ROLLBACK_IN_PROGRESS', 'IMPORT_ROLLBACK_FAILED', 'IMPORT_ROLLBACK_COMPLETE',
+]
+STATUS_FILTERS = {
+    'all': ACTIVE_STATUSES,
+    'in_progress': [s for s in ACTIVE_STATUSES if s.endswith('IN_PROGRESS')],
+    'failed': [s for s in ACTIVE_STATUSES if s.endswith('FAILED') or s.endswith('ROLLBACK_COMPLETE')],
+    'complete': [s for s in ACTIVE_STATUSES if s.endswith('COMPLETE') and 'ROLLBACK' not in s],
+    'deleted': ['DELETE_COMPLETE'],
+}
+
+
+def iter_stack_summaries(cf, status='all'):
+    paginator = cf.get_paginator('list_stacks')
+    for page in paginator.paginate(StackStatusFilter=STATUS_FILTERS[status]):
+        yield from page.get('StackSummaries', [])
+
+def list_stack_summaries(cf, status='all'):
+    return sorted(iter_stack_summaries(cf, status), key=lambda s: s.get('LastUpdatedTime') or s['CreationTime'], reverse=True)
+
+def stack_name_suggestions(cf, prefix, limit=25):
+    # One page only, autocomplete has to answer within Discord's 3 seconds
+    page = cf.list_stacks(StackStatusFilter=STATUS_FILTERS['all'])
+    prefix = prefix.lower()
+    names = [s['StackName'] for s in page.get('StackSummaries', []) if s['StackName'].lower().startswith(prefix)]
+    return sorted(names)[:limit]
+
+def is_stack_event(event, stack_name, stack_id=None):
+    if event['ResourceType'] != 'AWS::CloudFormation::Stack':
+        return False
+    return event['LogicalResourceId'] == stack_name or (stack_id is not None and event.get('PhysicalResourceId') == stack_id)
+
+def is_terminal(status):
+    return not status.endswith('IN_PROGRESS')
+
+
+class StackEventTail:
+    def __init__(self, cf, stack_name, stack_id=None, stack_status=None):
+        self.cf = cf
+        self.stack_name = stack_name
+        self.stack_id = stack_id
+        self.last_event_id = None
+        self.stack_status = stack_status
+
+    def poll(self):
+        # Events come newest first, page only until the cursor is reached
+        new_events = []
+        kwargs = {'StackName': self.stack_id or self.stack_name}
+        while True:
+            response = self.cf.describe_stack_events(**kwargs)
+            page = response.get('StackEvents', [])
+            for event in page:
+                if event['EventId'] == self.last_event_id:
+                    break
+                new_events.append(event)
+            else:
+                if response.get('NextToken') and self.last_event_id is not None:
+                    kwargs['NextToken'] = response['NextToken']
+                    continue
+            break
+        if new_events:
+            self.last_event_id = new_events[0]['EventId']
+        new_events.reverse()
+        for event in new_events:
+            if is_stack_event(event, self.stack_name, self.stack_id):
+                self.stack_status = event['ResourceStatus']
+        return new_events
+
+
+def format_event(event):
+    reason = event.get('ResourceStatusReason')
+    line = f"`{event['Timestamp'].strftime('%H:%M:%S')}` **{event['ResourceStatus']}** `{event['LogicalResourceId']}`"
+    if reason and 'FAILED' in event['ResourceStatus']:
+        line += f"\n> {reason[:150]}"
+    return line
+
+def build_watch_embed(stack_name, status, events, finished=False):
+    if status and ('FAILED' in status or 'ROLLBACK' in status):
+        color = discord.Color.red()
+    elif finished:
+        color = discord.Color.green()
+    else:
+        color = discord.Color.teal()
+    embed = discord.Embed(
+        title=f" Watching `{stack_name}`" + (" (done)" if finished else ""),
+        description=f"Status: **{status or 'unknown'}**",
+        color=color
+    )
+    value = ""
+    for line in reversed(events):
+        if len(value) + len(line) + 1 > 1024:
+            break
+        value = f"{line}\n{value}" if value else line
+    embed.add_field(name="Recent Events", value=value or "No events yet.", inline=False)
+    return embed
+
+async def watch_stack(cf, stack, message):
+    # stack: the describe_stacks entry, its name and id are canonical whatever the user typed
+    stack_name = stack['StackName']
+    tail = StackEventTail(cf, stack_name, stack['StackId'], stack['StackStatus'])
+    recent = deque(maxlen=EVENTS_SHOWN)
+    # The first poll only reads the latest page to seed the cursor and context
+    recent.extend(format_event(e) for e in await run_aws(tail.poll))
+    output.edit(message, embed=build_watch_embed(stack_name, tail.stack_status, recent))
+    interval = POLL_MIN_INTERVAL
+    deadline = time.monotonic() + WATCH_TIMEOUT
+    while time.monotonic() < deadline and not (tail.stack_status and is_terminal(tail.stack_status)):
+        await asyncio.sleep(interval)
+        events = await run_aws(tail.poll)
+        if events:
+            recent.extend(format_event(e) for e in events)
+            interval = POLL_MIN_INTERVAL
+            # Not awaited: the pipeline paces edits and folds queued ones into the latest
+            output.edit(message, embed=build_watch_embed(stack_name, tail.stack_status, recent))
+        else:
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+    await output.edit(message, embed=build_watch_embed(stack_name, tail.stack_status, recent, finished=True))
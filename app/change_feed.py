@@ -0,0 +1,199 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+MIN_INTERVAL = 60
+MAX_INTERVAL = 15 * 60
+BACKOFF = 1.5
+# Every section is re-listed at least this often, whatever the change signals say
+FULL_SYNC_SECONDS = 30 * 60
+# CloudTrail and RDS events can be delivered minutes late, each check looks back this far
+EVENT_LAG = timedelta(minutes=15)
+# A busier trail than this is not worth paging through, its sections are simply re-listed
+MAX_TRAIL_PAGES = 5
+
+SECTION_LABELS = {
+    'ec2': '🖥️ EC2',
+    'ebs': '💾 EBS',
+    'cf': '📚 Stack',
+    'rds': '🗄️ RDS',
+}
+
+
+# CloudTrail write calls and the sections whose listing they change
+EC2_EVENT_SECTIONS = {
+    'RunInstances': ('ec2', 'ebs'),
+    'TerminateInstances': ('ec2', 'ebs'),
+    'StartInstances': ('ec2',),
+    'StopInstances': ('ec2',),
+    'CreateTags': ('ec2',),
+    'DeleteTags': ('ec2',),
+    'CreateVolume': ('ebs',),
+    'DeleteVolume': ('ebs',),
+    'AttachVolume': ('ebs',),
+    'DetachVolume': ('ebs',),
+}
+TRAIL_SECTIONS = {'ec2', 'ebs', 'cf'}
+RDS_SETTLED = {'available', 'stopped', 'failed', 'storage-full'}
+
+
+def is_unsettled(section, state):
+    # These finish without another API call, so no event announces the end state
+    if section == 'ec2':
+        return state in ('pending', 'stopping', 'shutting-down')
+    if section == 'ebs':
+        return state.split(':', 1)[0] in ('creating', 'deleting')
+    if section == 'cf':
+        return state.endswith('IN_PROGRESS')
+    return state not in RDS_SETTLED and not state.startswith('incompatible')
+
+def trail_signals(clients, since, stale):
+    kwargs = {
+        'LookupAttributes': [{'AttributeKey': 'ReadOnly', 'AttributeValue': 'false'}],
+        'StartTime': since,
+    }
+    for _ in range(MAX_TRAIL_PAGES):
+        response = clients['cloudtrail'].lookup_events(**kwargs)
+        for event in response.get('Events', []):
+            if event.get('EventSource') == 'cloudformation.amazonaws.com':
+                yield event['EventId'], ('cf',)
+            elif event.get('EventSource') == 'ec2.amazonaws.com' and event['EventName'] in EC2_EVENT_SECTIONS:
+                yield event['EventId'], EC2_EVENT_SECTIONS[event['EventName']]
+        if TRAIL_SECTIONS <= stale or not response.get('NextToken'):
+            return
+        kwargs['NextToken'] = response['NextToken']
+    yield None, tuple(TRAIL_SECTIONS)
+
+def rds_signals(clients, since, stale):
+    kwargs = {'SourceType': 'db-instance', 'StartTime': since}
+    while True:
+        response = clients['rds'].describe_events(**kwargs)
+        for event in response.get('Events', []):
+            yield f"{event['SourceIdentifier']}:{event['Date'].isoformat()}:{event.get('Message', '')}", ('rds',)
+        if 'rds' in stale or not response.get('Marker'):
+            return
+        kwargs['Marker'] = response['Marker']
+
+SIGNALS = [(trail_signals, TRAIL_SECTIONS), (rds_signals, {'rds'})]
+
+
+def collect_snapshot(clients, wanted=tuple(SECTION_LABELS)):
+    # {section: {resource id: state}} plus display names, only the sections asked for are listed
+    sections = {section: {} for section in wanted}
+    names = {}
+    if 'ec2' in sections:
+        for page in clients['ec2'].get_paginator('describe_instances').paginate():
+            for r in page['Reservations']:
+                for i in r['Instances']:
+                    sections['ec2'][i['InstanceId']] = i['State']['Name']
+                    name = next((t['Value'] for t in i.get('Tags', []) if t['Key'] == 'Name'), None)
+                    if name:
+                        names[i['InstanceId']] = name
+    if 'ebs' in sections:
+        for page in clients['ec2'].get_paginator('describe_volumes').paginate():
+            for v in page['Volumes']:
+                attachments = v.get('Attachments', [])
+                sections['ebs'][v['VolumeId']] = f"{v['State']}:{attachments[0]['InstanceId']}" if attachments else v['State']
+    if 'cf' in sections:
+        for page in clients['cf'].get_paginator('list_stacks').paginate():
+            for s in page['StackSummaries']:
+                if s['StackStatus'] != 'DELETE_COMPLETE':
+                    sections['cf'][s['StackName']] = s['StackStatus']
+    if 'rds' in sections:
+        for page in clients['rds'].get_paginator('describe_db_instances').paginate():
+            for db in page['DBInstances']:
+                sections['rds'][db['DBInstanceIdentifier']] = db['DBInstanceStatus']
+    return sections, names
+
+def diff_section(old, new):
+    changes = []
+    for rid, state in new.items():
+        previous = old.get(rid)
+        if previous != state:
+            changes.append((rid, previous, state))
+    for rid, previous in old.items():
+        if rid not in new:
+            changes.append((rid, previous, None))
+    return changes
+
+
+class AccountWatcher:
+    def __init__(self, role_arn, region):
+        self.role_arn = role_arn
+        self.region = region
+        self.sections = None
+        self.names = {}
+        self.unsettled = set()
+        # event id -> when it was first seen, so the overlapping look-back does not re-list for it again
+        self.seen = {}
+        self.checked_at = None
+        self.synced_at = None
+        self.interval = MIN_INTERVAL
+        self.next_poll = 0
+        self.subscribers = set()
+
+    def due(self, now=None):
+        return (now or time.monotonic()) >= self.next_poll
+
+    def backoff(self):
+        self.interval = min(self.interval * BACKOFF, MAX_INTERVAL)
+        self.next_poll = time.monotonic() + self.interval
+
+    def plan(self, clients, now=None):
+        # Which sections to re-list: all of them on a full sync, otherwise only those a change signal points at.
+        # An unchanged, settled account costs one CloudTrail and one RDS events call.
+        now = now or datetime.now(timezone.utc)
+        plan = {'checked_at': now, 'seen': {}, 'full': False}
+        if self.sections is None or now - self.synced_at >= timedelta(seconds=FULL_SYNC_SECONDS):
+            plan.update(sections=set(SECTION_LABELS), full=True)
+            return plan
+        stale = set(self.unsettled)
+        since = self.checked_at - EVENT_LAG
+        for signal, covers in SIGNALS:
+            try:
+                for event_id, sections in signal(clients, since, stale):
+                    if event_id is None or event_id not in self.seen:
+                        stale.update(sections)
+                        if event_id is not None:
+                            plan['seen'][event_id] = now
+            except Exception:
+                # No permission for the signal (or it failed): fall back to listing what it covers
+                stale.update(covers)
+        plan['sections'] = stale
+        return plan
+
+    def apply(self, plan, sections, names):
+        # Only re-listed sections are diffed, the others are known unchanged
+        changes = []
+        first = self.sections is None
+        if first:
+            self.sections = {}
+        for section, states in sections.items():
+            if not first:
+                changes.extend((section, *c) for c in diff_section(self.sections.get(section, {}), states))
+            self.sections[section] = states
+            if any(is_unsettled(section, state) for state in states.values()):
+                self.unsettled.add(section)
+            else:
+                self.unsettled.discard(section)
+        self.names.update(names)
+        now = plan['checked_at']
+        self.seen.update(plan['seen'])
+        for event_id in [e for e, seen_at in self.seen.items() if now - seen_at > EVENT_LAG * 2]:
+            del self.seen[event_id]
+        self.checked_at = now
+        if plan['full']:
+            self.synced_at = now
+        if changes or self.unsettled:
+            self.interval = MIN_INTERVAL
+            self.next_poll = time.monotonic() + self.interval
+        else:
+            self.backoff()
+        return changes
+
+    def format_change(self, section, rid, old, new):
+        label = f"{self.names[rid]} ({rid})" if rid in self.names else rid
+        if old is None:
+            return f"{SECTION_LABELS[section]} `{label}` appeared: **{new}**"
+        if new is None:
+            return f"{SECTION_LABELS[section]} `{label}` is gone (was {old})"
+        return f"{SECTION_LABELS[section]} `{label}` {old} → **{new}**"
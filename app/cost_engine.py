@@ -0,0 +1,206 @@
+import calendar
+import json
+import math
+import os
+import pathlib
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+HISTORY_DIR = pathlib.Path("cost_history")
+BACKFILL_DAYS = 60
+# Cost Explorer keeps revising the most recent days, re-fetch them on every update
+SETTLE_DAYS = 2
+EWMA_SPAN = 14
+ALPHA = 2 / (EWMA_SPAN + 1)
+WARMUP_DAYS = 7
+Z_THRESHOLD = 3.0
+MIN_JUMP = 5.0
+MIN_STD = 1.0
+# Readers that do not run their own schedule (the digest) refetch a series older than this
+FETCH_MAX_AGE = 60 * 60
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def account_id(role_arn):
+    parts = role_arn.split(':')
+    return parts[4] if len(parts) > 4 else role_arn
+
+
+class CostEngine:
+    def __init__(self, account):
+        self.account = account
+        self.path = HISTORY_DIR / f"{account}.json"
+        self.lock = threading.Lock()
+        # Daily series: {"YYYY-MM-DD": {service: amount}}
+        self.days = {}
+        # Per-service EWMA state as of the last scored (settled) day
+        self.baselines = {}
+        self.scored_through = None
+        self.anomalies = []
+        # subscriber (e.g. guild id) -> last anomaly date it was told about, the engine is shared per account
+        self.announced = {}
+        self.fetched_at = None
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.days = data['days']
+            self.baselines = data['baselines']
+            self.scored_through = data['scored_through']
+            self.anomalies = data['anomalies']
+            self.announced = data.get('announced', {})
+            self.fetched_at = data.get('fetched_at')
+
+    def save(self):
+        HISTORY_DIR.mkdir(exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                'days': self.days,
+                'baselines': self.baselines,
+                'scored_through': self.scored_through,
+                'anomalies': self.anomalies[-200:],
+                'announced': self.announced,
+                'fetched_at': self.fetched_at,
+            }, f)
+        os.replace(tmp, self.path)
+
+    def fetch(self, ce, today=None):
+        today = today or datetime.utcnow().date()
+        if self.days:
+            start = date.fromisoformat(max(self.days)) - timedelta(days=SETTLE_DAYS)
+        else:
+            start = today - timedelta(days=BACKFILL_DAYS)
+        if start >= today:
+            return
+        kwargs = {
+            'TimePeriod': {'Start': start.isoformat(), 'End': today.isoformat()},
+            'Granularity': 'DAILY',
+            'Metrics': ['UnblendedCost'],
+            'GroupBy': [{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
+        }
+        while True:
+            response = ce.get_cost_and_usage(**kwargs)
+            for result in response['ResultsByTime']:
+                self.days[result['TimePeriod']['Start']] = {
+                    g['Keys'][0]: float(g['Metrics']['UnblendedCost']['Amount'])
+                    for g in result.get('Groups', [])
+                }
+            if not response.get('NextPageToken'):
+                break
+            kwargs['NextPageToken'] = response['NextPageToken']
+        cutoff = (today - timedelta(days=BACKFILL_DAYS + 31)).isoformat()
+        for day in [d for d in self.days if d < cutoff]:
+            del self.days[day]
+
+    def score(self, today=None):
+        # Only settled days are scored, each day exactly once, so the baselines never need recomputing
+        today = today or datetime.utcnow().date()
+        settled = (today - timedelta(days=SETTLE_DAYS)).isoformat()
+        new_anomalies = []
+        for day in sorted(d for d in self.days if d <= settled and (self.scored_through is None or d > self.scored_through)):
+            costs = self.days[day]
+            for service in set(costs) | set(self.baselines):
+                value = costs.get(service, 0.0)
+                state = self.baselines.get(service)
+                if state is None:
+                    self.baselines[service] = {'mean': value, 'var': 0.0, 'n': 1}
+                    continue
+                std = max(math.sqrt(state['var']), MIN_STD)
+                z = (value - state['mean']) / std
+                jump = value - state['mean']
+                if state['n'] >= WARMUP_DAYS and z >= Z_THRESHOLD and jump >= MIN_JUMP:
+                    anomaly = {
+                        'date': day, 'service': service, 'cost': round(value, 2),
+                        'baseline': round(state['mean'], 2), 'jump': round(jump, 2), 'z': round(z, 1),
+                    }
+                    new_anomalies.append(anomaly)
+                diff = value - state['mean']
+                incr = ALPHA * diff
+                state['mean'] += incr
+                state['var'] = (1 - ALPHA) * (state['var'] + diff * incr)
+                state['n'] += 1
+            self.scored_through = day
+        self.anomalies.extend(new_anomalies)
+        return new_anomalies
+
+    def update(self, ce, today=None):
+        with self.lock:
+            self._update(ce, today)
+
+    def refresh(self, ce, max_age=FETCH_MAX_AGE, today=None):
+        # Updates only when the stored series is missing or stale, otherwise another caller kept it current
+        with self.lock:
+            if self.days and self.fetched_at and time.time() - self.fetched_at < max_age:
+                return
+            self._update(ce, today)
+
+    def _update(self, ce, today):
+        self.fetch(ce, today)
+        self.score(today)
+        self.fetched_at = time.time()
+        self.save()
+
+    def has_data(self):
+        with self.lock:
+            return bool(self.days)
+
+    def unannounced(self, subscriber, today=None):
+        # Anomalies this subscriber has not been told about yet, and the date to mark once they are posted.
+        # A new subscriber starts from the most recently scored days instead of the whole history.
+        today = today or datetime.utcnow().date()
+        with self.lock:
+            since = self.announced.get(subscriber) or (today - timedelta(days=SETTLE_DAYS + 1)).isoformat()
+            anomalies = [a for a in self.anomalies if a['date'] > since]
+            return anomalies, max(since, self.scored_through or since)
+
+    def mark_announced(self, subscriber, through):
+        with self.lock:
+            if through > self.announced.get(subscriber, ''):
+                self.announced[subscriber] = through
+                self.save()
+
+    def month_to_date(self, today=None):
+        today = today or datetime.utcnow().date()
+        with self.lock:
+            return month_totals(self.days, today.strftime('%Y-%m'))
+
+    def forecast(self, today=None):
+        # Month-to-date actuals plus each service's EWMA daily baseline for the remaining days
+        today = today or datetime.utcnow().date()
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        month = today.strftime('%Y-%m')
+        with self.lock:
+            remaining = days_in_month - sum(1 for d in self.days if d.startswith(month))
+            actual = month_totals(self.days, month)
+            projected = dict(actual)
+            for service, state in self.baselines.items():
+                projected[service] = projected.get(service, 0.0) + state['mean'] * remaining
+        return sum(actual.values()), sum(projected.values()), projected
+
+    def recent_anomalies(self, days=7, today=None):
+        today = today or datetime.utcnow().date()
+        since = (today - timedelta(days=days)).isoformat()
+        with self.lock:
+            return [a for a in self.anomalies if a['date'] >= since]
+
+
+def month_totals(days, month):
+    totals = {}
+    for day, costs in days.items():
+        if day.startswith(month):
+            for service, amount in costs.items():
+                totals[service] = totals.get(service, 0.0) + amount
+    return totals
+
+
+def get_cost_engine(role_arn):
+    account = account_id(role_arn)
+    with _engines_lock:
+        engine = _engines.get(account)
+        if engine is None:
+            engine = CostEngine(account)
+            _engines[account] = engine
+    return engine
@@ -1,15 +1,15 @@
+import asyncio
 import discord
 from functools import wraps
-from app.utils import load_roles
+from app.utils import get_guild_auth
+from app.scheduler import AUTOCOMPLETE, DEADLINES, INTERACTIVE, aws_work
 
 def admin_only():
     def decorator(func):
         @wraps(func)
         async def wrapper(interaction: discord.Interaction, *args, **kwargs):
-            roles = load_roles()
-            guild_id = str(interaction.guild_id)
-            admin_role_id = roles.get(guild_id, {}).get("admin_role_id")
-            if not admin_role_id:
+            auth = get_guild_auth(interaction.guild)
+            if not auth.admin_role_ids:
                 await interaction.response.send_message(
                     embed=discord.Embed(
                         description=" Admin role not configured yet.",
@@ -18,8 +18,7 @@ def admin_only():
                     ephemeral=True
                 )
                 return
-            role = discord.utils.get(interaction.guild.roles, id=int(admin_role_id))
-            if role not in interaction.user.roles:
+            if not any(r.id in auth.admin_role_ids for r in interaction.user.roles):
                 await interaction.response.send_message(
                     embed=discord.Embed(
                         description="🚫 Access denied. You are not authorized to execute this command.",
@@ -36,17 +35,34 @@ def allowed_channel_only():
     def decorator(func):
         @wraps(func)
         async def wrapper(interaction: discord.Interaction, *args, **kwargs):
-            guild_id = str(interaction.guild_id)
-            channel_id = str(interaction.channel_id)
-            roles = load_roles()
-            allowed = roles.get(guild_id, {}).get("designated_channel")
-            if str(channel_id) != allowed:
+            auth = get_guild_auth(interaction.guild)
+            if interaction.channel_id != auth.channel_id:
                 await interaction.response.send_message(
                     embed=discord.Embed(
                         description="⚠️ Please use Cloud Commander in the designated channel only.",
                         color=discord.Color.orange()
                     ), ephemeral=True)
                 return
-            await func(interaction, *args, **kwargs)
+            # AWS work started by this command is queued as interactive and shared fairly per guild
+            with aws_work(INTERACTIVE, interaction.guild_id):
+                await func(interaction, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def autocomplete_handler():
+    # Suggestions only for admins in the designated channel, AWS work jumps ahead of commands.
+    # Discord drops answers after 3 seconds, so a shed, slow or failed lookup shows no suggestions instead.
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(ctx: discord.AutocompleteContext):
+            interaction = ctx.interaction
+            auth = get_guild_auth(interaction.guild)
+            if interaction.channel_id != auth.channel_id or not any(r.id in auth.admin_role_ids for r in interaction.user.roles):
+                return []
+            try:
+                with aws_work(AUTOCOMPLETE, interaction.guild_id):
+                    return await asyncio.wait_for(func(ctx), DEADLINES[AUTOCOMPLETE])
+            except Exception:
+                return []
         return wrapper
     return decorator
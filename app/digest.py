@@ -0,0 +1,201 @@
+import time
+from datetime import datetime, timedelta, timezone
+import discord
+from app.utils import format_aws_error
+from app.cost_engine import SETTLE_DAYS, get_cost_engine
+from app.cf_watch import list_stack_summaries
+from app.ebs_report import build_ebs_report, index_instances
+from app.lambda_fleet import list_all_functions, update_config_cache, fetch_fleet_metrics, build_fleet
+
+# Reports are built this long before the first guild's scheduled time
+PRECOMPUTE_LEAD = timedelta(minutes=30)
+# A report built for one guild is reused by any other guild on the same account within this age
+REPORT_MAX_AGE = 45 * 60
+TOP_N = 5
+INSTANCES_PER_CALL = 500
+
+
+def parse_digest_time(value):
+    try:
+        hour, minute = (int(p) for p in value.strip().split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid time `{value}`, expected `HH:MM` (UTC).")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time `{value}`, expected `HH:MM` (UTC).")
+    return hour, minute
+
+def next_run(hour, minute, now=None):
+    now = now or datetime.now(timezone.utc)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+def top_cpu_instances(cloudwatch, instance_ids, n=TOP_N):
+    end = datetime.utcnow().replace(second=0, microsecond=0)
+    start = end - timedelta(days=1)
+    averages = {}
+    for i in range(0, len(instance_ids), INSTANCES_PER_CALL):
+        chunk = instance_ids[i:i + INSTANCES_PER_CALL]
+        queries = [
+            {
+                'Id': f"c{j}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EC2',
+                        'MetricName': 'CPUUtilization',
+                        'Dimensions': [{'Name': 'InstanceId', 'Value': instance_id}]
+                    },
+                    'Period': 86400,
+                    'Stat': 'Average'
+                },
+                'ReturnData': True
+            }
+            for j, instance_id in enumerate(chunk)
+        ]
+        kwargs = {'MetricDataQueries': queries, 'StartTime': start, 'EndTime': end}
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for series in response.get('MetricDataResults', []):
+                values = series.get('Values', [])
+                if values:
+                    averages[chunk[int(series['Id'][1:])]] = sum(values) / len(values)
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+    return sorted(averages.items(), key=lambda i: i[1], reverse=True)[:n]
+
+def instance_name(instance):
+    return next((t['Value'] for t in instance.get('Tags', []) if t['Key'] == 'Name'), instance['InstanceId'])
+
+
+def build_billing(role_arn, region, clients, state):
+    # The engine is shared per account, a series kept current by the hourly alert or /cost-forecast is not refetched
+    engine = get_cost_engine(role_arn)
+    engine.refresh(clients['ce'])
+    if not engine.has_data():
+        return {'available': False}
+    actual, projected, by_service = engine.forecast()
+    return {
+        'available': True,
+        'actual': actual,
+        'projected': projected,
+        'top_services': sorted(by_service.items(), key=lambda i: i[1], reverse=True)[:TOP_N],
+        # Days are scored SETTLE_DAYS after the fact, so the newest anomalies are at least that old
+        'anomalies': engine.recent_anomalies(days=SETTLE_DAYS + 1),
+    }
+
+def build_fleet_health(role_arn, region, clients, state):
+    # The instance listing is shared with the EBS and CPU sections
+    instances = state['instances'] = index_instances(clients['ec2'])
+    states = {}
+    for i in instances.values():
+        name = i['State']['Name']
+        states[name] = states.get(name, 0) + 1
+    functions = list_all_functions(clients['lambda'])
+    update_config_cache(role_arn, region, functions)
+    fleet = []
+    if functions:
+        metrics = fetch_fleet_metrics(clients['cloudwatch'], [f['FunctionName'] for f in functions], timedelta(days=1))
+        fleet = build_fleet(functions, metrics, 'errors')
+    return {
+        'ec2_states': states,
+        'functions': len(fleet),
+        'invocations': sum(f['invocations'] for f in fleet),
+        'errors': sum(f['errors'] for f in fleet),
+        'top_errors': [f for f in fleet[:TOP_N] if f['errors']],
+    }
+
+def build_ebs(role_arn, region, clients, state):
+    report = build_ebs_report(clients['ec2'], clients['cloudwatch'], state.get('instances'))
+    unattached = [c for c in report['candidates'] if c['kind'] == 'unattached']
+    return {
+        'unattached': len(unattached),
+        'unattached_cost': sum(c['savings'] for c in unattached),
+        'top_unattached': [c['volume']['VolumeId'] for c in unattached[:TOP_N]],
+        'total_savings': report['total_savings'],
+    }
+
+def build_failed_stacks(role_arn, region, clients, state):
+    return [
+        {'name': s['StackName'], 'status': s['StackStatus']}
+        for s in list_stack_summaries(clients['cf'], 'failed')
+    ]
+
+def build_top_metrics(role_arn, region, clients, state):
+    instances = state.get('instances')
+    if instances is None:
+        instances = index_instances(clients['ec2'])
+    running = [i for i, data in instances.items() if data['State']['Name'] == 'running']
+    return [
+        {'name': instance_name(instances[i]), 'instance_id': i, 'cpu': cpu}
+        for i, cpu in top_cpu_instances(clients['cloudwatch'], running)
+    ]
+
+# Built in this order, fleet health first so its instance listing is reused
+DIGEST_SECTIONS = [
+    ('billing', build_billing),
+    ('fleet', build_fleet_health),
+    ('ebs', build_ebs),
+    ('failed_stacks', build_failed_stacks),
+    ('top_cpu', build_top_metrics),
+]
+
+
+def build_digest(role_arn, region, clients):
+    # One failing section (e.g. a missing Cost Explorer permission) does not drop the rest of the report
+    report = {'sections': {}, 'errors': {}}
+    state = {}
+    for name, builder in DIGEST_SECTIONS:
+        try:
+            report['sections'][name] = builder(role_arn, region, clients, state)
+        except Exception as e:
+            report['errors'][name] = format_aws_error(e)
+    report['computed_at'] = time.time()
+    return report
+
+def build_digest_embed(report, region):
+    sections = report['sections']
+    computed = datetime.fromtimestamp(report['computed_at'], timezone.utc)
+    embed = discord.Embed(
+        title=" AWS Daily Digest",
+        description=f"Region `{region}`, built {computed.strftime('%Y-%m-%d %H:%M')} UTC",
+        color=discord.Color.blue()
+    )
+    if 'billing' in sections:
+        b = sections['billing']
+        if b['available']:
+            lines = [f"Month to date: **${b['actual']:.2f}**, projected **${b['projected']:.2f}**"]
+            lines += [f"{service}: ${amount:.2f}" for service, amount in b['top_services']]
+            lines += [f"⚠️ **{a['service']}** ${a['cost']:.2f} on {a['date']} (+${a['jump']:.2f})" for a in b['anomalies']]
+        else:
+            lines = ["Billing data unavailable, Cost Explorer returned no cost history for this account yet."]
+        embed.add_field(name="Billing", value="\n".join(lines)[:1024], inline=False)
+    if 'fleet' in sections:
+        f = sections['fleet']
+        states = ", ".join(f"{count} {state}" for state, count in sorted(f['ec2_states'].items())) or "none"
+        lines = [
+            f"EC2: {states}",
+            f"Lambda: {f['functions']} functions, {int(f['invocations']):,} invocations, {int(f['errors']):,} errors",
+        ]
+        lines += [f"`{fn['name']}` {int(fn['errors']):,} errors ({fn['error_rate']:.1%})" for fn in f['top_errors']]
+        embed.add_field(name="Fleet Health", value="\n".join(lines)[:1024], inline=False)
+    if 'ebs' in sections:
+        e = sections['ebs']
+        lines = [
+            f"{e['unattached']} unattached volumes (${e['unattached_cost']:.2f}/month)",
+            f"Total estimated savings: ${e['total_savings']:.2f}/month",
+        ]
+        if e['top_unattached']:
+            lines.append(", ".join(f"`{v}`" for v in e['top_unattached']))
+        embed.add_field(name="EBS", value="\n".join(lines)[:1024], inline=False)
+    if 'failed_stacks' in sections:
+        stacks = sections['failed_stacks']
+        value = "\n".join(f"`{s['name']}`: {s['status']}" for s in stacks[:10]) or "None"
+        if len(stacks) > 10:
+            value += f"\nAnd {len(stacks) - 10} more"
+        embed.add_field(name="Failed Stacks", value=value[:1024], inline=False)
+    if 'top_cpu' in sections:
+        value = "\n".join(f"`{i['name']}` ({i['instance_id']}): {i['cpu']:.1f}%" for i in sections['top_cpu']) or "No running instances"
+        embed.add_field(name="Top EC2 CPU (24h avg)", value=value[:1024], inline=False)
+    for name, error in report['errors'].items():
+        embed.add_field(name=f"{name} unavailable", value=error[:1024], inline=False)
+    return embed
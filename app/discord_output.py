@@ -0,0 +1,228 @@
+import asyncio
+import time
+from collections import deque
+import discord
+
+# Discord embed limits
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 4096
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FIELDS_PER_EMBED = 25
+# Applies to one embed and to the sum of all embeds in one message
+EMBED_TOTAL_LIMIT = 6000
+EMBEDS_PER_MESSAGE = 10
+
+# Pacing per rate-limit bucket: message sends/edits per channel, interaction follow-ups per webhook
+CHANNEL_RATE = (5, 5.0)
+WEBHOOK_RATE = (5, 2.0)
+GLOBAL_RATE = (45, 1.0)
+IDLE_DESTINATION_SECONDS = 60
+
+
+def truncate(text, limit):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def paginate_embeds(title, fields, color, description=None):
+    # fields: [(name, value, inline)], split into as many embeds as the limits require
+    title = truncate(title, TITLE_LIMIT - 10)
+    description = truncate(description, DESCRIPTION_LIMIT) if description else None
+    header = len(title) + 10 + len(description or "")
+    pages = []
+    page = None
+    size = 0
+    for name, value, inline in fields:
+        name = truncate(name, FIELD_NAME_LIMIT) or "\u200b"
+        value = truncate(value, FIELD_VALUE_LIMIT) or "\u200b"
+        if page is None or len(page) >= FIELDS_PER_EMBED or size + len(name) + len(value) > EMBED_TOTAL_LIMIT:
+            page = []
+            pages.append(page)
+            size = header
+        page.append((name, value, inline))
+        size += len(name) + len(value)
+    pages = pages or [[]]
+    embeds = []
+    for i, page in enumerate(pages):
+        page_title = f"{title} ({i + 1}/{len(pages)})" if len(pages) > 1 else title
+        embed = discord.Embed(title=page_title, description=description if i == 0 else None, color=color)
+        for name, value, inline in page:
+            embed.add_field(name=name, value=value, inline=inline)
+        embeds.append(embed)
+    return embeds
+
+def embed_size(embed):
+    size = len(embed.title or "") + len(embed.description or "")
+    size += sum(len(f.name) + len(f.value) for f in embed.fields)
+    if embed.footer and embed.footer.text:
+        size += len(embed.footer.text)
+    return size
+
+def pack_embeds(embeds):
+    # Groups embeds into messages of at most 10 embeds and 6000 characters
+    messages = []
+    current = []
+    size = 0
+    for embed in embeds:
+        length = embed_size(embed)
+        if current and (len(current) >= EMBEDS_PER_MESSAGE or size + length > EMBED_TOTAL_LIMIT):
+            messages.append(current)
+            current = []
+            size = 0
+        current.append(embed)
+        size += length
+    if current:
+        messages.append(current)
+    return messages
+
+
+class RateBucket:
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.sent = deque()
+        self.blocked_until = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            while self.sent and now - self.sent[0] >= self.per:
+                self.sent.popleft()
+            wait = self.blocked_until - now
+            if wait <= 0 and len(self.sent) < self.limit:
+                self.sent.append(now)
+                return
+            if wait <= 0:
+                wait = self.per - (now - self.sent[0])
+            await asyncio.sleep(wait)
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class Destination:
+    def __init__(self, rate):
+        self.bucket = RateBucket(*rate)
+        self.queue = deque()
+        self.worker = None
+        self.last_used = time.monotonic()
+
+
+def _consume(future):
+    # Fire-and-forget edits are never awaited, keep their errors out of the "never retrieved" log
+    if not future.cancelled():
+        future.exception()
+
+def _copy_outcome(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def _retry_after(error, default):
+    headers = getattr(error.response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return default
+
+
+class OutputPipeline:
+    def __init__(self):
+        self.destinations = {}
+        self.pending_edits = {}
+        self.global_bucket = RateBucket(*GLOBAL_RATE)
+
+    def destination(self, key, rate):
+        dest = self.destinations.get(key)
+        if dest is None:
+            now = time.monotonic()
+            for k in [k for k, d in self.destinations.items() if not d.queue and now - d.last_used > IDLE_DESTINATION_SECONDS]:
+                del self.destinations[k]
+            dest = self.destinations[key] = Destination(rate)
+        return dest
+
+    def enqueue(self, key, rate, op):
+        dest = self.destination(key, rate)
+        dest.queue.append(op)
+        if dest.worker is None or dest.worker.done():
+            dest.worker = asyncio.create_task(self.drain(dest))
+        return op['future']
+
+    async def drain(self, dest):
+        while dest.queue:
+            op = dest.queue.popleft()
+            if op['future'].done():
+                continue
+            await dest.bucket.acquire()
+            await self.global_bucket.acquire()
+            # Edits that arrived while waiting for the bucket were merged into this one
+            if op['message_id'] is not None:
+                self.pending_edits.pop(op['message_id'], None)
+            dest.last_used = time.monotonic()
+            try:
+                result = await op['call'](**op['kwargs'])
+            except discord.HTTPException as e:
+                # py-cord retries 429s itself, one reaching here means its retries ran out
+                if e.status == 429 and op['retries'] > 0:
+                    op['retries'] -= 1
+                    dest.bucket.block(_retry_after(e, dest.bucket.per))
+                    self.requeue(dest, op)
+                    continue
+                op['future'].set_exception(e)
+            except Exception as e:
+                op['future'].set_exception(e)
+            else:
+                op['future'].set_result(result)
+
+    def requeue(self, dest, op):
+        message_id = op['message_id']
+        newer = self.pending_edits.get(message_id) if message_id is not None else None
+        if newer is not None and not newer['future'].done():
+            # A newer edit was queued while this one was in flight, it goes out with both changes
+            newer['kwargs'] = {**op['kwargs'], **newer['kwargs']}
+            newer['future'].add_done_callback(lambda f: _copy_outcome(f, op['future']))
+            return
+        if message_id is not None:
+            self.pending_edits[message_id] = op
+        dest.queue.appendleft(op)
+
+    def make_op(self, call, kwargs, message_id=None):
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume)
+        return {'call': call, 'kwargs': kwargs, 'future': future, 'message_id': message_id, 'retries': 3}
+
+    def send(self, channel, **kwargs):
+        return self.enqueue(('channel', channel.id), CHANNEL_RATE, self.make_op(channel.send, kwargs))
+
+    def followup(self, interaction, **kwargs):
+        return self.enqueue(('webhook', interaction.id), WEBHOOK_RATE, self.make_op(interaction.followup.send, kwargs))
+
+    def edit(self, message, **kwargs):
+        return self.enqueue_edit(('channel', message.channel.id), CHANNEL_RATE, message, kwargs)
+
+    def edit_followup(self, interaction, message, **kwargs):
+        # Follow-up messages are edited through the interaction webhook and share its bucket, not the channel's
+        return self.enqueue_edit(('webhook', interaction.id), WEBHOOK_RATE, message, kwargs)
+
+    def enqueue_edit(self, key, rate, message, kwargs):
+        # An edit still waiting in the queue is replaced by the newer one, only the latest state is sent
+        queued = self.pending_edits.get(message.id)
+        if queued is not None and not queued['future'].done():
+            queued['kwargs'].update(kwargs)
+            return queued['future']
+        op = self.make_op(message.edit, kwargs, message_id=message.id)
+        self.pending_edits[message.id] = op
+        return self.enqueue(key, rate, op)
+
+
+output = OutputPipeline()
+
+
+async def send_paginated(interaction, title, fields, color, description=None, ephemeral=True):
+    messages = pack_embeds(paginate_embeds(title, fields, color, description))
+    await asyncio.gather(*(output.followup(interaction, embeds=embeds, ephemeral=ephemeral) for embeds in messages))
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+
+# Approximate us-east-1 list prices (USD per GB-month / per provisioned IOPS-month)
+GB_MONTH_PRICE = {
+    'gp2': 0.10, 'gp3': 0.08, 'io1': 0.125, 'io2': 0.125,
+    'st1': 0.045, 'sc1': 0.015, 'standard': 0.05,
+}
+PIOPS_MONTH_PRICE = {'io1': 0.065, 'io2': 0.065}
+# gp3 includes 3000 IOPS and 125 MiB/s, anything above is billed separately
+GP3_BASELINE_IOPS = 3000
+GP3_BASELINE_THROUGHPUT = 125
+GP3_IOPS_MONTH_PRICE = 0.005
+GP3_THROUGHPUT_MONTH_PRICE = 0.04
+SNAPSHOT_GB_MONTH_PRICE = 0.05
+IDLE_DAYS = 7
+IDLE_OPS_PER_DAY = 100
+# GetMetricData accepts at most 500 queries per call, two per volume
+VOLUMES_PER_CALL = 250
+
+
+def monthly_cost(volume):
+    vol_type = volume['VolumeType']
+    cost = volume['Size'] * GB_MONTH_PRICE.get(vol_type, 0.10)
+    if vol_type in PIOPS_MONTH_PRICE:
+        cost += volume.get('Iops', 0) * PIOPS_MONTH_PRICE[vol_type]
+    elif vol_type == 'gp3':
+        cost += max(0, volume.get('Iops', 0) - GP3_BASELINE_IOPS) * GP3_IOPS_MONTH_PRICE
+        cost += max(0, volume.get('Throughput', 0) - GP3_BASELINE_THROUGHPUT) * GP3_THROUGHPUT_MONTH_PRICE
+    return cost
+
+def gp3_equivalent(volume):
+    # gp2 performance scales with size (3 IOPS/GiB, 250 MiB/s above 170 GiB), gp3 has to provision the same
+    iops = max(100, min(16000, 3 * volume['Size']))
+    throughput = 128 if volume['Size'] <= 170 else 250
+    return dict(volume, VolumeType='gp3', Iops=iops, Throughput=throughput)
+
+def list_volumes(ec2, filters=None):
+    volumes = []
+    kwargs = {'Filters': filters} if filters else {}
+    for page in ec2.get_paginator('describe_volumes').paginate(**kwargs):
+        volumes.extend(page['Volumes'])
+    return volumes
+
+def index_instances(ec2):
+    instances = {}
+    for page in ec2.get_paginator('describe_instances').paginate():
+        for r in page['Reservations']:
+            for i in r['Instances']:
+                instances[i['InstanceId']] = i
+    return instances
+
+def list_own_snapshots(ec2):
+    snapshots = []
+    for page in ec2.get_paginator('describe_snapshots').paginate(OwnerIds=['self']):
+        snapshots.extend(page['Snapshots'])
+    return snapshots
+
+def volume_ops(cloudwatch, volume_ids, days=IDLE_DAYS):
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    totals = {}
+    for i in range(0, len(volume_ids), VOLUMES_PER_CALL):
+        chunk = volume_ids[i:i + VOLUMES_PER_CALL]
+        queries = [
+            {
+                'Id': f"{prefix}{j}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EBS',
+                        'MetricName': metric,
+                        'Dimensions': [{'Name': 'VolumeId', 'Value': vol_id}]
+                    },
+                    'Period': 86400,
+                    'Stat': 'Sum'
+                },
+                'ReturnData': True
+            }
+            for j, vol_id in enumerate(chunk)
+            for prefix, metric in (("r", "VolumeReadOps"), ("w", "VolumeWriteOps"))
+        ]
+        kwargs = {'MetricDataQueries': queries, 'StartTime': start, 'EndTime': end}
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for series in response.get('MetricDataResults', []):
+                # Volumes without datapoints stay out of the result, no data is not the same as no I/O
+                if series.get('Values'):
+                    vol_id = chunk[int(series['Id'][1:])]
+                    totals[vol_id] = totals.get(vol_id, 0) + sum(series['Values'])
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+    return totals
+
+def build_ebs_report(ec2, cloudwatch, instances=None):
+    # Server-side status filters split the fleet, no local scan of attachments needed
+    unattached = list_volumes(ec2, [{'Name': 'status', 'Values': ['available']}])
+    attached = [v for v in list_volumes(ec2, [{'Name': 'status', 'Values': ['in-use']}]) if v.get('Attachments')]
+    if instances is None:
+        instances = index_instances(ec2)
+    ops = volume_ops(cloudwatch, [v['VolumeId'] for v in attached])
+    snapshots = list_own_snapshots(ec2)
+    volume_ids = {v['VolumeId'] for v in unattached} | {v['VolumeId'] for v in attached}
+
+    idle_cutoff = datetime.now(timezone.utc) - timedelta(days=IDLE_DAYS)
+    candidates = []
+    for v in unattached:
+        candidates.append({
+            'kind': 'unattached', 'volume': v, 'savings': monthly_cost(v),
+            'detail': f"{v['Size']} GiB {v['VolumeType']}, unattached, created {v['CreateTime'].strftime('%Y-%m-%d')}",
+        })
+    for v in attached:
+        instance = instances.get(v['Attachments'][0]['InstanceId'], {})
+        state = instance.get('State', {}).get('Name', 'unknown')
+        total_ops = ops.get(v['VolumeId'])
+        # Too new for a full window, or no metrics at all: unknown, not idle
+        measured = total_ops is not None and v['CreateTime'] <= idle_cutoff
+        if state == 'stopped' or (measured and total_ops < IDLE_OPS_PER_DAY * IDLE_DAYS):
+            reason = "instance stopped" if state == 'stopped' else f"{int(total_ops)} ops in {IDLE_DAYS}d"
+            candidates.append({
+                'kind': 'idle', 'volume': v, 'savings': monthly_cost(v),
+                'detail': f"{v['Size']} GiB {v['VolumeType']} on `{instance.get('InstanceId', '?')}`, {reason}",
+            })
+        elif v['VolumeType'] == 'gp2':
+            gp3 = gp3_equivalent(v)
+            savings = monthly_cost(v) - monthly_cost(gp3)
+            if savings > 0:
+                candidates.append({
+                    'kind': 'gp2-to-gp3', 'volume': v, 'savings': savings,
+                    'detail': f"{v['Size']} GiB gp2 → gp3 ({gp3['Iops']} IOPS, {gp3['Throughput']} MiB/s)",
+                })
+    # Pending or failed snapshots are not billed as stored data and may still be in progress
+    orphaned = [s for s in snapshots if s.get('State') == 'completed' and s.get('VolumeId') not in volume_ids]
+    orphaned_gb = sum(s.get('VolumeSize', 0) for s in orphaned)
+    candidates.sort(key=lambda c: c['savings'], reverse=True)
+    return {
+        'volumes': len(volume_ids),
+        'snapshots': len(snapshots),
+        'orphaned_snapshots': len(orphaned),
+        'orphaned_snapshot_cost': orphaned_gb * SNAPSHOT_GB_MONTH_PRICE,
+        'candidates': candidates,
+        'total_savings': sum(c['savings'] for c in candidates),
+    }
@@ -0,0 +1,61 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import datetime
+import discord
+from app.aws_clients import run_aws
+
+EXPORT_FORMATS = ('csv', 'json')
+# Default Discord upload limit for bots without boosted servers
+MAX_ATTACHMENT_BYTES = 10 * 1024 * 1024
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def write_export(rows, fmt):
+    # Rows are written as they are produced, only the compressed file grows, on disk
+    tmp = tempfile.TemporaryFile()
+    count = 0
+    with gzip.GzipFile(fileobj=tmp, mode='wb') as gz:
+        text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+        writer = None
+        for row in rows:
+            if fmt == 'json':
+                text.write(json.dumps(row, default=_default) + "\n")
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(text, fieldnames=list(row), extrasaction='ignore')
+                    writer.writeheader()
+                writer.writerow({k: _default(v) if isinstance(v, datetime) else v for k, v in row.items()})
+            count += 1
+        text.flush()
+        text.detach()
+    size = tmp.tell()
+    tmp.seek(0)
+    return tmp, count, size
+
+async def send_export(interaction, name, rows, fmt):
+    fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        await interaction.followup.send(embed=discord.Embed(
+            description=f" Unknown export format `{fmt}`. Use `csv` or `json`.",
+            color=discord.Color.red()), ephemeral=True)
+        return
+    tmp, count, size = await run_aws(write_export, rows, fmt)
+    with tmp:
+        if size > MAX_ATTACHMENT_BYTES:
+            await interaction.followup.send(embed=discord.Embed(
+                description=f" Export of {count:,} rows is {size / 1024 / 1024:.1f} MB compressed, above Discord's upload limit.",
+                color=discord.Color.red()), ephemeral=True)
+            return
+        extension = "csv.gz" if fmt == 'csv' else "ndjson.gz"
+        filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{extension}"
+        await interaction.followup.send(
+            embed=discord.Embed(description=f" Exported **{count:,}** rows.", color=discord.Color.green()),
+            file=discord.File(tmp, filename=filename),
+            ephemeral=True)
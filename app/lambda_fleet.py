@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+FLEET_METRICS = [
+    ("i", "Invocations", "Sum"),
+    ("e", "Errors", "Sum"),
+    ("t", "Throttles", "Sum"),
+    ("d", "Duration", "p95"),
+]
+# GetMetricData accepts at most 500 queries per call
+FUNCTIONS_PER_CALL = 500 // len(FLEET_METRICS)
+SORT_KEYS = {
+    'errors': lambda f: f['errors'],
+    'error_rate': lambda f: f['error_rate'],
+    'throttles': lambda f: f['throttles'],
+    'duration': lambda f: f['duration_p95'] or 0,
+    'invocations': lambda f: f['invocations'],
+}
+
+# (role_arn, region) -> {function name: (configuration, last seen)}, entries are replaced only when CodeSha256 changes
+_configs = {}
+# A cached function is re-checked after this long, it may have been deleted in the meantime
+CONFIG_TTL = 5 * 60
+_configs_lock = threading.Lock()
+
+
+def function_runtime(config):
+    return config.get('Runtime') or f"{config.get('PackageType', 'Image').lower()} image"
+
+def iter_functions(lambda_client):
+    for page in lambda_client.get_paginator('list_functions').paginate():
+        yield from page.get('Functions', [])
+
+def list_all_functions(lambda_client):
+    return list(iter_functions(lambda_client))
+
+def update_config_cache(role_arn, region, functions):
+    with _configs_lock:
+        cache = _configs.setdefault((role_arn, region), {})
+        names = set()
+        now = time.monotonic()
+        for config in functions:
+            names.add(config['FunctionName'])
+            cached = cache.get(config['FunctionName'])
+            if cached is None or cached[0].get('CodeSha256') != config.get('CodeSha256'):
+                cache[config['FunctionName']] = (config, now)
+            else:
+                cache[config['FunctionName']] = (cached[0], now)
+        for name in [n for n in cache if n not in names]:
+            del cache[name]
+
+def get_function_config(role_arn, region, lambda_client, function_name):
+    with _configs_lock:
+        cached = _configs.get((role_arn, region), {}).get(function_name)
+    if cached is not None and time.monotonic() - cached[1] < CONFIG_TTL:
+        return cached[0]
+    try:
+        config = lambda_client.get_function_configuration(FunctionName=function_name)
+    except lambda_client.exceptions.ResourceNotFoundException:
+        with _configs_lock:
+            _configs.get((role_arn, region), {}).pop(function_name, None)
+        raise
+    with _configs_lock:
+        cache = _configs.setdefault((role_arn, region), {})
+        if cached is not None and cached[0].get('CodeSha256') == config.get('CodeSha256'):
+            config = cached[0]
+        cache[function_name] = (config, time.monotonic())
+    return config
+
+def function_name_suggestions(role_arn, region, lambda_client, prefix, limit=25):
+    # Served from the config cache when /lambda-list or /lambda-fleet filled it, otherwise from one page
+    with _configs_lock:
+        names = list(_configs.get((role_arn, region), {}))
+    if not names:
+        page = lambda_client.list_functions()
+        names = [f['FunctionName'] for f in page.get('Functions', [])]
+    prefix = prefix.lower()
+    return sorted(n for n in names if n.lower().startswith(prefix))[:limit]
+
+def fetch_fleet_metrics(cloudwatch, names, window):
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    if window > timedelta(days=15):
+        # CloudWatch rounds older start times down to 5 minutes or an hour, keep the window on that grid
+        end = end.replace(minute=0)
+    start = end - window
+    # One period spanning the whole window, so p95 is the percentile of the window and not a max of per-period p95s
+    period = max(60, -(-int(window.total_seconds()) // 60) * 60)
+    results = {name: {} for name in names}
+    for i in range(0, len(names), FUNCTIONS_PER_CALL):
+        chunk = names[i:i + FUNCTIONS_PER_CALL]
+        queries = [
+            {
+                'Id': f"{prefix}{j}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/Lambda',
+                        'MetricName': metric,
+                        'Dimensions': [{'Name': 'FunctionName', 'Value': name}]
+                    },
+                    'Period': period,
+                    'Stat': stat
+                },
+                'ReturnData': True
+            }
+            for j, name in enumerate(chunk)
+            for prefix, metric, stat in FLEET_METRICS
+        ]
+        kwargs = {'MetricDataQueries': queries, 'StartTime': start, 'EndTime': end}
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for series in response.get('MetricDataResults', []):
+                name = chunk[int(series['Id'][1:])]
+                values = series.get('Values', [])
+                metric = next(m for p, m, _ in FLEET_METRICS if p == series['Id'][0])
+                if metric == 'Duration':
+                    # Normally a single datapoint, an unaligned window spills its last minutes into a newer one.
+                    # Values come newest first, the oldest datapoint covers the window.
+                    results[name][metric] = values[-1] if values else None
+                else:
+                    results[name][metric] = results[name].get(metric, 0) + sum(values)
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+    return results
+
+def build_fleet(functions, metrics, sort_by='errors'):
+    fleet = []
+    for config in functions:
+        m = metrics.get(config['FunctionName'], {})
+        invocations = m.get('Invocations', 0)
+        errors = m.get('Errors', 0)
+        fleet.append({
+            'name': config['FunctionName'],
+            'runtime': function_runtime(config),
+            'invocations': invocations,
+            'errors': errors,
+            'throttles': m.get('Throttles', 0),
+            'duration_p95': m.get('Duration'),
+            'error_rate': errors / invocations if invocations else 0.0,
+        })
+    return sorted(fleet, key=SORT_KEYS[sort_by], reverse=True)
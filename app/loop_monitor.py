@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+SAMPLE_SECONDS = 0.1
+# A loop that falls this far behind is treated as blocked and the code it is stuck in is captured
+BLOCK_THRESHOLD = 0.25
+WINDOW_SECONDS = 300
+TOP_BLOCKERS = 5
+# Innermost frames kept besides the bot's own, enough to show the library call it was in
+LIBRARY_FRAMES = 3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def in_repo(filename):
+    return filename.startswith(ROOT) and 'site-packages' not in filename and filename != os.path.abspath(__file__)
+
+def describe(frame):
+    stack = traceback.extract_stack(frame)
+    # boto3 calls all pass through BaseClient._make_api_call, its locals name the operation
+    operation = None
+    f = frame
+    while f is not None:
+        if f.f_code.co_name == '_make_api_call' and 'botocore' in f.f_code.co_filename:
+            operation = f.f_locals.get('operation_name')
+            break
+        f = f.f_back
+    own = [s for s in stack if in_repo(s.filename)]
+    where = own[-1] if own else stack[-1]
+    path = os.path.relpath(where.filename, ROOT) if in_repo(where.filename) else os.path.basename(where.filename)
+    culprit = f"{where.name} ({path}:{where.lineno})"
+    if operation:
+        culprit += f" -> {operation}"
+    kept = [s for i, s in enumerate(stack) if in_repo(s.filename) or i >= len(stack) - LIBRARY_FRAMES]
+    return culprit, "".join(traceback.format_list(kept))
+
+
+class LoopMonitor:
+    def __init__(self, sample_seconds=SAMPLE_SECONDS, threshold=BLOCK_THRESHOLD):
+        self.sample_seconds = sample_seconds
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        # (monotonic time, lag) and (monotonic time, culprit, seconds) within the window
+        self.samples = deque()
+        self.blocks = deque()
+        # culprit -> {count, seconds, max, stack}, kept for the life of the process
+        self.blockers = {}
+        self.beat = time.monotonic()
+        self.stalled = None
+        self.task = None
+        self.watchdog = None
+        self.loop_thread = None
+
+    async def start(self):
+        # on_ready fires again after every reconnect
+        if self.task is not None and not self.task.done():
+            return
+        self.loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self.task = asyncio.create_task(self.sample())
+        if self.watchdog is None:
+            self.watchdog = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+            self.watchdog.start()
+
+    async def sample(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.sample_seconds)
+            now = time.monotonic()
+            self.record(now, max(0.0, now - start - self.sample_seconds))
+
+    def record(self, now, lag):
+        with self.lock:
+            self.beat = now
+            stalled, self.stalled = self.stalled, None
+            self.samples.append((now, lag))
+            while self.samples and now - self.samples[0][0] > WINDOW_SECONDS:
+                self.samples.popleft()
+            while self.blocks and now - self.blocks[0][0] > WINDOW_SECONDS:
+                self.blocks.popleft()
+            if stalled is None:
+                return
+            culprit, stack = stalled
+            self.blocks.append((now, culprit, lag))
+            blocker = self.blockers.get(culprit)
+            first = blocker is None
+            if first:
+                blocker = self.blockers[culprit] = {'count': 0, 'seconds': 0.0, 'max': 0.0, 'stack': stack}
+            blocker['count'] += 1
+            blocker['seconds'] += lag
+            blocker['max'] = max(blocker['max'], lag)
+        print(f"Event loop blocked for {lag * 1000:.0f}ms in {culprit}")
+        if first:
+            print(stack, end="")
+
+    def watch(self):
+        # Runs in its own thread so it can look at the loop while the loop is stuck
+        while True:
+            time.sleep(self.threshold / 2)
+            if self.task is None or self.task.done():
+                continue
+            with self.lock:
+                beat = self.beat
+                if self.stalled is not None or time.monotonic() - beat - self.sample_seconds < self.threshold:
+                    continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            stalled = describe(frame)
+            del frame
+            with self.lock:
+                # The loop may have caught up while the stack was being read
+                if self.beat == beat:
+                    self.stalled = stalled
+
+    def stats(self, since=None):
+        with self.lock:
+            since = time.monotonic() - WINDOW_SECONDS if since is None else since
+            lags = sorted(lag for t, lag in self.samples if t >= since)
+            blocks = [(culprit, seconds) for t, culprit, seconds in self.blocks if t >= since]
+            top = sorted(self.blockers.items(), key=lambda b: -b[1]['seconds'])[:TOP_BLOCKERS]
+        return {
+            'lag_p50': percentile(lags, 50),
+            'lag_p95': percentile(lags, 95),
+            'lag_p99': percentile(lags, 99),
+            'lag_max': lags[-1] if lags else 0.0,
+            'blocked': len(blocks),
+            'blocked_seconds': sum(seconds for _, seconds in blocks),
+            'top_blockers': [
+                {'culprit': culprit, 'count': b['count'], 'seconds': b['seconds'], 'max': b['max']}
+                for culprit, b in top
+            ],
+        }
+
+    def stack(self, culprit):
+        blocker = self.blockers.get(culprit)
+        return blocker['stack'] if blocker else None
+
+
+loop_monitor = LoopMonitor()
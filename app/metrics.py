@@ -0,0 +1,171 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 30
+MAX_POINTS = 1440
+# GetMetricData allows at most 500 queries per request
+MAX_QUERIES = 500
+# Datapoints can arrive a few minutes late, a bucket is only closed (and cached) after this
+SETTLE_DELAY = timedelta(minutes=10)
+MAX_CACHED_SERIES = 2000
+STATISTICS = {
+    'average': 'Average', 'avg': 'Average', 'sum': 'Sum', 'max': 'Maximum', 'maximum': 'Maximum',
+    'min': 'Minimum', 'minimum': 'Minimum', 'samplecount': 'SampleCount',
+}
+WINDOW_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+# {(role_arn, region, namespace, dimensions, metric, stat, period): {timestamp: value}}
+_closed_buckets = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_window(window):
+    match = re.fullmatch(r"\s*(\d+)\s*([mhdw])\s*", (window or "").lower())
+    if not match:
+        raise ValueError(f"Invalid window `{window}`, use e.g. `1h`, `6h`, `7d`.")
+    return timedelta(**{WINDOW_UNITS[match.group(2)]: int(match.group(1))})
+
+def parse_statistic(statistic):
+    if statistic is None:
+        return None
+    stat = statistic.strip().lower()
+    if re.fullmatch(r"p\d{1,2}(\.\d+)?", stat):
+        return stat
+    if stat not in STATISTICS:
+        raise ValueError(f"Invalid statistic `{statistic}`, use Average, Sum, Max, Min, SampleCount or pNN.")
+    return STATISTICS[stat]
+
+def choose_period(window, period=None):
+    # Coarser periods let CloudWatch downsample server-side for long windows
+    seconds = int(window.total_seconds())
+    minimum = -(-seconds // MAX_POINTS)
+    period = max(period or 300, minimum, 60)
+    # CloudWatch only accepts multiples of 5 minutes for data older than 15 days, of 1 hour beyond 63 days
+    if window > timedelta(days=63):
+        step = 3600
+    elif window > timedelta(days=15):
+        step = 300
+    else:
+        step = 60
+    return -(-period // step) * step
+
+def downsample(values, width=SPARK_WIDTH):
+    if len(values) <= width:
+        return values
+    step = len(values) / width
+    chunks = [values[int(i * step):max(int((i + 1) * step), int(i * step) + 1)] for i in range(width)]
+    return [sum(chunk) / len(chunk) for chunk in chunks]
+
+def sparkline(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return "no data"
+    values = downsample(values)
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (hi - lo)
+    return "".join(SPARK_CHARS[int((v - lo) * scale)] for v in values)
+
+def _bucket_times(start, end, period):
+    t = start
+    while t < end:
+        yield t
+        t += timedelta(seconds=period)
+
+def _cache_get(key):
+    with _cache_lock:
+        buckets = _closed_buckets.get(key)
+        if buckets is not None:
+            _closed_buckets.move_to_end(key)
+        return buckets
+
+def _cache_put(key, values):
+    # A period is only chosen for windows up to MAX_POINTS buckets long, older buckets are never read again
+    period = key[-1]
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=period * (MAX_POINTS + 1))
+    with _cache_lock:
+        buckets = _closed_buckets.setdefault(key, {})
+        buckets.update(values)
+        for t in [t for t in buckets if t < cutoff]:
+            del buckets[t]
+        _closed_buckets.move_to_end(key)
+        while len(_closed_buckets) > MAX_CACHED_SERIES:
+            _closed_buckets.popitem(last=False)
+
+def fetch_metric_series(cloudwatch, cache_scope, namespace, dimensions, metrics, window, period, stats):
+    # metrics: list of metric names, stats: {metric: stat}. Returns {metric: [values per bucket]}
+    now = datetime.now(timezone.utc)
+    end = datetime.fromtimestamp(now.timestamp() // period * period, timezone.utc)
+    start = end - window
+    start = datetime.fromtimestamp(start.timestamp() // period * period, timezone.utc)
+    closed_until = now - SETTLE_DELAY
+    times = list(_bucket_times(start, end, period))
+    dims = tuple(sorted((d['Name'], d['Value']) for d in dimensions))
+    keys = {m: (*cache_scope, namespace, dims, m, stats[m], period) for m in metrics}
+    cached = {m: _cache_get(keys[m]) or {} for m in metrics}
+    fetch_from = {}
+    for m in metrics:
+        missing = next((t for t in times if t not in cached[m]), None)
+        if missing is not None:
+            fetch_from[m] = missing
+    fetched = {m: {} for m in fetch_from}
+    if fetch_from:
+        query_start = min(fetch_from.values())
+        names = list(fetch_from)
+        for i in range(0, len(names), MAX_QUERIES):
+            chunk = names[i:i + MAX_QUERIES]
+            queries = [{
+                'Id': f"m{j}",
+                'MetricStat': {
+                    'Metric': {'Namespace': namespace, 'MetricName': m, 'Dimensions': dimensions},
+                    'Period': period,
+                    'Stat': stats[m],
+                },
+                'ReturnData': True,
+            } for j, m in enumerate(chunk)]
+            kwargs = {'MetricDataQueries': queries, 'StartTime': query_start, 'EndTime': end, 'ScanBy': 'TimestampAscending'}
+            while True:
+                response = cloudwatch.get_metric_data(**kwargs)
+                for series in response.get('MetricDataResults', []):
+                    metric = chunk[int(series['Id'][1:])]
+                    for ts, value in zip(series.get('Timestamps', []), series.get('Values', [])):
+                        fetched[metric][ts.astimezone(timezone.utc)] = value
+                if not response.get('NextToken'):
+                    break
+                kwargs['NextToken'] = response['NextToken']
+        for m, values in fetched.items():
+            closed = {
+                t: values.get(t) for t in times
+                if t >= fetch_from[m] and t + timedelta(seconds=period) <= closed_until
+            }
+            _cache_put(keys[m], closed)
+    result = {}
+    for m in metrics:
+        series = []
+        for t in times:
+            if m in fetched and t >= fetch_from[m]:
+                series.append(fetched[m].get(t))
+            else:
+                series.append(cached[m].get(t))
+        result[m] = series
+    return result
+
+def summarize(values):
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+    return {'last': present[-1], 'min': min(present), 'max': max(present)}
+
+def format_metric_value(values, unit="", scale=1):
+    summary = summarize(values)
+    if summary is None:
+        return "no data"
+    fmt = lambda v: f"{round(v / scale, 2)}"
+    return (
+        f"`{sparkline(values)}`\n"
+        f"Last: **{fmt(summary['last'])} {unit}** | Min: {fmt(summary['min'])} | Max: {fmt(summary['max'])}"
+    )
@@ -0,0 +1,347 @@
+import ipaddress
+import time
+from collections import namedtuple
+
+ALL_PORTS = (0, 65535)
+PROTOCOL_NAMES = {'-1': 'all', '6': 'tcp', '17': 'udp', '1': 'icmp', '58': 'icmpv6'}
+INDEX_TTL = 300
+
+ExposureRule = namedtuple(
+    "ExposureRule",
+    ["source", "resource_id", "resource_name", "vpc_id", "protocol",
+     "from_port", "to_port", "cidr", "action", "rule_number"]
+)
+
+_index_cache = {}
+
+
+def normalize_protocol(protocol):
+    protocol = str(protocol).lower()
+    return PROTOCOL_NAMES.get(protocol, protocol)
+
+def port_range(protocol, from_port, to_port):
+    if protocol == 'all' or from_port is None or from_port == -1:
+        return ALL_PORTS
+    return (from_port, to_port if to_port not in (None, -1) else from_port)
+
+
+class IntervalTree:
+    # Static centered interval tree, answers "which intervals contain x"
+    def __init__(self, intervals):
+        self.center = None
+        self.left = self.right = None
+        if not intervals:
+            return
+        points = sorted(p for lo, hi, _ in intervals for p in (lo, hi))
+        self.center = points[len(points) // 2]
+        left, right, here = [], [], []
+        for item in intervals:
+            if item[1] < self.center:
+                left.append(item)
+            elif item[0] > self.center:
+                right.append(item)
+            else:
+                here.append(item)
+        self.by_lo = sorted(here, key=lambda i: i[0])
+        self.by_hi = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, x, out=None):
+        out = set() if out is None else out
+        node = self
+        while node is not None and node.center is not None:
+            if x < node.center:
+                for lo, _, value in node.by_lo:
+                    if lo > x:
+                        break
+                    out.add(value)
+                node = node.left
+            elif x > node.center:
+                for _, hi, value in node.by_hi:
+                    if hi < x:
+                        break
+                    out.add(value)
+                node = node.right
+            else:
+                out.update(value for _, _, value in node.by_lo)
+                break
+        return out
+
+
+class PrefixTrie:
+    # Binary trie over IPv4/IPv6 prefixes, values are stored on the prefix node
+    def __init__(self):
+        self.roots = {4: [None, None, []], 6: [None, None, []]}
+
+    @staticmethod
+    def _bits(network):
+        addr = int(network.network_address)
+        width = network.max_prefixlen
+        for i in range(network.prefixlen):
+            yield (addr >> (width - 1 - i)) & 1
+
+    def insert(self, network, value):
+        node = self.roots[network.version]
+        for bit in self._bits(network):
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        node[2].append(value)
+
+    def covering(self, network):
+        # Values whose prefix contains the given network
+        node = self.roots[network.version]
+        out = list(node[2])
+        for bit in self._bits(network):
+            node = node[bit]
+            if node is None:
+                break
+            out.extend(node[2])
+        return out
+
+    def longest_match(self, network):
+        node = self.roots[network.version]
+        best = node[2]
+        for bit in self._bits(network):
+            node = node[bit]
+            if node is None:
+                break
+            if node[2]:
+                best = node[2]
+        return best
+
+    def within(self, network):
+        # Values whose prefix lies inside the given network
+        node = self.roots[network.version]
+        for bit in self._bits(network):
+            node = node[bit]
+            if node is None:
+                return []
+        out, stack = [], [node]
+        while stack:
+            n = stack.pop()
+            out.extend(n[2])
+            stack.extend(c for c in n[:2] if c is not None)
+        return out
+
+
+class NetworkIndex:
+    def __init__(self, security_groups, network_acls, instances):
+        self.rules = []
+        self.groups = {sg['GroupId']: sg for sg in security_groups}
+        self.instances = instances
+        self.subnet_nacl = {}
+        for sg in security_groups:
+            for perm in sg.get('IpPermissions', []):
+                protocol = normalize_protocol(perm.get('IpProtocol', '-1'))
+                lo, hi = port_range(protocol, perm.get('FromPort'), perm.get('ToPort'))
+                cidrs = [r['CidrIp'] for r in perm.get('IpRanges', [])]
+                cidrs += [r['CidrIpv6'] for r in perm.get('Ipv6Ranges', [])]
+                for cidr in cidrs:
+                    self.rules.append(ExposureRule(
+                        'sg', sg['GroupId'], sg.get('GroupName', ''), sg.get('VpcId'),
+                        protocol, lo, hi, cidr, 'allow', None))
+        self.nacl_entries = {}
+        for nacl in network_acls:
+            entries = []
+            for entry in nacl.get('Entries', []):
+                if entry.get('Egress'):
+                    continue
+                protocol = normalize_protocol(entry.get('Protocol', '-1'))
+                ports = entry.get('PortRange', {})
+                lo, hi = port_range(protocol, ports.get('From'), ports.get('To'))
+                cidr = entry.get('CidrBlock') or entry.get('Ipv6CidrBlock')
+                rule = ExposureRule(
+                    'nacl', nacl['NetworkAclId'], '', nacl.get('VpcId'), protocol,
+                    lo, hi, cidr, entry['RuleAction'], entry['RuleNumber'])
+                self.rules.append(rule)
+                entries.append(rule)
+            self.nacl_entries[nacl['NetworkAclId']] = sorted(entries, key=lambda r: r.rule_number)
+            for assoc in nacl.get('Associations', []):
+                self.subnet_nacl[assoc['SubnetId']] = nacl['NetworkAclId']
+        self.ports = IntervalTree([(r.from_port, r.to_port, idx) for idx, r in enumerate(self.rules)])
+        self.cidrs = PrefixTrie()
+        for idx, r in enumerate(self.rules):
+            self.cidrs.insert(ipaddress.ip_network(r.cidr, strict=False), idx)
+
+    def query(self, port=None, cidr='0.0.0.0/0', protocol='tcp', source=None):
+        network = ipaddress.ip_network(cidr, strict=False)
+        matches = set(self.cidrs.covering(network))
+        if port is not None:
+            matches &= self.ports.stab(port)
+        protocol = normalize_protocol(protocol)
+        rules = []
+        for idx in matches:
+            r = self.rules[idx]
+            if source and r.source != source:
+                continue
+            if protocol != 'all' and r.protocol not in ('all', protocol):
+                continue
+            rules.append(r)
+        return sorted(rules, key=lambda r: (r.source, r.resource_id, r.from_port))
+
+    def nacl_allows(self, subnet_id, port, cidr='0.0.0.0/0', protocol='tcp'):
+        nacl_id = self.subnet_nacl.get(subnet_id)
+        if nacl_id is None:
+            return True
+        network = ipaddress.ip_network(cidr, strict=False)
+        protocol = normalize_protocol(protocol)
+        for r in self.nacl_entries.get(nacl_id, []):
+            if r.protocol not in ('all', protocol) or not (r.from_port <= port <= r.to_port):
+                continue
+            rule_net = ipaddress.ip_network(r.cidr, strict=False)
+            if rule_net.version == network.version and network.subnet_of(rule_net):
+                return r.action == 'allow'
+        return False
+
+    def internet_reachable(self, ports=None, protocol='tcp'):
+        open_rules = {}
+        for cidr in ('0.0.0.0/0', '::/0'):
+            for r in self.query(cidr=cidr, protocol=protocol, source='sg'):
+                open_rules.setdefault(r.resource_id, []).append(r)
+        reachable = []
+        for inst in self.instances:
+            if not (inst.get('PublicIpAddress') or inst.get('Ipv6Address')):
+                continue
+            exposed = set()
+            for sg in inst.get('SecurityGroups', []):
+                for r in open_rules.get(sg['GroupId'], []):
+                    if ports:
+                        exposed.update(p for p in ports if r.from_port <= p <= r.to_port)
+                    else:
+                        exposed.add((r.from_port, r.to_port))
+            if ports:
+                exposed = {p for p in exposed if self.nacl_allows(inst.get('SubnetId'), p, protocol=protocol)}
+            elif exposed:
+                exposed = {p for p in exposed if self.nacl_allows(inst.get('SubnetId'), p[0], protocol=protocol)}
+            if exposed:
+                reachable.append((inst, sorted(exposed)))
+        return reachable
+
+
+def load_network_index(ec2):
+    sgs, nacls, instances = [], [], []
+    for page in ec2.get_paginator('describe_security_groups').paginate():
+        sgs.extend(page['SecurityGroups'])
+    for page in ec2.get_paginator('describe_network_acls').paginate():
+        nacls.extend(page['NetworkAcls'])
+    filters = [{'Name': 'instance-state-name', 'Values': ['pending', 'running']}]
+    for page in ec2.get_paginator('describe_instances').paginate(Filters=filters):
+        for r in page['Reservations']:
+            instances.extend(r['Instances'])
+    return NetworkIndex(sgs, nacls, instances)
+
+def get_network_index(role_arn, region, ec2, refresh=False):
+    key = (role_arn, region)
+    cached = _index_cache.get(key)
+    if cached and not refresh and time.monotonic() - cached[0] < INDEX_TTL:
+        return cached[1]
+    index = load_network_index(ec2)
+    _index_cache[key] = (time.monotonic(), index)
+    return index
+
+def cached_network_index(role_arn, region):
+    cached = _index_cache.get((role_arn, region))
+    return cached[1] if cached else None
+
+
+ROUTE_TARGET_KEYS = [
+    'GatewayId', 'NatGatewayId', 'TransitGatewayId', 'VpcPeeringConnectionId',
+    'NetworkInterfaceId', 'InstanceId', 'EgressOnlyInternetGatewayId',
+    'LocalGatewayId', 'CarrierGatewayId', 'CoreNetworkArn'
+]
+
+Route = namedtuple("Route", ["destination", "target", "state", "origin", "prefix_list_id"])
+
+_route_cache = {}
+
+
+def route_target(route):
+    return next((route[k] for k in ROUTE_TARGET_KEYS if route.get(k)), 'unknown')
+
+
+class RouteEngine:
+    def __init__(self, route_tables, prefix_lists):
+        self.tries = {}
+        self.subnet_tables = {}
+        self.main_tables = {}
+        self.table_vpc = {}
+        for rt in route_tables:
+            rt_id = rt['RouteTableId']
+            self.table_vpc[rt_id] = rt.get('VpcId')
+            trie = PrefixTrie()
+            for r in rt.get('Routes', []):
+                target = route_target(r)
+                state = r.get('State', 'active')
+                origin = r.get('Origin', '')
+                pl_id = r.get('DestinationPrefixListId')
+                if pl_id:
+                    destinations = prefix_lists.get(pl_id, [])
+                else:
+                    destinations = [d for d in (r.get('DestinationCidrBlock'), r.get('DestinationIpv6CidrBlock')) if d]
+                for dest in destinations:
+                    network = ipaddress.ip_network(dest, strict=False)
+                    trie.insert(network, Route(dest, target, state, origin, pl_id))
+            self.tries[rt_id] = trie
+            for assoc in rt.get('Associations', []):
+                if assoc.get('Main'):
+                    self.main_tables[rt.get('VpcId')] = rt_id
+                elif assoc.get('SubnetId'):
+                    self.subnet_tables[assoc['SubnetId']] = rt_id
+
+    def table_for_subnet(self, subnet_id, vpc_id=None):
+        return self.subnet_tables.get(subnet_id) or self.main_tables.get(vpc_id)
+
+    def lookup(self, route_table_id, ip):
+        address = ipaddress.ip_address(ip)
+        network = ipaddress.ip_network(f"{address}/{address.max_prefixlen}")
+        matches = self.tries[route_table_id].longest_match(network)
+        # A prefix-list route and a CIDR route can share a prefix, AWS prefers the CIDR route
+        return min(matches, key=lambda r: r.prefix_list_id is not None) if matches else None
+
+
+def route_tables_fingerprint(route_tables, prefix_list_versions):
+    routes = sorted(
+        (rt['RouteTableId'],
+         tuple(sorted(tuple(sorted((k, str(v)) for k, v in r.items())) for r in rt.get('Routes', []))),
+         tuple(sorted((a.get('SubnetId') or '', bool(a.get('Main'))) for a in rt.get('Associations', []))))
+        for rt in route_tables
+    )
+    return hash((tuple(routes), tuple(sorted(prefix_list_versions.items()))))
+
+def prefix_list_versions(ec2, prefix_list_ids):
+    versions = {}
+    if not prefix_list_ids:
+        return versions
+    paginator = ec2.get_paginator('describe_managed_prefix_lists')
+    for page in paginator.paginate(PrefixListIds=sorted(prefix_list_ids)):
+        for pl in page['PrefixLists']:
+            versions[pl['PrefixListId']] = pl.get('Version')
+    return versions
+
+def get_route_engine(role_arn, region, ec2, route_tables=None):
+    if route_tables is None:
+        route_tables = []
+        for page in ec2.get_paginator('describe_route_tables').paginate():
+            route_tables.extend(page['RouteTables'])
+    prefix_list_ids = {
+        r['DestinationPrefixListId']
+        for rt in route_tables for r in rt.get('Routes', []) if r.get('DestinationPrefixListId')
+    }
+    versions = prefix_list_versions(ec2, prefix_list_ids)
+    fingerprint = route_tables_fingerprint(route_tables, versions)
+    key = (role_arn, region)
+    cached = _route_cache.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    prefix_lists = {}
+    for pl_id in prefix_list_ids:
+        cidrs = []
+        paginator = ec2.get_paginator('get_managed_prefix_list_entries')
+        for page in paginator.paginate(PrefixListId=pl_id):
+            cidrs.extend(e['Cidr'] for e in page['Entries'])
+        prefix_lists[pl_id] = cidrs
+    engine = RouteEngine(route_tables, prefix_lists)
+    _route_cache[key] = (fingerprint, engine)
+    return engine
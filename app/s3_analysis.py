@@ -0,0 +1,282 @@
+import asyncio
+import bisect
+import heapq
+import json
+import os
+import pathlib
+import time
+from datetime import datetime, timezone
+from app.aws_clients import run_aws
+
+SCAN_DIR = pathlib.Path("s3_scans")
+TOP_N = 10
+MAX_PREFIXES = 500
+CHECKPOINT_EVERY = 20
+# Upper bounds (days) of the age histogram buckets, the last bucket is open ended
+AGE_BUCKETS = [1, 7, 30, 90, 365]
+AGE_LABELS = ["<1d", "1-7d", "7-30d", "30-90d", "90-365d", ">1y"]
+OTHER_PREFIX = "(other)"
+ROOT_PREFIX = "(root)"
+
+
+class BucketStats:
+    def __init__(self):
+        self.count = 0
+        self.total_size = 0
+        self.largest = []
+        self.ages = [0] * len(AGE_LABELS)
+        self.storage_classes = {}
+        self.prefixes = {}
+
+    def add(self, key, size, storage_class, age_days):
+        self.count += 1
+        self.total_size += size
+        if len(self.largest) < TOP_N:
+            heapq.heappush(self.largest, (size, key))
+        elif size > self.largest[0][0]:
+            heapq.heappushpop(self.largest, (size, key))
+        self.ages[bisect.bisect_right(AGE_BUCKETS, age_days)] += 1
+        sc = self.storage_classes.setdefault(storage_class, [0, 0])
+        sc[0] += 1
+        sc[1] += size
+        prefix = key.split('/', 1)[0] + '/' if '/' in key else ROOT_PREFIX
+        if prefix not in self.prefixes and len(self.prefixes) >= MAX_PREFIXES:
+            prefix = OTHER_PREFIX
+        p = self.prefixes.setdefault(prefix, [0, 0])
+        p[0] += 1
+        p[1] += size
+
+    def add_batch(self, keys, sizes, storage_classes, ages_days):
+        # Column-wise aggregation of one chunk, merged into the running totals
+        self.count += len(keys)
+        self.total_size += sum(sizes)
+        for item in heapq.nlargest(TOP_N, zip(sizes, keys)):
+            if len(self.largest) < TOP_N:
+                heapq.heappush(self.largest, item)
+            elif item[0] > self.largest[0][0]:
+                heapq.heappushpop(self.largest, item)
+            else:
+                break
+        for age in ages_days:
+            self.ages[bisect.bisect_right(AGE_BUCKETS, age)] += 1
+        for sc, size in zip(storage_classes, sizes):
+            totals = self.storage_classes.setdefault(sc, [0, 0])
+            totals[0] += 1
+            totals[1] += size
+        for key, size in zip(keys, sizes):
+            slash = key.find('/')
+            prefix = key[:slash + 1] if slash >= 0 else ROOT_PREFIX
+            totals = self.prefixes.get(prefix)
+            if totals is None:
+                if len(self.prefixes) >= MAX_PREFIXES:
+                    prefix = OTHER_PREFIX
+                totals = self.prefixes.setdefault(prefix, [0, 0])
+            totals[0] += 1
+            totals[1] += size
+
+    def add_objects(self, objects, now):
+        for obj in objects:
+            age_days = (now - obj['LastModified']).total_seconds() / 86400
+            self.add(obj['Key'], obj['Size'], obj.get('StorageClass', 'STANDARD'), age_days)
+
+    def top_prefixes(self, n=10):
+        return sorted(self.prefixes.items(), key=lambda p: p[1][1], reverse=True)[:n]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_size': self.total_size,
+            'largest': self.largest,
+            'ages': self.ages,
+            'storage_classes': self.storage_classes,
+            'prefixes': self.prefixes,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data['count']
+        stats.total_size = data['total_size']
+        stats.largest = [tuple(item) for item in data['largest']]
+        heapq.heapify(stats.largest)
+        stats.ages = data['ages']
+        stats.storage_classes = data['storage_classes']
+        stats.prefixes = data['prefixes']
+        return stats
+
+
+def checkpoint_path(bucket):
+    return SCAN_DIR / f"{bucket}.json"
+
+def load_checkpoint(bucket):
+    path = checkpoint_path(bucket)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def save_checkpoint(bucket, state):
+    SCAN_DIR.mkdir(exist_ok=True)
+    path = checkpoint_path(bucket)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def stats_path(bucket):
+    return SCAN_DIR / f"{bucket}.stats.json"
+
+def save_bucket_stats(bucket, stats, source):
+    SCAN_DIR.mkdir(exist_ok=True)
+    path = stats_path(bucket)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({
+            'bucket': bucket,
+            'source': source,
+            'updated': datetime.now(timezone.utc).isoformat(),
+            'stats': stats.to_dict(),
+        }, f)
+    os.replace(tmp, path)
+
+def load_bucket_stats(bucket):
+    path = stats_path(bucket)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    data['stats'] = BucketStats.from_dict(data['stats'])
+    return data
+
+def format_size(size):
+    for unit, factor in (("TB", 1024 ** 4), ("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if size >= factor:
+            return f"{round(size / factor, 2)} {unit}"
+    return f"{size} B"
+
+
+def split_key(low, high):
+    # A key strictly between low and high (None = end of the bucket), or None when the range is too narrow.
+    # S3 lists in UTF-8 byte order, which matches code point order, so splitting works on code points.
+    low = low or ""
+    i = 0
+    while high is not None and i < len(low) and i < len(high) and low[i] == high[i]:
+        i += 1
+    lo = ord(low[i]) if i < len(low) else 0
+    hi = ord(high[i]) if high is not None and i < len(high) else 0x80
+    if hi - lo < 2:
+        # Neighbouring characters: any key extending low[:i + 1] still sorts below high
+        i += 1
+        lo = ord(low[i]) if i < len(low) else 0
+        hi = 0x80
+    mid = (lo + hi) // 2
+    if 0xD800 <= mid <= 0xDFFF:
+        # Surrogates cannot be encoded in a key
+        mid = 0xD7FF
+    if mid <= lo:
+        return None
+    key = low[:i] + chr(mid)
+    return key if low < key and (high is None or key < high) else None
+
+
+class BucketScan:
+    # The key space is cut into (after, until] ranges listed with StartAfter. A worker that sees others
+    # idle splits the rest of its range in two, so flat and skewed buckets are listed in parallel too,
+    # and every range resumes from its last key after a restart.
+    def __init__(self, s3, bucket, workers=8, resume=True):
+        self.s3 = s3
+        self.bucket = bucket
+        self.workers = workers
+        self.pages = 0
+        self.pages_since_checkpoint = 0
+        self.started = time.monotonic()
+        self.active = []
+        self.busy = 0
+        self.idle = 0
+        self.changed = asyncio.Condition()
+        state = load_checkpoint(bucket) if resume else None
+        if state and not state.get('complete') and 'ranges' in state:
+            self.stats = BucketStats.from_dict(state['stats'])
+            self.pending = state['ranges']
+            self.resumed = True
+        else:
+            self.stats = BucketStats()
+            self.pending = [{'after': None, 'until': None}]
+            self.resumed = False
+        self.complete = False
+
+    def state(self):
+        return {
+            'bucket': self.bucket,
+            'complete': self.complete,
+            'updated': datetime.now(timezone.utc).isoformat(),
+            'ranges': self.pending + self.active,
+            'stats': self.stats.to_dict(),
+        }
+
+    def checkpoint(self, force=False):
+        self.pages_since_checkpoint += 1
+        if force or self.pages_since_checkpoint >= CHECKPOINT_EVERY:
+            save_checkpoint(self.bucket, self.state())
+            self.pages_since_checkpoint = 0
+
+    async def scan_range(self, key_range):
+        while True:
+            kwargs = {'Bucket': self.bucket}
+            if key_range['after']:
+                kwargs['StartAfter'] = key_range['after']
+            page = await run_aws(self.s3.list_objects_v2, **kwargs)
+            contents = page.get('Contents', [])
+            until = key_range['until']
+            inside = [obj for obj in contents if until is None or obj['Key'] <= until]
+            self.stats.add_objects(inside, datetime.now(timezone.utc))
+            self.pages += 1
+            if not page.get('IsTruncated') or len(inside) < len(contents) or not contents:
+                # Done before the checkpoint, a saved range would list this page again on resume
+                self.active.remove(key_range)
+                self.checkpoint()
+                return
+            key_range['after'] = contents[-1]['Key']
+            if self.idle and not self.pending:
+                mid = split_key(key_range['after'], until)
+                if mid is not None:
+                    key_range['until'] = mid
+                    async with self.changed:
+                        self.pending.append({'after': mid, 'until': until})
+                        self.changed.notify()
+            self.checkpoint()
+
+    async def worker(self):
+        while True:
+            async with self.changed:
+                while not self.pending and self.busy:
+                    self.idle += 1
+                    await self.changed.wait()
+                    self.idle -= 1
+                if not self.pending:
+                    return
+                key_range = self.pending.pop()
+                self.active.append(key_range)
+                self.busy += 1
+            try:
+                await self.scan_range(key_range)
+            finally:
+                async with self.changed:
+                    self.busy -= 1
+                    self.changed.notify_all()
+
+    async def run(self):
+        tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed listing stops the others, progress so far is kept for a resume
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.checkpoint(force=True)
+            raise
+        self.complete = True
+        self.checkpoint(force=True)
+        save_bucket_stats(self.bucket, self.stats, "listing scan")
+        return self.stats
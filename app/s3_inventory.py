@@ -0,0 +1,121 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import re
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import unquote
+from app.s3_analysis import BucketStats, save_bucket_stats
+
+CHUNK_ROWS = 50000
+MANIFEST_DATE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}-\d{2}Z/$")
+
+
+def find_inventory_destination(s3, bucket):
+    configs = []
+    kwargs = {'Bucket': bucket}
+    while True:
+        response = s3.list_bucket_inventory_configurations(**kwargs)
+        configs.extend(response.get('InventoryConfigurationList', []))
+        if not response.get('IsTruncated'):
+            break
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+    configs = [c for c in configs if c.get('IsEnabled')]
+    if not configs:
+        return None
+    # Prefer current-version inventories, they match what the stats report
+    config = sorted(configs, key=lambda c: c.get('IncludedObjectVersions') != 'Current')[0]
+    dest = config['Destination']['S3BucketDestination']
+    dest_bucket = dest['Bucket'].split(':::')[-1]
+    prefix = dest.get('Prefix', '').rstrip('/')
+    base = f"{prefix}/{bucket}/{config['Id']}/" if prefix else f"{bucket}/{config['Id']}/"
+    return dest_bucket, base, config['Id']
+
+def find_latest_manifest(s3, dest_bucket, base):
+    latest = None
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=dest_bucket, Prefix=base, Delimiter='/'):
+        for p in page.get('CommonPrefixes', []):
+            if MANIFEST_DATE.search(p['Prefix']) and (latest is None or p['Prefix'] > latest):
+                latest = p['Prefix']
+    if latest is None:
+        return None, None
+    body = s3.get_object(Bucket=dest_bucket, Key=f"{latest}manifest.json")['Body']
+    return latest, json.load(body)
+
+def parse_modified(value, now):
+    modified = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return (now - modified).total_seconds() / 86400
+
+def ingest_csv(s3, dest_bucket, key, columns, stats, now):
+    body = s3.get_object(Bucket=dest_bucket, Key=key)['Body']
+    reader = csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=body), encoding='utf-8'))
+    key_col = columns.index('Key')
+    size_col = columns.index('Size')
+    modified_col = columns.index('LastModifiedDate') if 'LastModifiedDate' in columns else None
+    class_col = columns.index('StorageClass') if 'StorageClass' in columns else None
+    marker_col = columns.index('IsDeleteMarker') if 'IsDeleteMarker' in columns else None
+    while True:
+        rows = list(itertools.islice(reader, CHUNK_ROWS))
+        if not rows:
+            return
+        if marker_col is not None:
+            rows = [r for r in rows if r[marker_col] != 'true']
+        stats.add_batch(
+            [unquote(r[key_col]) for r in rows],
+            [int(r[size_col] or 0) for r in rows],
+            [r[class_col] for r in rows] if class_col is not None else ['STANDARD'] * len(rows),
+            [parse_modified(r[modified_col], now) for r in rows] if modified_col is not None else [0] * len(rows),
+        )
+
+def ingest_parquet(s3, dest_bucket, key, stats, now):
+    try:
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet inventories require the `pyarrow` package.")
+    # Parquet needs a seekable file, spool it to disk rather than memory
+    with tempfile.TemporaryFile() as tmp:
+        s3.download_fileobj(dest_bucket, key, tmp)
+        tmp.seek(0)
+        parquet = pq.ParquetFile(tmp)
+        names = set(parquet.schema_arrow.names)
+        columns = [c for c in ('key', 'size', 'last_modified_date', 'storage_class', 'is_delete_marker') if c in names]
+        for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=columns):
+            if 'is_delete_marker' in names:
+                batch = batch.filter(pc.invert(pc.fill_null(batch.column('is_delete_marker'), False)))
+            sizes = pc.fill_null(batch.column('size'), 0).to_pylist()
+            if 'last_modified_date' in names:
+                ages = [
+                    (now - (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc))).total_seconds() / 86400 if ts else 0
+                    for ts in batch.column('last_modified_date').to_pylist()
+                ]
+            else:
+                ages = [0] * len(sizes)
+            classes = batch.column('storage_class').to_pylist() if 'storage_class' in names else ['STANDARD'] * len(sizes)
+            stats.add_batch(batch.column('key').to_pylist(), sizes, classes, ages)
+
+def ingest_inventory(s3, bucket):
+    destination = find_inventory_destination(s3, bucket)
+    if destination is None:
+        raise RuntimeError(f"No enabled S3 Inventory configuration found for `{bucket}`.")
+    dest_bucket, base, config_id = destination
+    manifest_prefix, manifest = find_latest_manifest(s3, dest_bucket, base)
+    if manifest is None:
+        raise RuntimeError(f"Inventory `{config_id}` has not delivered a report yet.")
+    file_format = manifest.get('fileFormat', 'CSV').upper()
+    columns = [c.strip() for c in manifest.get('fileSchema', '').split(',')]
+    stats = BucketStats()
+    now = datetime.now(timezone.utc)
+    for data_file in manifest.get('files', []):
+        if file_format == 'CSV':
+            ingest_csv(s3, dest_bucket, data_file['key'], columns, stats, now)
+        elif file_format == 'PARQUET':
+            ingest_parquet(s3, dest_bucket, data_file['key'], stats, now)
+        else:
+            raise RuntimeError(f"Inventory format `{file_format}` is not supported, use CSV or Parquet.")
+    snapshot = manifest_prefix.rstrip('/').rsplit('/', 1)[-1]
+    save_bucket_stats(bucket, stats, f"inventory {config_id} ({snapshot})")
+    return stats
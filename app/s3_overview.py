@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.aws_clients import get_assumed_client, run_aws
+
+REGION_CONCURRENCY = 16
+# GetMetricData accepts at most 500 queries per call, two per bucket
+BUCKETS_PER_CALL = 250
+
+# Bucket regions never change, cache them for the lifetime of the process
+bucket_regions = {}
+
+
+def list_all_buckets(s3):
+    buckets = []
+    if s3.can_paginate('list_buckets'):
+        for page in s3.get_paginator('list_buckets').paginate():
+            buckets.extend(page.get('Buckets', []))
+    else:
+        buckets = s3.list_buckets().get('Buckets', [])
+    return buckets
+
+def bucket_region(s3, name):
+    location = s3.get_bucket_location(Bucket=name).get('LocationConstraint')
+    # Legacy location constraints: empty means us-east-1, "EU" means eu-west-1
+    return {None: 'us-east-1', '': 'us-east-1', 'EU': 'eu-west-1'}.get(location, location)
+
+async def resolve_bucket_regions(s3, buckets):
+    semaphore = asyncio.Semaphore(REGION_CONCURRENCY)
+
+    async def resolve(bucket):
+        name = bucket['Name']
+        if name in bucket_regions:
+            return
+        if bucket.get('BucketRegion'):
+            bucket_regions[name] = bucket['BucketRegion']
+            return
+        async with semaphore:
+            try:
+                bucket_regions[name] = await run_aws(bucket_region, s3, name)
+            except Exception:
+                # Shed, throttled or denied: listed without a region this time and retried on the next call
+                return
+
+    await asyncio.gather(*(resolve(b) for b in buckets))
+    return {b['Name']: bucket_regions.get(b['Name']) for b in buckets}
+
+def fetch_region_metrics(cloudwatch, names):
+    end = datetime.utcnow()
+    start = end - timedelta(days=2)
+    results = {}
+    for i in range(0, len(names), BUCKETS_PER_CALL):
+        chunk = names[i:i + BUCKETS_PER_CALL]
+        queries = []
+        for j, name in enumerate(chunk):
+            for prefix, metric, storage_type in (("s", "BucketSizeBytes", "StandardStorage"), ("c", "NumberOfObjects", "AllStorageTypes")):
+                queries.append({
+                    'Id': f"{prefix}{j}",
+                    'MetricStat': {
+                        'Metric': {
+                            'Namespace': 'AWS/S3',
+                            'MetricName': metric,
+                            'Dimensions': [
+                                {'Name': 'BucketName', 'Value': name},
+                                {'Name': 'StorageType', 'Value': storage_type}
+                            ]
+                        },
+                        'Period': 86400,
+                        'Stat': 'Average'
+                    },
+                    'ReturnData': True
+                })
+        kwargs = {'MetricDataQueries': queries, 'StartTime': start, 'EndTime': end, 'ScanBy': 'TimestampDescending'}
+        seen = set()
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for series in response.get('MetricDataResults', []):
+                # Newest values come first, later pages only hold older datapoints
+                if not series.get('Values') or series['Id'] in seen:
+                    continue
+                seen.add(series['Id'])
+                name = chunk[int(series['Id'][1:])]
+                entry = results.setdefault(name, {'size': 0, 'objects': 0})
+                entry['size' if series['Id'][0] == 's' else 'objects'] = series['Values'][0]
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+    return results
+
+async def build_bucket_overview(role_arn, s3):
+    buckets = await run_aws(list_all_buckets, s3)
+    regions = await resolve_bucket_regions(s3, buckets)
+    by_region = {}
+    for name, region in regions.items():
+        if region:
+            by_region.setdefault(region, []).append(name)
+
+    async def region_metrics(region, names):
+        try:
+            cloudwatch = await run_aws(get_assumed_client, role_arn, region, 'cloudwatch')
+            return await run_aws(fetch_region_metrics, cloudwatch, names)
+        except Exception:
+            # A disabled opt-in region should not hide the other regions' buckets
+            return {}
+
+    metrics = {}
+    for result in await asyncio.gather(*(region_metrics(r, n) for r, n in by_region.items())):
+        metrics.update(result)
+    overview = [
+        {
+            'name': b['Name'],
+            'region': regions.get(b['Name']) or 'unknown',
+            'size': metrics.get(b['Name'], {}).get('size', 0),
+            'objects': metrics.get(b['Name'], {}).get('objects', 0),
+        }
+        for b in buckets
+    ]
+    return sorted(overview, key=lambda b: b['size'], reverse=True)
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+AUTOCOMPLETE = 0
+INTERACTIVE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {AUTOCOMPLETE: 'autocomplete', INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+WORKERS = 16
+# Background work never holds more than this many workers, the rest stay free for commands
+BACKGROUND_WORKERS = 4
+# One guild or account can hold at most this many workers while others are waiting
+MAX_RUNNING_PER_KEY = 6
+# Seconds a job may wait before it is dropped: autocomplete must answer within Discord's 3s,
+# deferred interactions must follow up within 15 minutes
+DEADLINES = {AUTOCOMPLETE: 2.5, INTERACTIVE: 14 * 60, BACKGROUND: 30 * 60}
+MAX_QUEUED = {AUTOCOMPLETE: 20, INTERACTIVE: 500, BACKGROUND: 100}
+MAX_QUEUED_PER_KEY = 100
+
+# Set by the command decorators and background jobs, read by run_aws
+current_priority = contextvars.ContextVar('aws_priority', default=INTERACTIVE)
+current_key = contextvars.ContextVar('aws_fairness_key', default=None)
+
+
+class AwsBusyError(Exception):
+    pass
+
+
+@contextmanager
+def aws_work(priority, key=None):
+    priority_token = current_priority.set(priority)
+    key_token = current_key.set(key if key is not None else current_key.get())
+    try:
+        yield
+    finally:
+        current_key.reset(key_token)
+        current_priority.reset(priority_token)
+
+
+class AwsScheduler:
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='aws')
+        # priority -> {key: heap of (deadline, seq, job)}
+        self.queues = {p: {} for p in PRIORITY_NAMES}
+        self.queued = {p: 0 for p in PRIORITY_NAMES}
+        self.running = 0
+        self.running_background = 0
+        self.running_by_key = {}
+        self.shed = {p: 0 for p in PRIORITY_NAMES}
+        self.seq = itertools.count()
+
+    def submit(self, func, args=(), kwargs=None, priority=None, key=None, deadline=None):
+        loop = asyncio.get_running_loop()
+        priority = current_priority.get() if priority is None else priority
+        key = current_key.get() if key is None else key
+        queue = self.queues[priority].setdefault(key, [])
+        if self.queued[priority] >= MAX_QUEUED[priority] or len(queue) >= MAX_QUEUED_PER_KEY:
+            if not queue:
+                del self.queues[priority][key]
+            self.shed[priority] += 1
+            raise AwsBusyError(f"AWS work queue is full ({PRIORITY_NAMES[priority]}), try again shortly.")
+        job = {
+            'call': partial(contextvars.copy_context().run, func, *args, **(kwargs or {})),
+            'future': loop.create_future(),
+            'priority': priority,
+            'key': key,
+            'deadline': time.monotonic() + (DEADLINES[priority] if deadline is None else deadline),
+        }
+        heapq.heappush(queue, (job['deadline'], next(self.seq), job))
+        self.queued[priority] += 1
+        self.pump()
+        return job['future']
+
+    def next_job(self):
+        waiting = [key for queues in self.queues.values() for key in queues]
+        for priority in sorted(self.queues):
+            if priority == BACKGROUND and self.running_background >= BACKGROUND_WORKERS:
+                continue
+            queues = self.queues[priority]
+            # Least-served key first, earliest deadline breaks ties
+            candidates = [
+                (self.running_by_key.get(key, 0), queue[0][0], key)
+                for key, queue in queues.items()
+                if self.running_by_key.get(key, 0) < MAX_RUNNING_PER_KEY or all(k == key for k in waiting)
+            ]
+            if not candidates:
+                continue
+            _, _, key = min(candidates, key=lambda c: (c[0], c[1]))
+            _, _, job = heapq.heappop(queues[key])
+            if not queues[key]:
+                del queues[key]
+            self.queued[priority] -= 1
+            return job
+        return None
+
+    def pump(self):
+        now = time.monotonic()
+        while self.running < self.workers:
+            job = self.next_job()
+            if job is None:
+                return
+            if job['future'].done():
+                continue
+            if job['deadline'] < now:
+                self.shed[job['priority']] += 1
+                job['future'].set_exception(AwsBusyError("AWS is busy, this request waited too long and was dropped."))
+                continue
+            self.start(job)
+
+    def start(self, job):
+        self.running += 1
+        if job['priority'] == BACKGROUND:
+            self.running_background += 1
+        self.running_by_key[job['key']] = self.running_by_key.get(job['key'], 0) + 1
+        loop = job['future'].get_loop()
+        work = loop.run_in_executor(self.executor, job['call'])
+        work.add_done_callback(partial(self.finish, job))
+
+    def finish(self, job, work):
+        self.running -= 1
+        if job['priority'] == BACKGROUND:
+            self.running_background -= 1
+        count = self.running_by_key[job['key']] - 1
+        if count:
+            self.running_by_key[job['key']] = count
+        else:
+            del self.running_by_key[job['key']]
+        if job['future'].done():
+            # The caller gave up (e.g. an autocomplete timeout), still collect the result so errors are not logged as unretrieved
+            if not work.cancelled():
+                work.exception()
+        elif work.cancelled():
+            job['future'].cancel()
+        elif work.exception() is not None:
+            job['future'].set_exception(work.exception())
+        else:
+            job['future'].set_result(work.result())
+        self.pump()
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'queued': {PRIORITY_NAMES[p]: n for p, n in self.queued.items()},
+            'shed': {PRIORITY_NAMES[p]: n for p, n in self.shed.items()},
+        }
+
+
+scheduler = AwsScheduler()
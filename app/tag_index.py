@@ -0,0 +1,128 @@
+import threading
+import time
+
+INDEX_TTL = 600
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def arn_service(arn):
+    parts = arn.split(':', 5)
+    if len(parts) < 6:
+        return 'unknown'
+    resource = parts[5]
+    resource_type = resource.split('/', 1)[0] if '/' in resource else resource.split(':', 1)[0]
+    return f"{parts[2]}:{resource_type}" if resource_type and resource_type != resource else parts[2]
+
+def parse_query(query):
+    # "a=1 b=2 OR c=3" -> [[(a, 1, False), (b, 2, False)], [(c, 3, False)]]
+    groups = [[]]
+    for token in query.split():
+        if token.upper() == 'OR':
+            groups.append([])
+            continue
+        negate = token.startswith('!') or '!=' in token
+        token = token.lstrip('!').replace('!=', '=')
+        if '=' not in token:
+            raise ValueError(f"Invalid tag term `{token}`, expected `key=value`, `key=*` or `!key=value`.")
+        key, value = token.split('=', 1)
+        groups[-1].append((key, value, negate))
+    groups = [g for g in groups if g]
+    if not groups:
+        raise ValueError("Empty tag query.")
+    return groups
+
+
+class TagIndex:
+    def __init__(self):
+        self.arn_tags = {}
+        self.postings = {}
+        self.key_postings = {}
+        self.refreshed = 0
+        self.lock = threading.Lock()
+
+    def _add(self, arn, tags):
+        for key, value in tags.items():
+            self.postings.setdefault((key, value), set()).add(arn)
+            self.key_postings.setdefault(key, set()).add(arn)
+
+    def _remove(self, arn, tags):
+        for key, value in tags.items():
+            for index, posting_key in ((self.postings, (key, value)), (self.key_postings, key)):
+                arns = index.get(posting_key)
+                if arns is not None:
+                    arns.discard(arn)
+                    if not arns:
+                        del index[posting_key]
+
+    def refresh(self, tagging):
+        # Full listing, but only resources whose tags changed touch the postings
+        seen = set()
+        changed = 0
+        paginator = tagging.get_paginator('get_resources')
+        for page in paginator.paginate(ResourcesPerPage=100):
+            with self.lock:
+                for mapping in page.get('ResourceTagMappingList', []):
+                    arn = mapping['ResourceARN']
+                    tags = {t['Key']: t['Value'] for t in mapping.get('Tags', [])}
+                    seen.add(arn)
+                    old = self.arn_tags.get(arn)
+                    if old == tags:
+                        continue
+                    if old is not None:
+                        self._remove(arn, old)
+                    self._add(arn, tags)
+                    self.arn_tags[arn] = tags
+                    changed += 1
+        with self.lock:
+            for arn in [a for a in self.arn_tags if a not in seen]:
+                self._remove(arn, self.arn_tags.pop(arn))
+                changed += 1
+            self.refreshed = time.monotonic()
+        return changed
+
+    def _term(self, key, value):
+        if value == '*':
+            return self.key_postings.get(key, set())
+        return self.postings.get((key, value), set())
+
+    def query(self, query):
+        groups = parse_query(query)
+        result = set()
+        with self.lock:
+            for group in groups:
+                positives = sorted((self._term(k, v) for k, v, neg in group if not neg), key=len)
+                if positives:
+                    matched = set(positives[0])
+                    for arns in positives[1:]:
+                        matched &= arns
+                else:
+                    matched = set(self.arn_tags)
+                for k, v, neg in group:
+                    if neg:
+                        matched -= self._term(k, v)
+                result |= matched
+        return sorted(result)
+
+
+def get_tag_index(role_arn, region, tagging, refresh=False):
+    key = (role_arn, region)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = TagIndex()
+    if refresh or not index.refreshed or time.monotonic() - index.refreshed > INDEX_TTL:
+        index.refresh(tagging)
+    return index
+
+def cached_tag_index(role_arn, region):
+    index = _indexes.get((role_arn, region))
+    return index if index is not None and index.refreshed else None
+
+def service_counts(arns):
+    counts = {}
+    for arn in arns:
+        service = arn_service(arn)
+        counts[service] = counts.get(service, 0) + 1
+    return sorted(counts.items(), key=lambda i: i[1], reverse=True)
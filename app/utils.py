@@ -1,6 +1,11 @@
 import json
 import pathlib
+from collections import namedtuple
+from app.scheduler import AwsBusyError
 
+# Compiled per-guild authorization snapshot used by the decorators
+GuildAuth = namedtuple("GuildAuth", ["channel_id", "admin_role_ids"])
+_guild_auth_cache = {}
 
 def load_roles():
     path = pathlib.Path("roles.json")
@@ -12,6 +17,28 @@ def load_roles():
 def save_roles(data):
     with open("roles.json", "w") as f:
         json.dump(data, f, indent=4)
+    invalidate_guild_auth()
+
+def get_guild_auth(guild):
+    if guild is None:
+        return GuildAuth(None, frozenset())
+    auth = _guild_auth_cache.get(guild.id)
+    if auth is None:
+        guild_data = load_roles().get(str(guild.id), {})
+        channel_id = guild_data.get("designated_channel")
+        admin_role_id = guild_data.get("admin_role_id")
+        admin_role_ids = frozenset()
+        if admin_role_id and guild.get_role(int(admin_role_id)) is not None:
+            admin_role_ids = frozenset([int(admin_role_id)])
+        auth = GuildAuth(int(channel_id) if channel_id else None, admin_role_ids)
+        _guild_auth_cache[guild.id] = auth
+    return auth
+
+def invalidate_guild_auth(guild_id=None):
+    if guild_id is None:
+        _guild_auth_cache.clear()
+    else:
+        _guild_auth_cache.pop(int(guild_id), None)
 
 def get_user_role_arn(guild_id, channel_id, user_id):
     roles = load_roles()
@@ -30,6 +57,8 @@ def get_user_region(guild_id, channel_id, user_id):
     return user_data.get("region", "us-east-1")
 
 def format_aws_error(e):
+    if isinstance(e, AwsBusyError):
+        return f" {e}"
     if isinstance(e, TypeError) and 'RoleArn' in str(e):
         return " No IAM role set. Use `/setup-role` to register your AWS role before using this command."
     if hasattr(e, 'response'):
@@ -2,8 +2,11 @@ import discord
 from discord.ext import tasks
 from datetime import datetime
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.cost_engine import get_cost_engine
 from app.decorators import admin_only, allowed_channel_only
+from app.scheduler import BACKGROUND, AwsBusyError, aws_work
+from app.discord_output import output
 
 # This will store the last notified cost threshold in memory
 last_notified_cost = 0
@@ -31,11 +34,12 @@ def register_alert_commands(bot):
         )
 
 async def get_total_cost(role_arn, region):
-    ce = get_assumed_clients(role_arn, region)['ce']
+    ce = (await run_aws(get_assumed_clients, role_arn, region))['ce']
     now = datetime.utcnow()
     start = now.replace(day=1).strftime('%Y-%m-%d')
     end = now.strftime('%Y-%m-%d')
-    response = ce.get_cost_and_usage(
+    response = await run_aws(
+        ce.get_cost_and_usage,
         TimePeriod={'Start': start, 'End': end},
         Granularity='MONTHLY',
         Metrics=['UnblendedCost']
@@ -59,18 +63,33 @@ def setup_alerts(bot, guild_id):
             return
         role_arn = get_user_role_arn(guild.id, channel.id, member.id)
         if not role_arn:
-            await channel.send("No IAM role configured for this server. Please set up a role to enable billing alerts.")
+            await output.send(channel, content="No IAM role configured for this server. Please set up a role to enable billing alerts.")
             return
         region = get_user_region(guild.id, channel.id, member.id)
         if not region:
-            await channel.send("No AWS region configured for this server. Please set up a region to enable billing alerts.")
+            await output.send(channel, content="No AWS region configured for this server. Please set up a region to enable billing alerts.")
             return
         try:
-            total = await get_total_cost(role_arn, region)
-            threshold = int(total)
-            if threshold > last_notified_cost:
-                await channel.send(f"⚠️ AWS cost alert: You have crossed ${threshold:.2f} this month!")
-                last_notified_cost = threshold
+            with aws_work(BACKGROUND, role_arn):
+                total = await get_total_cost(role_arn, region)
+                threshold = int(total)
+                if threshold > last_notified_cost:
+                    await output.send(channel, content=f"⚠️ AWS cost alert: You have crossed ${threshold:.2f} this month!")
+                    last_notified_cost = threshold
+                ce = (await run_aws(get_assumed_clients, role_arn, region))['ce']
+                engine = get_cost_engine(role_arn)
+                await run_aws(engine.update, ce)
+                # Every guild on the account gets its own copy, tracked per guild
+                anomalies, through = engine.unannounced(str(guild_id))
+                for a in anomalies:
+                    await output.send(channel, content=(
+                        f"⚠️ AWS cost anomaly: **{a['service']}** cost ${a['cost']:.2f} on {a['date']}, "
+                        f"${a['jump']:.2f} above its ${a['baseline']:.2f}/day baseline (z={a['z']})."
+                    ))
+                await run_aws(engine.mark_announced, str(guild_id), through)
+        except AwsBusyError:
+            # Shed under load, the next hourly run catches up
+            return
         except Exception as e:
-            await channel.send(f"Error checking AWS cost: {format_aws_error(e)}")
+            await output.send(channel, content=f"Error checking AWS cost: {format_aws_error(e)}")
     billing_alert_task.start()
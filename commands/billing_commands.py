@@ -1,6 +1,7 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.cost_engine import get_cost_engine
 from app.decorators import admin_only, allowed_channel_only
 from datetime import datetime
 
@@ -17,11 +18,12 @@ def register_billing_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            ce = get_assumed_clients(role_arn, region)['ce']
+            ce = (await run_aws(get_assumed_clients, role_arn, region))['ce']
             now = datetime.utcnow()
             start = now.replace(day=1).strftime('%Y-%m-%d')
             end = now.strftime('%Y-%m-%d')
-            response = ce.get_cost_and_usage(
+            response = await run_aws(
+                ce.get_cost_and_usage,
                 TimePeriod={'Start': start, 'End': end},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -39,3 +41,42 @@ def register_billing_commands(bot):
         except Exception as e:
             await interaction.followup.send(
                 embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='cost-forecast', description='Projected month-end spend and recent per-service cost anomalies')
+    @admin_only()
+    @allowed_channel_only()
+    async def cost_forecast(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(
+                embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            ce = (await run_aws(get_assumed_clients, role_arn, region))['ce']
+            engine = get_cost_engine(role_arn)
+            await run_aws(engine.update, ce)
+            actual, projected, by_service = engine.forecast()
+            embed = discord.Embed(title=" AWS Cost Forecast", color=discord.Color.green())
+            embed.add_field(name="Month to Date", value=f"${actual:.2f}", inline=True)
+            embed.add_field(name="Projected Month End", value=f"**${projected:.2f}**", inline=True)
+            top = sorted(by_service.items(), key=lambda i: i[1], reverse=True)[:10]
+            embed.add_field(
+                name="Top Services (projected)",
+                value="\n".join(f"{service}: ${amount:.2f}" for service, amount in top) or "None",
+                inline=False
+            )
+            anomalies = engine.recent_anomalies()
+            embed.add_field(
+                name="Anomalies (last 7 days)",
+                value="\n".join(
+                    f"{a['date']} **{a['service']}** ${a['cost']:.2f} (+${a['jump']:.2f}, z={a['z']})"
+                    for a in anomalies[-10:]
+                ) or "None",
+                inline=False
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(
+                embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
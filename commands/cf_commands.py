@@ -1,13 +1,16 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
-from app.decorators import admin_only, allowed_channel_only
+from app.aws_clients import get_assumed_clients, run_aws
+from app.cf_watch import STATUS_FILTERS, iter_stack_summaries, list_stack_summaries, stack_name_suggestions, watch_stack
+from app.decorators import admin_only, allowed_channel_only, autocomplete_handler
+from app.discord_output import output, send_paginated
+from app.export import send_export
 
 def register_cf_commands(bot):
     @bot.slash_command(name='cf-list', description='List CloudFormation stacks')
     @admin_only()
     @allowed_channel_only()
-    async def cf_list(interaction: discord.Interaction):
+    async def cf_list(interaction: discord.Interaction, status: str = "all", export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -16,8 +19,27 @@ def register_cf_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            cf = get_assumed_clients(role_arn, region)['cf']
-            stacks = cf.describe_stacks().get('Stacks', [])
+            cf = (await run_aws(get_assumed_clients, role_arn, region))['cf']
+            if status not in STATUS_FILTERS:
+                await interaction.followup.send(embed=discord.Embed(
+                    description=f" Unknown status filter `{status}`. Use one of: {', '.join(STATUS_FILTERS)}.",
+                    color=discord.Color.red()), ephemeral=True)
+                return
+            if export:
+                # Listed page by page while the export is written, in API order
+                rows = (
+                    {
+                        'stack_name': s['StackName'],
+                        'status': s['StackStatus'],
+                        'created': s['CreationTime'],
+                        'last_updated': s.get('LastUpdatedTime', ''),
+                        'drift_status': s.get('DriftInformation', {}).get('StackDriftStatus', ''),
+                    }
+                    for s in iter_stack_summaries(cf, status)
+                )
+                await send_export(interaction, "cf-stacks", rows, export)
+                return
+            stacks = await run_aws(list_stack_summaries, cf, status)
             if not stacks:
                 await interaction.followup.send(embed=discord.Embed(description=" No CloudFormation stacks found.", color=discord.Color.orange()), ephemeral=True)
                 return
@@ -47,18 +69,58 @@ def register_cf_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            cf = get_assumed_clients(role_arn, region)['cf']
-            response = cf.describe_stacks(StackName=stack_name)
+            cf = (await run_aws(get_assumed_clients, role_arn, region))['cf']
+            response = await run_aws(cf.describe_stacks, StackName=stack_name)
             stack = response['Stacks'][0]
-            embed = discord.Embed(title=f" Stack: `{stack_name}`", color=discord.Color.teal())
-            embed.add_field(name="Status", value=stack['StackStatus'], inline=True)
-            embed.add_field(name="Created On", value=stack['CreationTime'].strftime('%Y-%m-%d %H:%M:%S'), inline=True)
-            embed.add_field(name="Description", value=stack.get('Description', '—'), inline=False)
-            outputs = stack.get('Outputs', [])
-            if outputs:
-                for o in outputs:
-                    embed.add_field(name=o['OutputKey'], value=o['OutputValue'], inline=False)
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            fields = [
+                ("Status", stack['StackStatus'], True),
+                ("Created On", stack['CreationTime'].strftime('%Y-%m-%d %H:%M:%S'), True),
+                ("Description", stack.get('Description', '—'), False),
+            ]
+            fields.extend((o['OutputKey'], o['OutputValue'], False) for o in stack.get('Outputs', []))
+            await send_paginated(interaction, f" Stack: `{stack_name}`", fields, discord.Color.teal())
         except Exception as e:
             await interaction.followup.send(
                 embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @autocomplete_handler()
+    async def stack_name_choices(ctx: discord.AutocompleteContext):
+        interaction = ctx.interaction
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            return []
+        region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        cf = (await run_aws(get_assumed_clients, role_arn, region))['cf']
+        return await run_aws(stack_name_suggestions, cf, ctx.value or "")
+
+    @bot.slash_command(name='cf-watch', description='Live-tail CloudFormation stack events during a deploy')
+    @admin_only()
+    @allowed_channel_only()
+    async def cf_watch(interaction: discord.Interaction, stack_name: discord.Option(str, "Stack name, ARN or id", autocomplete=stack_name_choices)):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(
+                embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            cf = (await run_aws(get_assumed_clients, role_arn, region))['cf']
+            # Accepts a name, ARN or stack id, the watch runs on the resolved name and id
+            stack = (await run_aws(cf.describe_stacks, StackName=stack_name))['Stacks'][0]
+            stack_name = stack['StackName']
+            # Deploys can outlive the 15 minute interaction token, so the live view is a channel message
+            message = await interaction.channel.send(embed=discord.Embed(description=f" Watching `{stack_name}`...", color=discord.Color.teal()))
+            await interaction.followup.send(
+                embed=discord.Embed(description=f" Live events for `{stack_name}` are posted [here]({message.jump_url}).", color=discord.Color.teal()),
+                ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(
+                embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            await watch_stack(cf, stack, message)
+        except Exception as e:
+            # The interaction token may have expired by now, report in the channel instead
+            await output.send(interaction.channel, embed=discord.Embed(
+                description=f" Stopped watching `{stack_name}`: {format_aws_error(e)}", color=discord.Color.red()))
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+import discord
+from discord.ext import tasks
+from app.utils import load_roles, save_roles, get_user_role_arn, get_user_region, format_aws_error
+from app.aws_clients import get_assumed_clients, run_aws
+from app.decorators import admin_only, allowed_channel_only
+from app.scheduler import BACKGROUND, aws_work
+from app.discord_output import output
+from app.digest import PRECOMPUTE_LEAD, REPORT_MAX_AGE, parse_digest_time, next_run, build_digest, build_digest_embed
+
+DIGEST_TICK_SECONDS = 60
+
+log = logging.getLogger(__name__)
+
+# guild_id -> {role_arn, region, channel_id, hour, minute, next_run}
+guild_digests = {}
+
+# (role_arn, region) -> last built report, shared by every guild on the same account
+account_reports = {}
+
+# (role_arn, region) -> in-flight build, so concurrent requests for one account share a single fetch
+pending_reports = {}
+
+
+async def compute_report(role_arn, region, background):
+    try:
+        if background:
+            # Scheduled precomputes queue behind interactive commands
+            with aws_work(BACKGROUND, role_arn):
+                clients = await run_aws(get_assumed_clients, role_arn, region)
+                report = await run_aws(build_digest, role_arn, region, clients)
+        else:
+            clients = await run_aws(get_assumed_clients, role_arn, region)
+            report = await run_aws(build_digest, role_arn, region, clients)
+        account_reports[(role_arn, region)] = report
+        return report
+    except Exception as e:
+        log.warning("Digest build failed for %s (%s): %s", role_arn, region, format_aws_error(e))
+        return None
+    finally:
+        pending_reports.pop((role_arn, region), None)
+
+def fresh_report(role_arn, region):
+    report = account_reports.get((role_arn, region))
+    if report and time.time() - report['computed_at'] <= REPORT_MAX_AGE:
+        return report
+    return None
+
+def report_task(role_arn, region, background=False):
+    task = pending_reports.get((role_arn, region))
+    if task is None:
+        task = pending_reports[(role_arn, region)] = asyncio.create_task(compute_report(role_arn, region, background))
+    return task
+
+async def get_report(role_arn, region):
+    report = fresh_report(role_arn, region)
+    if report is None:
+        report = await asyncio.shield(report_task(role_arn, region))
+    # A failed or shed build falls back to the last report, however old
+    return report or account_reports.get((role_arn, region))
+
+def subscribe(guild_id, role_arn, region, channel_id, hour, minute):
+    guild_digests[guild_id] = {
+        'role_arn': role_arn,
+        'region': region,
+        'channel_id': channel_id,
+        'hour': hour,
+        'minute': minute,
+        'next_run': next_run(hour, minute),
+    }
+
+def unsubscribe(guild_id):
+    digest = guild_digests.pop(guild_id, None)
+    if digest is None:
+        return
+    key = (digest['role_arn'], digest['region'])
+    if not any((d['role_arn'], d['region']) == key for d in guild_digests.values()):
+        account_reports.pop(key, None)
+
+def register_digest_commands(bot):
+    async def post_digest(digest):
+        channel = bot.get_channel(digest['channel_id'])
+        if channel is None:
+            return
+        report = await get_report(digest['role_arn'], digest['region'])
+        # One guild's missing permission or deleted channel must not stop the other guilds' digests
+        try:
+            if report is None:
+                await output.send(channel, embed=discord.Embed(description=" Daily digest could not be built, see the bot logs.", color=discord.Color.red()))
+                return
+            await output.send(channel, embed=build_digest_embed(report, digest['region']))
+        except discord.HTTPException as e:
+            log.warning("Could not post digest to channel %s: %s", digest['channel_id'], e)
+
+    @tasks.loop(seconds=DIGEST_TICK_SECONDS)
+    async def digest_task():
+        now = datetime.now(timezone.utc)
+        due = []
+        for digest in list(guild_digests.values()):
+            role_arn, region = digest['role_arn'], digest['region']
+            if now >= digest['next_run'] - PRECOMPUTE_LEAD and fresh_report(role_arn, region) is None:
+                report_task(role_arn, region, background=True)
+            if now >= digest['next_run']:
+                digest['next_run'] = next_run(digest['hour'], digest['minute'], now)
+                due.append(digest)
+        if due:
+            await asyncio.gather(*(post_digest(d) for d in due), return_exceptions=True)
+
+    def ensure_running():
+        if not digest_task.is_running():
+            digest_task.start()
+
+    async def restore_digests():
+        for guild_id, guild_data in load_roles().items():
+            digest = guild_data.get("digest") if isinstance(guild_data, dict) else None
+            if not digest:
+                continue
+            channel_id, user_id = digest["channel_id"], digest["user_id"]
+            role_arn = get_user_role_arn(guild_id, channel_id, user_id)
+            if role_arn:
+                hour, minute = parse_digest_time(digest["time"])
+                region = get_user_region(guild_id, channel_id, user_id)
+                subscribe(int(guild_id), role_arn, region, int(channel_id), hour, minute)
+        if guild_digests:
+            ensure_running()
+
+    bot.add_listener(restore_digests, "on_ready")
+
+    @bot.slash_command(name='digest-enable', description='Post a daily account digest to this channel at a fixed time (HH:MM, UTC)')
+    @admin_only()
+    @allowed_channel_only()
+    async def digest_enable(interaction: discord.Interaction, time: str = "08:00"):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            hour, minute = parse_digest_time(time)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+            return
+        region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        roles = load_roles()
+        roles.setdefault(str(interaction.guild_id), {})["digest"] = {
+            "channel_id": str(interaction.channel_id),
+            "user_id": str(interaction.user.id),
+            "time": f"{hour:02d}:{minute:02d}"
+        }
+        save_roles(roles)
+        subscribe(interaction.guild_id, role_arn, region, interaction.channel_id, hour, minute)
+        ensure_running()
+        await interaction.followup.send(embed=discord.Embed(
+            description=(
+                f" Daily digest for `{region}` will be posted here at {hour:02d}:{minute:02d} UTC. "
+                "It covers billing, fleet health, unattached EBS volumes, failed stacks and the busiest instances."
+            ),
+            color=discord.Color.green()), ephemeral=True)
+
+    @bot.slash_command(name='digest-disable', description='Stop posting the daily digest')
+    @admin_only()
+    @allowed_channel_only()
+    async def digest_disable(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        roles = load_roles()
+        guild_data = roles.get(str(interaction.guild_id), {})
+        if "digest" in guild_data:
+            del guild_data["digest"]
+            save_roles(roles)
+        unsubscribe(interaction.guild_id)
+        await interaction.followup.send(embed=discord.Embed(description=" Daily digest disabled.", color=discord.Color.orange()), ephemeral=True)
+
+    @bot.slash_command(name='digest-now', description='Show the account digest now (reuses a recent report if one exists)')
+    @admin_only()
+    @allowed_channel_only()
+    async def digest_now(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        report = await get_report(role_arn, region)
+        if report is None:
+            await interaction.followup.send(embed=discord.Embed(description=" Digest could not be built, see the bot logs.", color=discord.Color.red()), ephemeral=True)
+            return
+        await interaction.followup.send(embed=build_digest_embed(report, region), ephemeral=True)
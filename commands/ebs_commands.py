@@ -1,13 +1,31 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.ebs_report import build_ebs_report
 from app.decorators import admin_only, allowed_channel_only
+from app.export import send_export
+from app.discord_output import send_paginated
+
+def ebs_export_rows(ec2):
+    for page in ec2.get_paginator('describe_volumes').paginate():
+        for v in page['Volumes']:
+            attachments = v.get('Attachments', [])
+            yield {
+                'volume_id': v['VolumeId'],
+                'state': v['State'],
+                'size_gib': v['Size'],
+                'volume_type': v['VolumeType'],
+                'iops': v.get('Iops', ''),
+                'attached_to': attachments[0]['InstanceId'] if attachments else '',
+                'availability_zone': v.get('AvailabilityZone'),
+                'create_time': v.get('CreateTime'),
+            }
 
 def register_ebs_commands(bot):
     @bot.slash_command(name='ebs-list', description='List EBS Volumes')
     @admin_only()
     @allowed_channel_only()
-    async def ebs_list(interaction: discord.Interaction):
+    async def ebs_list(interaction: discord.Interaction, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -15,30 +33,84 @@ def register_ebs_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             ec2 = clients['ec2']
-            volumes = ec2.describe_volumes().get('Volumes', [])
+            if export:
+                await send_export(interaction, "ebs-volumes", ebs_export_rows(ec2), export)
+                return
+            volumes = (await run_aws(ec2.describe_volumes)).get('Volumes', [])
             if not volumes:
                 await interaction.followup.send(embed=discord.Embed(description=" No EBS volumes found.", color=discord.Color.orange()), ephemeral=True)
                 return
-            embed = discord.Embed(title=" EBS Volumes", color=discord.Color.light_grey())
-            for v in volumes[:20]:
+            fields = []
+            for v in volumes:
                 vol_id = v['VolumeId']
                 state = v['State']
                 size = v['Size']
                 vol_type = v['VolumeType']
                 attachments = v.get('Attachments', [])
                 attached_to = attachments[0]['InstanceId'] if attachments else "Not attached"
-                embed.add_field(
-                    name=f"Volume: `{vol_id}`",
-                    value=(
+                fields.append((
+                    f"Volume: `{vol_id}`",
+                    (
                         f" State: **{state}**\n"
                         f" Size: **{size} GiB**\n"
                         f" Type: **{vol_type}**\n"
                         f" Attached To: `{attached_to}`"
                     ),
-                    inline=False
+                    False
+                ))
+            await send_paginated(interaction, " EBS Volumes", fields, discord.Color.light_grey())
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='ebs-report', description='Rank unattached, idle and gp2 EBS volumes by estimated monthly savings')
+    @admin_only()
+    @allowed_channel_only()
+    async def ebs_report(interaction: discord.Interaction, export: str = None):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
+            report = await run_aws(build_ebs_report, clients['ec2'], clients['cloudwatch'])
+            if export:
+                rows = (
+                    {
+                        'volume_id': c['volume']['VolumeId'],
+                        'kind': c['kind'],
+                        'monthly_savings_usd': round(c['savings'], 2),
+                        'size_gib': c['volume']['Size'],
+                        'volume_type': c['volume']['VolumeType'],
+                        'detail': c['detail'],
+                    }
+                    for c in report['candidates']
                 )
+                await send_export(interaction, "ebs-report", rows, export)
+                return
+            embed = discord.Embed(
+                title=" EBS Optimization Report",
+                description=(
+                    f"{report['volumes']} volumes, {report['snapshots']} snapshots\n"
+                    f"Estimated savings: **${report['total_savings']:.2f}/month**"
+                ),
+                color=discord.Color.light_grey()
+            )
+            for kind, label in (("unattached", "Unattached"), ("idle", "Idle"), ("gp2-to-gp3", "gp2 → gp3")):
+                items = [c for c in report['candidates'] if c['kind'] == kind]
+                lines = [f"`{c['volume']['VolumeId']}` ${c['savings']:.2f}/mo — {c['detail']}" for c in items[:8]]
+                if len(items) > 8:
+                    lines.append(f"... and {len(items) - 8} more (${sum(c['savings'] for c in items[8:]):.2f}/mo)")
+                embed.add_field(name=f"{label} ({len(items)})", value="\n".join(lines)[:1024] or "None", inline=False)
+            embed.add_field(
+                name="Orphaned Snapshots",
+                value=f"{report['orphaned_snapshots']} snapshots of deleted volumes, ~${report['orphaned_snapshot_cost']:.2f}/mo",
+                inline=False
+            )
+            embed.set_footer(text="Estimates use approximate us-east-1 list prices.")
             await interaction.followup.send(embed=embed, ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
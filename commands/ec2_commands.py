@@ -1,14 +1,35 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.bulk_actions import (
+    EC2_TARGET_STATES, EC2_ACTIONABLE_STATES, EC2_TRANSITION_STATES, parse_names, parse_tags, resolve_ec2_instances,
+    ec2_power, ec2_states, build_progress_embed, wait_for_states
+)
 from app.decorators import admin_only, allowed_channel_only
-from datetime import datetime, timedelta
+from app.export import send_export
+from app.discord_output import send_paginated
+from app.metrics import parse_window, parse_statistic, choose_period, fetch_metric_series, format_metric_value
+
+def ec2_export_rows(ec2):
+    for page in ec2.get_paginator('describe_instances').paginate():
+        for r in page['Reservations']:
+            for i in r['Instances']:
+                yield {
+                    'instance_id': i['InstanceId'],
+                    'name': next((t['Value'] for t in i.get('Tags', []) if t['Key'] == 'Name'), ''),
+                    'state': i['State']['Name'],
+                    'instance_type': i.get('InstanceType'),
+                    'availability_zone': i.get('Placement', {}).get('AvailabilityZone'),
+                    'private_ip': i.get('PrivateIpAddress', ''),
+                    'public_ip': i.get('PublicIpAddress', ''),
+                    'launch_time': i.get('LaunchTime'),
+                }
 
 def register_ec2_commands(bot):
     @bot.slash_command(name='ec2-list', description='List all EC2 instances')
     @admin_only()
     @allowed_channel_only()
-    async def list_ec2_instances(interaction: discord.Interaction):
+    async def list_ec2_instances(interaction: discord.Interaction, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -18,22 +39,25 @@ def register_ec2_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             ec2 = clients['ec2']
-            reservations = ec2.describe_instances().get('Reservations', [])
+            if export:
+                await send_export(interaction, "ec2-instances", ec2_export_rows(ec2), export)
+                return
+            reservations = (await run_aws(ec2.describe_instances)).get('Reservations', [])
             if not reservations:
                 await interaction.followup.send(
                     embed=discord.Embed(description="No EC2 instances found.", color=discord.Color.orange()),
                     ephemeral=True)
                 return
-            embed = discord.Embed(title="EC2 Instances", color=discord.Color.gold())
+            fields = []
             for r in reservations:
                 for i in r['Instances']:
                     instance_id = i['InstanceId']
                     state = i['State']['Name']
                     name = next((t['Value'] for t in i.get('Tags', []) if t['Key'] == 'Name'), 'Unnamed')
-                    embed.add_field(name=name, value=f"ID: `{instance_id}`\nStatus: **{state}**", inline=False)
-            await interaction.followup.send(embed=embed, ephemeral=True)
+                    fields.append((name, f"ID: `{instance_id}`\nStatus: **{state}**", False))
+            await send_paginated(interaction, "EC2 Instances", fields, discord.Color.gold())
         except Exception as e:
             await interaction.followup.send(
                 embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()),
@@ -50,15 +74,15 @@ def register_ec2_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             ec2 = clients['ec2']
-            response = ec2.describe_instances(Filters=[{'Name': 'tag:Name', 'Values': [name]}])
+            response = await run_aws(ec2.describe_instances, Filters=[{'Name': 'tag:Name', 'Values': [name]}])
             instance = next((i for r in response['Reservations'] for i in r['Instances']), None)
             if not instance:
                 await interaction.followup.send(embed=discord.Embed(description=f" Instance `{name}` not found", color=discord.Color.red()), ephemeral=True)
                 return
             instance_id = instance['InstanceId']
-            ec2.start_instances(InstanceIds=[instance_id])
+            await run_aws(ec2.start_instances, InstanceIds=[instance_id])
             await interaction.followup.send(embed=discord.Embed(description=f" Started `{name}`", color=discord.Color.green()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -74,15 +98,15 @@ def register_ec2_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             ec2 = clients['ec2']
-            response = ec2.describe_instances(Filters=[{'Name': 'tag:Name', 'Values': [name]}])
+            response = await run_aws(ec2.describe_instances, Filters=[{'Name': 'tag:Name', 'Values': [name]}])
             instance = next((i for r in response['Reservations'] for i in r['Instances']), None)
             if not instance:
                 await interaction.followup.send(embed=discord.Embed(description=f" Instance `{name}` not found", color=discord.Color.red()), ephemeral=True)
                 return
             instance_id = instance['InstanceId']
-            ec2.stop_instances(InstanceIds=[instance_id])
+            await run_aws(ec2.stop_instances, InstanceIds=[instance_id])
             await interaction.followup.send(embed=discord.Embed(description=f" Stopped `{name}`", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -90,25 +114,26 @@ def register_ec2_commands(bot):
     @bot.slash_command(name='ec2-metrics', description='Show EC2 CloudWatch metrics')
     @admin_only()
     @allowed_channel_only()
-    async def ec2_metrics(interaction: discord.Interaction, name: str):
+    async def ec2_metrics(interaction: discord.Interaction, name: str, window: str = "1h", period: int = None, statistic: str = "Average"):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
             await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
             return
         try:
+            window_delta = parse_window(window)
+            stat = parse_statistic(statistic)
+            period = choose_period(window_delta, period)
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             ec2 = clients['ec2']
             cloudwatch = clients['cloudwatch']
-            response = ec2.describe_instances(Filters=[{'Name': 'tag:Name', 'Values': [name]}])
+            response = await run_aws(ec2.describe_instances, Filters=[{'Name': 'tag:Name', 'Values': [name]}])
             instance = next((i for r in response['Reservations'] for i in r['Instances']), None)
             if not instance:
                 await interaction.followup.send(embed=discord.Embed(description=f" Instance `{name}` not found", color=discord.Color.red()), ephemeral=True)
                 return
             instance_id = instance['InstanceId']
-            end = datetime.utcnow()
-            start = end - timedelta(hours=1)
             metrics = [
                 "CPUUtilization", "NetworkIn", "NetworkOut",
                 "DiskReadBytes", "DiskWriteBytes", "DiskReadOps", "DiskWriteOps",
@@ -125,23 +150,72 @@ def register_ec2_commands(bot):
                 "NetworkPacketsIn": "pkts",
                 "NetworkPacketsOut": "pkts"
             }
-            embed = discord.Embed(title=f"\U0001F4CA EC2 Metrics for `{name}`", color=discord.Color.dark_green())
+            series = await run_aws(
+                fetch_metric_series, cloudwatch, (role_arn, region), 'AWS/EC2',
+                [{'Name': 'InstanceId', 'Value': instance_id}], metrics, window_delta, period,
+                {m: stat for m in metrics}
+            )
+            embed = discord.Embed(title=f"\U0001F4CA EC2 Metrics for `{name}`", description=f"{stat} over {window}, {period}s period", color=discord.Color.dark_green())
             for metric in metrics:
-                stats = cloudwatch.get_metric_statistics(
-                    Namespace='AWS/EC2',
-                    MetricName=metric,
-                    Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                    StartTime=start,
-                    EndTime=end,
-                    Period=300,
-                    Statistics=['Average']
-                )
-                datapoints = stats.get('Datapoints', [])
-                avg = round(datapoints[-1]['Average'], 2) if datapoints else 0
-                unit = unit_map.get(metric, "")
-                if "Bytes" in metric:
-                    avg = round(avg / 1024, 2)
-                embed.add_field(name=metric, value=f"**{avg} {unit}**", inline=True)
+                scale = 1024 if unit_map[metric] == "KB" else 1
+                embed.add_field(name=metric, value=format_metric_value(series[metric], unit_map.get(metric, ""), scale), inline=False)
             await interaction.followup.send(embed=embed,ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    async def ec2_bulk(interaction, action, names, tags):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            names = parse_names(names)
+            tags = parse_tags(tags)
+            if not names and not tags:
+                await interaction.followup.send(embed=discord.Embed(description=" Provide `names` and/or `tags` to select instances.", color=discord.Color.orange()), ephemeral=True)
+                return
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            ec2 = (await run_aws(get_assumed_clients, role_arn, region))['ec2']
+            instances = await run_aws(resolve_ec2_instances, ec2, names, tags)
+            if not instances:
+                await interaction.followup.send(embed=discord.Embed(description=" No matching EC2 instances found.", color=discord.Color.orange()), ephemeral=True)
+                return
+            target_state = EC2_TARGET_STATES[action]
+            to_change = [iid for iid, i in instances.items() if i['state'] == EC2_ACTIONABLE_STATES[action]]
+            skipped = {
+                iid: i for iid, i in instances.items()
+                if i['state'] not in (target_state, EC2_ACTIONABLE_STATES[action], EC2_TRANSITION_STATES[action])
+            }
+            errors = await run_aws(ec2_power, ec2, to_change, action) if to_change else {}
+            lines = [f"`{i['name']}`: skipped, instance is {i['state']}" for i in skipped.values()]
+            lines += [f"`{instances[iid]['name']}`: {format_aws_error(e)}" for iid, e in errors.items()]
+            for iid in list(skipped) + list(errors):
+                instances.pop(iid)
+            if lines:
+                await interaction.followup.send(embed=discord.Embed(
+                    description="\n".join(lines)[:4000],
+                    color=discord.Color.red() if errors else discord.Color.orange()), ephemeral=True)
+            if not instances:
+                return
+            title = f"EC2 bulk {action} ({len(instances)} instances)"
+            message = await interaction.followup.send(embed=build_progress_embed(title, instances, target_state), ephemeral=True, wait=True)
+            await wait_for_states(interaction, message, title, instances, target_state, lambda ids: ec2_states(ec2, ids))
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='ec2-bulk-start', description='Start EC2 instances by name list or tag selectors')
+    @admin_only()
+    @allowed_channel_only()
+    async def ec2_bulk_start(interaction: discord.Interaction, names: str = None, tags: str = None):
+        await ec2_bulk(interaction, 'start', names, tags)
+
+    @bot.slash_command(name='ec2-bulk-stop', description='Stop EC2 instances by name list or tag selectors')
+    @admin_only()
+    @allowed_channel_only()
+    async def ec2_bulk_stop(interaction: discord.Interaction, names: str = None, tags: str = None):
+        await ec2_bulk(interaction, 'stop', names, tags)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import discord
+from discord.ext import tasks
+from app.utils import load_roles, save_roles, get_user_role_arn, get_user_region, format_aws_error
+from app.aws_clients import get_assumed_clients, run_aws
+from app.decorators import admin_only, allowed_channel_only
+from app.change_feed import AccountWatcher, collect_snapshot
+from app.scheduler import BACKGROUND, aws_work
+from app.discord_output import output
+
+FEED_TICK_SECONDS = 30
+MESSAGE_LIMIT = 1900
+
+log = logging.getLogger(__name__)
+
+# (role_arn, region) -> AccountWatcher, shared by every guild that watches the same account
+account_watchers = {}
+
+# guild_id -> (role_arn, region, channel_id)
+guild_feeds = {}
+
+
+def subscribe(guild_id, role_arn, region, channel_id):
+    unsubscribe(guild_id)
+    watcher = account_watchers.get((role_arn, region))
+    if watcher is None:
+        watcher = account_watchers[(role_arn, region)] = AccountWatcher(role_arn, region)
+    watcher.subscribers.add(guild_id)
+    guild_feeds[guild_id] = (role_arn, region, channel_id)
+
+def unsubscribe(guild_id):
+    feed = guild_feeds.pop(guild_id, None)
+    if feed is None:
+        return
+    watcher = account_watchers.get(feed[:2])
+    if watcher:
+        watcher.subscribers.discard(guild_id)
+        if not watcher.subscribers:
+            del account_watchers[feed[:2]]
+
+def chunk_lines(lines):
+    message = ""
+    for line in lines:
+        if len(message) + len(line) + 1 > MESSAGE_LIMIT:
+            yield message
+            message = ""
+        message = f"{message}\n{line}" if message else line
+    if message:
+        yield message
+
+def register_feed_commands(bot):
+    async def poll_account(watcher):
+        try:
+            with aws_work(BACKGROUND, watcher.role_arn):
+                clients = await run_aws(get_assumed_clients, watcher.role_arn, watcher.region)
+                plan = await run_aws(watcher.plan, clients)
+                sections, names = {}, {}
+                if plan['sections']:
+                    sections, names = await run_aws(collect_snapshot, clients, plan['sections'])
+        except Exception as e:
+            watcher.backoff()
+            log.warning("Change feed poll failed for %s (%s): %s", watcher.role_arn, watcher.region, format_aws_error(e))
+            return
+        changes = watcher.apply(plan, sections, names)
+        if not changes:
+            return
+        messages = list(chunk_lines([watcher.format_change(*c) for c in changes]))
+        # Queued per channel and paced by the output pipeline, channels fan out in parallel
+        sends = []
+        for guild_id in list(watcher.subscribers):
+            channel = bot.get_channel(guild_feeds[guild_id][2])
+            if channel is not None:
+                sends.append(post_changes(channel, messages))
+        await asyncio.gather(*sends)
+
+    async def post_changes(channel, messages):
+        # One channel's missing permissions must not stop the feed for the other guilds
+        try:
+            for message in messages:
+                await output.send(channel, content=message)
+        except discord.HTTPException as e:
+            log.warning("Could not post change feed to channel %s: %s", channel.id, e)
+
+    @tasks.loop(seconds=FEED_TICK_SECONDS)
+    async def change_feed_task():
+        due = [w for w in account_watchers.values() if w.due()]
+        if due:
+            await asyncio.gather(*(poll_account(w) for w in due))
+
+    def ensure_running():
+        if not change_feed_task.is_running():
+            change_feed_task.start()
+
+    async def restore_feeds():
+        for guild_id, guild_data in load_roles().items():
+            feed = guild_data.get("change_feed") if isinstance(guild_data, dict) else None
+            if not feed:
+                continue
+            channel_id, user_id = feed["channel_id"], feed["user_id"]
+            role_arn = get_user_role_arn(guild_id, channel_id, user_id)
+            if role_arn:
+                subscribe(int(guild_id), role_arn, get_user_region(guild_id, channel_id, user_id), int(channel_id))
+        if guild_feeds:
+            ensure_running()
+
+    bot.add_listener(restore_feeds, "on_ready")
+
+    @bot.slash_command(name='feed-enable', description='Post inventory changes (instances, volumes, stacks, RDS) to this channel')
+    @admin_only()
+    @allowed_channel_only()
+    async def feed_enable(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        roles = load_roles()
+        roles.setdefault(str(interaction.guild_id), {})["change_feed"] = {
+            "channel_id": str(interaction.channel_id),
+            "user_id": str(interaction.user.id)
+        }
+        save_roles(roles)
+        subscribe(interaction.guild_id, role_arn, region, interaction.channel_id)
+        ensure_running()
+        await interaction.followup.send(embed=discord.Embed(
+            description=f" Change feed enabled for `{region}`. Instance, volume, stack and RDS changes will be posted here.",
+            color=discord.Color.green()), ephemeral=True)
+
+    @bot.slash_command(name='feed-disable', description='Stop posting inventory changes to this channel')
+    @admin_only()
+    @allowed_channel_only()
+    async def feed_disable(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        roles = load_roles()
+        guild_data = roles.get(str(interaction.guild_id), {})
+        if "change_feed" in guild_data:
+            del guild_data["change_feed"]
+            save_roles(roles)
+        unsubscribe(interaction.guild_id)
+        await interaction.followup.send(embed=discord.Embed(description=" Change feed disabled.", color=discord.Color.orange()), ephemeral=True)
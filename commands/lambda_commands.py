@@ -1,14 +1,19 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
-from app.decorators import admin_only, allowed_channel_only
-from datetime import datetime, timedelta
+from app.aws_clients import get_assumed_client, get_assumed_clients, run_aws
+from app.decorators import admin_only, allowed_channel_only, autocomplete_handler
+from app.export import send_export
+from app.metrics import parse_window, parse_statistic, choose_period, fetch_metric_series, format_metric_value
+from app.lambda_fleet import (
+    SORT_KEYS, function_runtime, iter_functions, list_all_functions, update_config_cache,
+    get_function_config, function_name_suggestions, fetch_fleet_metrics, build_fleet
+)
 
 def register_lambda_commands(bot):
     @bot.slash_command(name='lambda-list', description='List Lambda functions')
     @admin_only()
     @allowed_channel_only()
-    async def lambda_list(interaction: discord.Interaction):
+    async def lambda_list(interaction: discord.Interaction, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -16,15 +21,31 @@ def register_lambda_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            lambda_client = get_assumed_clients(role_arn, region)['lambda']
-            functions = lambda_client.list_functions().get('Functions', [])
+            lambda_client = (await run_aws(get_assumed_clients, role_arn, region))['lambda']
+            if export:
+                # Listed page by page while the export is written
+                rows = (
+                    {
+                        'function_name': f['FunctionName'],
+                        'runtime': function_runtime(f),
+                        'memory_mb': f.get('MemorySize'),
+                        'timeout_s': f.get('Timeout'),
+                        'code_size': f.get('CodeSize'),
+                        'last_modified': f.get('LastModified'),
+                    }
+                    for f in iter_functions(lambda_client)
+                )
+                await send_export(interaction, "lambda-functions", rows, export)
+                return
+            functions = await run_aws(list_all_functions, lambda_client)
+            update_config_cache(role_arn, region, functions)
             if not functions:
                 await interaction.followup.send(embed=discord.Embed(description=" No Lambda functions found.", color=discord.Color.orange()), ephemeral=True)
                 return
             embed = discord.Embed(title="\u26A1 Lambda Functions", color=discord.Color.gold())
             for func in functions[:10]:
                 name = func['FunctionName']
-                runtime = func['Runtime']
+                runtime = function_runtime(func)
                 last_modified = func['LastModified']
                 embed.add_field(name=name, value=f"Runtime: **{runtime}**\nModified: `{last_modified[:10]}`", inline=False)
             if len(functions) > 10:
@@ -33,47 +54,107 @@ def register_lambda_commands(bot):
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
 
+    @autocomplete_handler()
+    async def function_name_choices(ctx: discord.AutocompleteContext):
+        interaction = ctx.interaction
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            return []
+        region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        lambda_client = await run_aws(get_assumed_client, role_arn, region, 'lambda')
+        return await run_aws(function_name_suggestions, role_arn, region, lambda_client, ctx.value or "")
+
     @bot.slash_command(name='lambda-metrics', description='Show Lambda CloudWatch metrics')
     @admin_only()
     @allowed_channel_only()
-    async def lambda_metrics(interaction: discord.Interaction, function_name: str):
+    async def lambda_metrics(interaction: discord.Interaction, function_name: discord.Option(str, "Function name", autocomplete=function_name_choices), window: str = "1h", period: int = None, statistic: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
             await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
             return
         try:
+            window_delta = parse_window(window)
+            stat = parse_statistic(statistic)
+            period = choose_period(window_delta, period)
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             lambda_client = clients['lambda']
             cloudwatch = clients['cloudwatch']
             try:
-                lambda_client.get_function(FunctionName=function_name)
+                await run_aws(get_function_config, role_arn, region, lambda_client, function_name)
             except lambda_client.exceptions.ResourceNotFoundException:
                 await interaction.followup.send(embed=discord.Embed(description=f" Lambda function `{function_name}` not found.", color=discord.Color.red()), ephemeral=True)
                 return
-            end = datetime.utcnow()
-            start = end - timedelta(hours=1)
             metrics = ["Duration", "Invocations", "Errors", "Throttles", "ConcurrentExecutions"]
-            embed = discord.Embed(title=f" Lambda Metrics for `{function_name}`", color=discord.Color.dark_gold())
+            # Without an explicit statistic, durations are averaged and counts summed
+            stats = {m: stat or ('Average' if m == 'Duration' else 'Sum') for m in metrics}
+            series = await run_aws(
+                fetch_metric_series, cloudwatch, (role_arn, region), 'AWS/Lambda',
+                [{'Name': 'FunctionName', 'Value': function_name}], metrics, window_delta, period, stats
+            )
+            embed = discord.Embed(title=f" Lambda Metrics for `{function_name}`", description=f"{stat or 'Average/Sum'} over {window}, {period}s period", color=discord.Color.dark_gold())
             for metric in metrics:
-                data = cloudwatch.get_metric_statistics(
-                    Namespace='AWS/Lambda',
-                    MetricName=metric,
-                    Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                    StartTime=start,
-                    EndTime=end,
-                    Period=300,
-                    Statistics=['Average'] if metric == 'Duration' else ['Sum']
-                )
-                points = data.get('Datapoints', [])
-                if metric == 'Duration':
-                    value = round(points[-1]['Average'], 2) if points else 0
-                    value_display = f"Avg: **{value}ms**"
-                else:
-                    value = round(points[-1]['Sum'], 2) if points else 0
-                    value_display = f"Total: **{int(value)}**"
-                embed.add_field(name=metric, value=value_display, inline=True)
+                unit = "ms" if metric == "Duration" else ""
+                embed.add_field(name=f"{metric} ({stats[metric]})", value=format_metric_value(series[metric], unit), inline=False)
             await interaction.followup.send(embed=embed,ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='lambda-fleet', description='Health overview of every Lambda function')
+    @admin_only()
+    @allowed_channel_only()
+    async def lambda_fleet(interaction: discord.Interaction, sort_by: str = "errors", window: str = "1d", export: str = None):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        if sort_by not in SORT_KEYS:
+            await interaction.followup.send(embed=discord.Embed(
+                description=f" Unknown sort `{sort_by}`. Use one of: {', '.join(SORT_KEYS)}.",
+                color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            window_delta = parse_window(window)
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
+            functions = await run_aws(list_all_functions, clients['lambda'])
+            if not functions:
+                await interaction.followup.send(embed=discord.Embed(description=" No Lambda functions found.", color=discord.Color.orange()), ephemeral=True)
+                return
+            update_config_cache(role_arn, region, functions)
+            metrics = await run_aws(fetch_fleet_metrics, clients['cloudwatch'], [f['FunctionName'] for f in functions], window_delta)
+            fleet = build_fleet(functions, metrics, sort_by)
+            if export:
+                await send_export(interaction, "lambda-fleet", iter(fleet), export)
+                return
+            total_invocations = sum(f['invocations'] for f in fleet)
+            total_errors = sum(f['errors'] for f in fleet)
+            embed = discord.Embed(
+                title="\u26A1 Lambda Fleet",
+                description=(
+                    f"{len(fleet)} functions, {int(total_invocations):,} invocations, {int(total_errors):,} errors "
+                    f"over {window} (sorted by {sort_by})"
+                ),
+                color=discord.Color.gold()
+            )
+            for f in fleet[:15]:
+                duration = f"{f['duration_p95']:.0f}ms" if f['duration_p95'] is not None else "n/a"
+                embed.add_field(
+                    name=f['name'],
+                    value=(
+                        f"{f['runtime']} | Inv: **{int(f['invocations']):,}** | Err: **{int(f['errors']):,}** "
+                        f"({f['error_rate']:.1%}) | Thr: {int(f['throttles']):,} | p95: {duration}"
+                    ),
+                    inline=False
+                )
+            if len(fleet) > 15:
+                embed.add_field(name="...", value=f"And {len(fleet) - 15} more", inline=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
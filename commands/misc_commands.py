@@ -1,9 +1,13 @@
 import discord
 from app.utils import load_roles, save_roles
 from app.decorators import admin_only, allowed_channel_only
+from app.loop_monitor import WINDOW_SECONDS, loop_monitor
+from app.scheduler import scheduler
 
 
 def register_misc_commands(bot):
+    bot.add_listener(loop_monitor.start, "on_ready")
+
     @bot.slash_command(name='commands', description='List all available AWS commands')
     @allowed_channel_only()
     @admin_only()
@@ -11,19 +15,55 @@ def register_misc_commands(bot):
         embed = discord.Embed(title="AWS Bot Commands", color=discord.Color.green())
         embed.add_field(name="Configure AWS account with cloudcommander", value="`/setup-role`,`/view-role`,`/remove-role` ", inline=False)
         embed.add_field(name="Your Region", value="`/set-region`,`/view-region`, `/switch-region`, `/reset-region` ", inline=False)
-        embed.add_field(name="EC2", value="`/ec2-list`, `/ec2-start`, `/ec2-stop`, `/ec2-metrics`", inline=False)
-        embed.add_field(name="EBS", value="`/ebs-list`", inline=False)
-        embed.add_field(name="RDS", value="`/rds-list`, `/rds-start`, `/rds-stop`, `/rds-metrics`", inline=False)
-        embed.add_field(name="S3", value="`/s3-list`, `/s3-metrics`", inline=False)
-        embed.add_field(name="Lambda", value="`/lambda-list`, `/lambda-metrics`", inline=False)
-        embed.add_field(name="CloudFormation", value="`/cf-list`, `/cf-describe`", inline=False)
+        embed.add_field(name="EC2", value="`/ec2-list`, `/ec2-start`, `/ec2-stop`, `/ec2-bulk-start`, `/ec2-bulk-stop`, `/ec2-metrics`", inline=False)
+        embed.add_field(name="EBS", value="`/ebs-list`, `/ebs-report`", inline=False)
+        embed.add_field(name="RDS", value="`/rds-list`, `/rds-start`, `/rds-stop`, `/rds-bulk-start`, `/rds-bulk-stop`, `/rds-metrics`", inline=False)
+        embed.add_field(name="S3", value="`/s3-list`, `/s3-metrics`, `/s3-analyze`, `/s3-inventory`", inline=False)
+        embed.add_field(name="Lambda", value="`/lambda-list`, `/lambda-fleet`, `/lambda-metrics`", inline=False)
+        embed.add_field(name="CloudFormation", value="`/cf-list`, `/cf-describe`, `/cf-watch`", inline=False)
         embed.add_field(name="CloudWatch", value="`/cloudwatch-summary`", inline=False)
-        embed.add_field(name="Networking", value="`/network-status`", inline=False)
-        embed.add_field(name="Billing & Cost", value="`/billing-summary`", inline=False)
-        embed.add_field(name="Leave the server", value="`/leave-server`", inline=False)
-        embed.add_field(name="Alerts", value="`/setup-alert`", inline=False)
+        embed.add_field(name="Networking", value="`/network-status`, `/sg-exposure`, `/route-lookup`", inline=False)
+        embed.add_field(name="Tags", value="`/tag-query`", inline=False)
+        embed.add_field(name="Billing & Cost", value="`/billing-summary`, `/cost-forecast`", inline=False)
+        embed.add_field(name="Bot", value="`/bot-health`, `/leave-server`", inline=False)
+        embed.add_field(name="Alerts", value="`/setup-alert`, `/feed-enable`, `/feed-disable`, `/digest-enable`, `/digest-disable`, `/digest-now`", inline=False)
         await interaction.response.send_message(embed=embed)
 
+    @bot.slash_command(name='bot-health', description='Show event-loop lag, blocking calls and AWS queue depth')
+    @allowed_channel_only()
+    @admin_only()
+    async def bot_health(interaction: discord.Interaction):
+        loop = loop_monitor.stats()
+        aws = scheduler.stats()
+        embed = discord.Embed(
+            title="Bot Health",
+            color=discord.Color.orange() if loop['blocked'] else discord.Color.green())
+        embed.add_field(
+            name=f"Event loop lag (last {WINDOW_SECONDS // 60} min)",
+            value=(
+                f"p50 {loop['lag_p50'] * 1000:.0f}ms · p95 {loop['lag_p95'] * 1000:.0f}ms · "
+                f"p99 {loop['lag_p99'] * 1000:.0f}ms · max {loop['lag_max'] * 1000:.0f}ms\n"
+                f"Blocked {loop['blocked']} times for {loop['blocked_seconds']:.1f}s"
+            ),
+            inline=False)
+        if loop['top_blockers']:
+            embed.add_field(
+                name="Top blocking calls (since start)",
+                value="\n".join(
+                    f"`{b['culprit']}` {b['count']}x, max {b['max'] * 1000:.0f}ms"
+                    for b in loop['top_blockers']
+                )[:1024],
+                inline=False)
+        embed.add_field(
+            name="AWS scheduler",
+            value=(
+                f"Running {aws['running']}\n"
+                f"Queued {', '.join(f'{k} {v}' for k, v in aws['queued'].items())}\n"
+                f"Shed {', '.join(f'{k} {v}' for k, v in aws['shed'].items())}"
+            ),
+            inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @bot.slash_command(name="leave-server", description="Bot will clean up and leave server.")
     @discord.default_permissions(administrator=True)
     async def leave_server(interaction: discord.Interaction):
@@ -1,13 +1,62 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.network_index import get_network_index, cached_network_index, get_route_engine
+from app.scheduler import AwsBusyError
 from app.decorators import admin_only, allowed_channel_only
+from app.export import send_export
+from app.discord_output import send_paginated
+
+def iter_network(ec2, operation, key):
+    for page in ec2.get_paginator(operation).paginate():
+        yield from page.get(key, [])
+
+def list_network(ec2, operation, key):
+    return list(iter_network(ec2, operation, key))
+
+def network_export_rows(ec2):
+    # Pages are fetched as the export writes them, nothing is held beyond the current page
+    for v in iter_network(ec2, 'describe_vpcs', 'Vpcs'):
+        yield {'type': 'vpc', 'id': v['VpcId'], 'vpc_id': v['VpcId'], 'name': '', 'cidr': v.get('CidrBlock', '')}
+    for s in iter_network(ec2, 'describe_subnets', 'Subnets'):
+        yield {'type': 'subnet', 'id': s['SubnetId'], 'vpc_id': s['VpcId'], 'name': s.get('AvailabilityZone', ''), 'cidr': s.get('CidrBlock', '')}
+    for r in iter_network(ec2, 'describe_route_tables', 'RouteTables'):
+        yield {'type': 'route_table', 'id': r['RouteTableId'], 'vpc_id': r['VpcId'], 'name': '', 'cidr': ''}
+    for sg in iter_network(ec2, 'describe_security_groups', 'SecurityGroups'):
+        yield {'type': 'security_group', 'id': sg['GroupId'], 'vpc_id': sg.get('VpcId', ''), 'name': sg['GroupName'], 'cidr': ''}
+    for n in iter_network(ec2, 'describe_network_acls', 'NetworkAcls'):
+        yield {'type': 'network_acl', 'id': n['NetworkAclId'], 'vpc_id': n['VpcId'], 'name': '', 'cidr': ''}
+
+def _chunked_fields(name, lines, limit=1000):
+    # One field per chunk that fits Discord's field limit, send_paginated spreads them over embeds
+    fields = []
+    value = ""
+    for line in lines:
+        if value and len(value) + len(line) + 1 > limit:
+            fields.append((name if not fields else f"{name} (cont.)", value, False))
+            value = ""
+        value = f"{value}\n{line}" if value else line
+    fields.append((name if not fields else f"{name} (cont.)", value or "None", False))
+    return fields
+
+def _field_lines(lines, limit=1000):
+    value = ""
+    for i, line in enumerate(lines):
+        if len(value) + len(line) + 1 > limit:
+            return value + f"\n... and {len(lines) - i} more"
+        value = f"{value}\n{line}" if value else line
+    return value or "None"
+
+def _parse_ports(ports):
+    if not ports:
+        return []
+    return [int(p.strip()) for p in ports.split(',') if p.strip()]
 
 def register_network_commands(bot):
     @bot.slash_command(name='network-status', description='Show complete network info')
     @admin_only()
     @allowed_channel_only()
-    async def network_status(interaction: discord.Interaction):
+    async def network_status(interaction: discord.Interaction, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -16,38 +65,125 @@ def register_network_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            ec2 = get_assumed_clients(role_arn, region)['ec2']
-            vpcs = ec2.describe_vpcs().get('Vpcs', [])
-            subnets = ec2.describe_subnets().get('Subnets', [])
-            route_tables = ec2.describe_route_tables().get('RouteTables', [])
-            sgs = ec2.describe_security_groups().get('SecurityGroups', [])
-            nacls = ec2.describe_network_acls().get('NetworkAcls', [])
-            embed = discord.Embed(title=" Network Status", color=discord.Color.dark_blue())
-            embed.add_field(
-                name=" VPCs",
-                value="\n".join([f"ID:`{v['VpcId']}` CIDR:({v['CidrBlock']})" for v in vpcs]) or "None",
-                inline=False
-            )
-            embed.add_field(
-                name=" Subnets",
-                value="\n".join([f"ID:`{s['SubnetId']}` ({s['VpcId']})" for s in subnets[:5]]) + ("\n..." if len(subnets) > 5 else "") if subnets else "None",
-                inline=False
-            )
-            embed.add_field(
-                name=" Route Tables",
-                value="\n".join([f"ID:`{r['RouteTableId']}` ({r['VpcId']})" for r in route_tables]) or "None",
-                inline=False
-            )
-            embed.add_field(
-                name=" Security Groups",
-                value="\n".join([f"ID:`{sg['GroupId']}` Name:({sg['GroupName']}) | ({sg['VpcId']})" for sg in sgs[:5]]) + ("\n..." if len(sgs) > 5 else "") if sgs else "None",
-                inline=False
-            )
-            embed.add_field(
-                name=" NACLs",
-                value="\n".join([f"ID:`{n['NetworkAclId']}` ({n['VpcId']})" for n in nacls]) or "None",
-                inline=False
+            ec2 = (await run_aws(get_assumed_clients, role_arn, region))['ec2']
+            if export:
+                await send_export(interaction, "network", network_export_rows(ec2), export)
+                return
+            vpcs = await run_aws(list_network, ec2, 'describe_vpcs', 'Vpcs')
+            subnets = await run_aws(list_network, ec2, 'describe_subnets', 'Subnets')
+            route_tables = await run_aws(list_network, ec2, 'describe_route_tables', 'RouteTables')
+            sgs = await run_aws(list_network, ec2, 'describe_security_groups', 'SecurityGroups')
+            nacls = await run_aws(list_network, ec2, 'describe_network_acls', 'NetworkAcls')
+            fields = []
+            fields += _chunked_fields(" VPCs", [f"ID:`{v['VpcId']}` CIDR:({v.get('CidrBlock', '')})" for v in vpcs])
+            fields += _chunked_fields(" Subnets", [f"ID:`{s['SubnetId']}` ({s['VpcId']})" for s in subnets[:5]] + (["..."] if len(subnets) > 5 else []))
+            fields += _chunked_fields(" Route Tables", [f"ID:`{r['RouteTableId']}` ({r['VpcId']})" for r in route_tables])
+            fields += _chunked_fields(" Security Groups", [f"ID:`{sg['GroupId']}` Name:({sg['GroupName']}) | ({sg.get('VpcId', '')})" for sg in sgs[:5]] + (["..."] if len(sgs) > 5 else []))
+            fields += _chunked_fields(" NACLs", [f"ID:`{n['NetworkAclId']}` ({n['VpcId']})" for n in nacls])
+            await send_paginated(interaction, " Network Status", fields, discord.Color.dark_blue())
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='sg-exposure', description='Analyze security group and NACL exposure for ports and CIDRs')
+    @admin_only()
+    @allowed_channel_only()
+    async def sg_exposure(interaction: discord.Interaction, ports: str = "22,3389", cidr: str = "0.0.0.0/0", protocol: str = "tcp", refresh: bool = False):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(
+                embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            port_list = _parse_ports(ports)
+        except ValueError:
+            await interaction.followup.send(
+                embed=discord.Embed(description=f" Invalid port list `{ports}`.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            stale = False
+            try:
+                ec2 = (await run_aws(get_assumed_clients, role_arn, region))['ec2']
+                index = await run_aws(get_network_index, role_arn, region, ec2, refresh)
+            except AwsBusyError:
+                index = cached_network_index(role_arn, region)
+                if index is None:
+                    raise
+                stale = True
+            rules = {}
+            for port in port_list or [None]:
+                for r in index.query(port=port, cidr=cidr, protocol=protocol):
+                    rules[r] = None
+            sg_lines = [
+                f"`{r.resource_id}` ({r.resource_name}) {r.protocol} {r.from_port}-{r.to_port} from `{r.cidr}`"
+                for r in rules if r.source == 'sg'
+            ]
+            nacl_lines = [
+                f"`{r.resource_id}` #{r.rule_number} **{r.action}** {r.protocol} {r.from_port}-{r.to_port} from `{r.cidr}`"
+                for r in rules if r.source == 'nacl'
+            ]
+            reachable = index.internet_reachable(port_list, protocol=protocol)
+            instance_lines = []
+            for inst, exposed in reachable:
+                name = next((t['Value'] for t in inst.get('Tags', []) if t['Key'] == 'Name'), inst['InstanceId'])
+                shown = ", ".join(str(p) if isinstance(p, int) else f"{p[0]}-{p[1]}" for p in exposed)
+                instance_lines.append(f"`{name}` {inst.get('PublicIpAddress', '')} ports: {shown}")
+            embed = discord.Embed(
+                title=f" Exposure: {protocol} {ports or 'any port'} from {cidr}",
+                description=(
+                    f"Indexed **{len(index.rules)}** rules across {len(index.groups)} security groups and {len(index.nacl_entries)} NACLs."
+                    + (" (cached, AWS is busy)" if stale else "")
+                ),
+                color=discord.Color.red() if sg_lines else discord.Color.green()
             )
-            await interaction.followup.send(embed=embed,ephemeral=True)
+            embed.add_field(name=f" Security Group Rules ({len(sg_lines)})", value=_field_lines(sg_lines), inline=False)
+            embed.add_field(name=f" NACL Entries ({len(nacl_lines)})", value=_field_lines(nacl_lines), inline=False)
+            embed.add_field(name=f" Internet-Reachable Instances ({len(instance_lines)})", value=_field_lines(instance_lines), inline=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='route-lookup', description='Resolve the effective route for an IP from a subnet, or every subnet in a VPC')
+    @admin_only()
+    @allowed_channel_only()
+    async def route_lookup(interaction: discord.Interaction, subnet: str, ip: str):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(
+                embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            ec2 = (await run_aws(get_assumed_clients, role_arn, region))['ec2']
+            if subnet.startswith('vpc-'):
+                subnet_filter = {'Filters': [{'Name': 'vpc-id', 'Values': [subnet]}]}
+            else:
+                subnet_filter = {'SubnetIds': [subnet]}
+            subnets = await run_aws(lambda: ec2.describe_subnets(**subnet_filter).get('Subnets', []))
+            if not subnets:
+                await interaction.followup.send(
+                    embed=discord.Embed(description=f" No subnets found for `{subnet}`.", color=discord.Color.orange()), ephemeral=True)
+                return
+            engine = await run_aws(get_route_engine, role_arn, region, ec2)
+            lines = []
+            for s in subnets:
+                rt_id = engine.table_for_subnet(s['SubnetId'], s['VpcId'])
+                route = engine.lookup(rt_id, ip) if rt_id else None
+                if route is None:
+                    lines.append(f"`{s['SubnetId']}` → **no route** (`{rt_id or 'no table'}`)")
+                    continue
+                via = f" via `{route.prefix_list_id}`" if route.prefix_list_id else ""
+                lines.append(
+                    f"`{s['SubnetId']}` → `{route.target}` ({route.destination}{via}, {route.state}) [`{rt_id}`]"
+                )
+            embed = discord.Embed(title=f" Route lookup for `{ip}`", color=discord.Color.dark_blue())
+            embed.add_field(name=f" {subnet} ({len(subnets)} subnets)", value=_field_lines(lines), inline=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -1,5 +1,5 @@
 import discord
-from app.utils import load_roles, save_roles
+from app.utils import load_roles, save_roles, invalidate_guild_auth
 
 ADMIN_ROLE = "CloudCommanderUser"
 
@@ -40,3 +40,15 @@ def register_onboarding_events(bot):
             color=discord.Color.green()
         ))
         await setup_msg.pin()
+
+    @bot.event
+    async def on_guild_role_update(before, after):
+        invalidate_guild_auth(after.guild.id)
+
+    @bot.event
+    async def on_guild_role_delete(role):
+        invalidate_guild_auth(role.guild.id)
+
+    @bot.event
+    async def on_guild_remove(guild):
+        invalidate_guild_auth(guild.id)
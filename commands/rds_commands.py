@@ -1,14 +1,34 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
+from app.bulk_actions import (
+    RDS_TARGET_STATES, RDS_ACTIONABLE_STATES, RDS_TRANSITION_STATES, parse_names, parse_tags, resolve_rds_instances,
+    rds_power, rds_states, build_progress_embed, wait_for_states
+)
 from app.decorators import admin_only, allowed_channel_only
-from datetime import datetime, timedelta
+from app.export import send_export
+from app.discord_output import send_paginated
+from app.metrics import parse_window, parse_statistic, choose_period, fetch_metric_series, format_metric_value
+
+def rds_export_rows(rds):
+    for page in rds.get_paginator('describe_db_instances').paginate():
+        for db in page['DBInstances']:
+            yield {
+                'db_instance_id': db['DBInstanceIdentifier'],
+                'status': db['DBInstanceStatus'],
+                'engine': db.get('Engine'),
+                'engine_version': db.get('EngineVersion'),
+                'instance_class': db.get('DBInstanceClass'),
+                'allocated_storage_gib': db.get('AllocatedStorage'),
+                'multi_az': db.get('MultiAZ'),
+                'endpoint': db.get('Endpoint', {}).get('Address', ''),
+            }
 
 def register_rds_commands(bot):
     @bot.slash_command(name='rds-list', description='List RDS instances')
     @admin_only()
     @allowed_channel_only()
-    async def rds_list(interaction: discord.Interaction):
+    async def rds_list(interaction: discord.Interaction, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -16,15 +36,16 @@ def register_rds_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            rds = get_assumed_clients(role_arn, region)['rds']
-            instances = rds.describe_db_instances().get('DBInstances', [])
+            rds = (await run_aws(get_assumed_clients, role_arn, region))['rds']
+            if export:
+                await send_export(interaction, "rds-instances", rds_export_rows(rds), export)
+                return
+            instances = (await run_aws(rds.describe_db_instances)).get('DBInstances', [])
             if not instances:
                 await interaction.followup.send(embed=discord.Embed(description=" No RDS instances found.", color=discord.Color.orange()), ephemeral=True)
                 return
-            embed = discord.Embed(title=" RDS Instances", color=discord.Color.purple())
-            for db in instances:
-                embed.add_field(name=db['DBInstanceIdentifier'], value=f"Status: **{db['DBInstanceStatus']}**", inline=False)
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            fields = [(db['DBInstanceIdentifier'], f"Status: **{db['DBInstanceStatus']}**", False) for db in instances]
+            await send_paginated(interaction, " RDS Instances", fields, discord.Color.purple())
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
 
@@ -39,8 +60,8 @@ def register_rds_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            rds = get_assumed_clients(role_arn, region)['rds']
-            rds.start_db_instance(DBInstanceIdentifier=db_id)
+            rds = (await run_aws(get_assumed_clients, role_arn, region))['rds']
+            await run_aws(rds.start_db_instance, DBInstanceIdentifier=db_id)
             await interaction.followup.send(embed=discord.Embed(description=f" Started `{db_id}`", color=discord.Color.green()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -56,8 +77,8 @@ def register_rds_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            rds = get_assumed_clients(role_arn, region)['rds']
-            rds.stop_db_instance(DBInstanceIdentifier=db_id)
+            rds = (await run_aws(get_assumed_clients, role_arn, region))['rds']
+            await run_aws(rds.stop_db_instance, DBInstanceIdentifier=db_id)
             await interaction.followup.send(embed=discord.Embed(description=f" Stopped `{db_id}`", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -65,18 +86,19 @@ def register_rds_commands(bot):
     @bot.slash_command(name='rds-metrics', description='Show RDS CloudWatch metrics')
     @admin_only()
     @allowed_channel_only()
-    async def rds_metrics(interaction: discord.Interaction, db_id: str):
+    async def rds_metrics(interaction: discord.Interaction, db_id: str, window: str = "1h", period: int = None, statistic: str = "Average"):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
             await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
             return
         try:
+            window_delta = parse_window(window)
+            stat = parse_statistic(statistic)
+            period = choose_period(window_delta, period)
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             cloudwatch = clients['cloudwatch']
-            end = datetime.utcnow()
-            start = end - timedelta(hours=1)
             metrics = [
                 "CPUUtilization", "DatabaseConnections", "FreeStorageSpace",
                 "ReadIOPS", "WriteIOPS", "ReadLatency", "WriteLatency"
@@ -90,26 +112,72 @@ def register_rds_commands(bot):
                 "ReadLatency": "ms",
                 "WriteLatency": "ms"
             }
-            embed = discord.Embed(title=f" RDS Metrics for `{db_id}`", color=discord.Color.dark_orange())
+            series = await run_aws(
+                fetch_metric_series, cloudwatch, (role_arn, region), 'AWS/RDS',
+                [{'Name': 'DBInstanceIdentifier', 'Value': db_id}], metrics, window_delta, period,
+                {m: stat for m in metrics}
+            )
+            embed = discord.Embed(title=f" RDS Metrics for `{db_id}`", description=f"{stat} over {window}, {period}s period", color=discord.Color.dark_orange())
             for metric in metrics:
-                stats = cloudwatch.get_metric_statistics(
-                    Namespace='AWS/RDS',
-                    MetricName=metric,
-                    Dimensions=[{'Name': 'DBInstanceIdentifier', 'Value': db_id}],
-                    StartTime=start,
-                    EndTime=end,
-                    Period=300,
-                    Statistics=['Average']
-                )
-                datapoints = stats.get('Datapoints', [])
-                avg = datapoints[-1]['Average'] if datapoints else 0
-                if metric == "FreeStorageSpace":
-                    avg = round(avg / (1024 ** 3), 2)
-                else:
-                    avg = round(avg, 2)
-                unit = unit_map.get(metric, "")
-                value_display = f"**{avg} {unit}**"
-                embed.add_field(name=metric, value=value_display, inline=True)
+                scale = 1024 ** 3 if metric == "FreeStorageSpace" else 1
+                embed.add_field(name=metric, value=format_metric_value(series[metric], unit_map.get(metric, ""), scale), inline=False)
             await interaction.followup.send(embed=embed, ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    async def rds_bulk(interaction, action, names, tags):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            names = parse_names(names)
+            tags = parse_tags(tags)
+            if not names and not tags:
+                await interaction.followup.send(embed=discord.Embed(description=" Provide `names` and/or `tags` to select DB instances.", color=discord.Color.orange()), ephemeral=True)
+                return
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            rds = (await run_aws(get_assumed_clients, role_arn, region))['rds']
+            instances = await run_aws(resolve_rds_instances, rds, names, tags)
+            if not instances:
+                await interaction.followup.send(embed=discord.Embed(description=" No matching RDS instances found.", color=discord.Color.orange()), ephemeral=True)
+                return
+            target_state = RDS_TARGET_STATES[action]
+            to_change = [db_id for db_id, db in instances.items() if db['state'] == RDS_ACTIONABLE_STATES[action]]
+            skipped = {
+                db_id: db for db_id, db in instances.items()
+                if db['state'] not in (target_state, RDS_ACTIONABLE_STATES[action], *RDS_TRANSITION_STATES[action])
+            }
+            errors = await rds_power(rds, to_change, action) if to_change else {}
+            lines = [f"`{db['name']}`: skipped, instance is {db['state']}" for db in skipped.values()]
+            lines += [f"`{db_id}`: {format_aws_error(e)}" for db_id, e in errors.items()]
+            for db_id in list(skipped) + list(errors):
+                instances.pop(db_id)
+            if lines:
+                await interaction.followup.send(embed=discord.Embed(
+                    description="\n".join(lines)[:4000],
+                    color=discord.Color.red() if errors else discord.Color.orange()), ephemeral=True)
+            if not instances:
+                return
+            title = f"RDS bulk {action} ({len(instances)} instances)"
+            message = await interaction.followup.send(embed=build_progress_embed(title, instances, target_state), ephemeral=True, wait=True)
+            await wait_for_states(interaction, message, title, instances, target_state, lambda ids: rds_states(rds, ids))
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='rds-bulk-start', description='Start RDS instances by name list or tag selectors')
+    @admin_only()
+    @allowed_channel_only()
+    async def rds_bulk_start(interaction: discord.Interaction, names: str = None, tags: str = None):
+        await rds_bulk(interaction, 'start', names, tags)
+
+    @bot.slash_command(name='rds-bulk-stop', description='Stop RDS instances by name list or tag selectors')
+    @admin_only()
+    @allowed_channel_only()
+    async def rds_bulk_stop(interaction: discord.Interaction, names: str = None, tags: str = None):
+        await rds_bulk(interaction, 'stop', names, tags)
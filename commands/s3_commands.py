@@ -1,14 +1,54 @@
 import discord
 from app.utils import get_user_role_arn, get_user_region, format_aws_error
-from app.aws_clients import get_assumed_clients
+from app.aws_clients import get_assumed_clients, run_aws
 from app.decorators import admin_only, allowed_channel_only
+from app.export import send_export
+from app.s3_analysis import BucketScan, AGE_LABELS, format_size, load_bucket_stats
+from app.s3_inventory import ingest_inventory
+from app.s3_overview import build_bucket_overview
 from datetime import datetime, timedelta
+import asyncio
+import time
+
+# Interaction tokens expire after 15 minutes, later updates go to the channel
+SCAN_FOLLOWUP_WINDOW = 14 * 60
+SCAN_PROGRESS_INTERVAL = 15
+
+S3_LIST_PAGE_SIZE = 20
+
+active_scans = {}
+
+def add_stats_fields(embed, stats):
+    prefixes = "\n".join(f"`{p}` {format_size(v[1])} ({v[0]:,})" for p, v in stats.top_prefixes())
+    embed.add_field(name="Top Prefixes", value=prefixes or "None", inline=False)
+    largest = "\n".join(f"`{key[:80]}` {format_size(size)}" for size, key in sorted(stats.largest, reverse=True))
+    embed.add_field(name="Largest Objects", value=largest or "None", inline=False)
+    ages = " | ".join(f"{label}: {count:,}" for label, count in zip(AGE_LABELS, stats.ages))
+    embed.add_field(name="Age", value=ages, inline=False)
+    classes = "\n".join(
+        f"{sc}: {format_size(v[1])} ({v[0]:,})"
+        for sc, v in sorted(stats.storage_classes.items(), key=lambda i: i[1][1], reverse=True)
+    )
+    embed.add_field(name="Storage Classes", value=classes or "None", inline=False)
+
+def build_scan_embed(bucket_name, scan, finished=False):
+    stats = scan.stats
+    title = f" S3 Analysis for `{bucket_name}`" + ("" if finished else " (scanning...)")
+    embed = discord.Embed(title=title, color=discord.Color.dark_blue() if finished else discord.Color.blurple())
+    embed.add_field(name="Objects", value=f"{stats.count:,}", inline=True)
+    embed.add_field(name="Total Size", value=format_size(stats.total_size), inline=True)
+    progress = f"{scan.pages:,} pages, {len(scan.pending)} key ranges queued, {len(scan.active)} in progress"
+    if scan.resumed:
+        progress += " (resumed from checkpoint)"
+    embed.add_field(name="Progress", value=progress, inline=False)
+    add_stats_fields(embed, stats)
+    return embed
 
 def register_s3_commands(bot):
     @bot.slash_command(name='s3-list', description='List all S3 buckets')
     @admin_only()
     @allowed_channel_only()
-    async def s3_list(interaction: discord.Interaction):
+    async def s3_list(interaction: discord.Interaction, page: int = 1, export: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -16,14 +56,29 @@ def register_s3_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            s3 = get_assumed_clients(role_arn, region)['s3']
-            buckets = s3.list_buckets().get('Buckets', [])
+            s3 = (await run_aws(get_assumed_clients, role_arn, region))['s3']
+            buckets = await build_bucket_overview(role_arn, s3)
+            if export:
+                await send_export(interaction, "s3-buckets", iter(buckets), export)
+                return
             if not buckets:
                 await interaction.followup.send(embed=discord.Embed(description=" No S3 buckets found.", color=discord.Color.orange()), ephemeral=True)
                 return
-            embed = discord.Embed(title="\U0001FAA3 S3 Buckets", color=discord.Color.blue())
-            for b in buckets:
-                embed.add_field(name=b['Name'], value="", inline=False)
+            pages = (len(buckets) + S3_LIST_PAGE_SIZE - 1) // S3_LIST_PAGE_SIZE
+            page = max(1, min(page, pages))
+            total_size = sum(b['size'] for b in buckets)
+            embed = discord.Embed(
+                title="\U0001FAA3 S3 Buckets",
+                description=f"{len(buckets)} buckets, {format_size(total_size)} (Standard storage)",
+                color=discord.Color.blue()
+            )
+            for b in buckets[(page - 1) * S3_LIST_PAGE_SIZE:page * S3_LIST_PAGE_SIZE]:
+                embed.add_field(
+                    name=b['name'],
+                    value=f"Region: `{b['region']}` | Size: **{format_size(b['size'])}** | Objects: **{int(b['objects']):,}**",
+                    inline=False
+                )
+            embed.set_footer(text=f"Page {page}/{pages}")
             await interaction.followup.send(embed=embed,ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -31,7 +86,7 @@ def register_s3_commands(bot):
     @bot.slash_command(name='s3-metrics', description='Show S3 CloudWatch metrics')
     @admin_only()
     @allowed_channel_only()
-    async def s3_metrics(interaction: discord.Interaction, bucket_name: str):
+    async def s3_metrics(interaction: discord.Interaction, bucket_name: str, prefix: str = None):
         await interaction.response.defer(ephemeral=True)
         role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
         if not role_arn:
@@ -39,11 +94,11 @@ def register_s3_commands(bot):
             return
         try:
             region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
-            clients = get_assumed_clients(role_arn, region)
+            clients = await run_aws(get_assumed_clients, role_arn, region)
             s3 = clients['s3']
             cloudwatch = clients['cloudwatch']
             try:
-                s3.head_bucket(Bucket=bucket_name)
+                await run_aws(s3.head_bucket, Bucket=bucket_name)
             except s3.exceptions.NoSuchBucket:
                 await interaction.followup.send(embed=discord.Embed(description=f" Bucket `{bucket_name}` not found.", color=discord.Color.red()), ephemeral=True)
                 return
@@ -59,7 +114,8 @@ def register_s3_commands(bot):
                 ("NumberOfObjects", "AllStorageTypes", "Object Count")
             ]
             for metric, storage_type, label in metrics:
-                stats = cloudwatch.get_metric_statistics(
+                stats = await run_aws(
+                    cloudwatch.get_metric_statistics,
                     Namespace='AWS/S3',
                     MetricName=metric,
                     Dimensions=[
@@ -83,6 +139,81 @@ def register_s3_commands(bot):
                 else:
                     value_display = f"{int(avg):,}"
                 embed.add_field(name=label, value=value_display, inline=False)
+            cached = load_bucket_stats(bucket_name)
+            if cached:
+                stats = cached['stats']
+                embed.add_field(name="Detailed Stats", value=f"From {cached['source']}, updated `{cached['updated'][:16]}`", inline=False)
+                if prefix:
+                    totals = stats.prefixes.get(prefix if prefix.endswith('/') else prefix + '/')
+                    value_display = f"{format_size(totals[1])} in {totals[0]:,} objects" if totals else "No objects recorded under this prefix."
+                    embed.add_field(name=f"Prefix `{prefix}`", value=value_display, inline=False)
+                else:
+                    add_stats_fields(embed, stats)
             await interaction.followup.send(embed=embed,ephemeral=True)
         except Exception as e:
             await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
+
+    @bot.slash_command(name='s3-analyze', description='Scan a bucket for prefix, size, age and storage class breakdowns')
+    @admin_only()
+    @allowed_channel_only()
+    async def s3_analyze(interaction: discord.Interaction, bucket_name: str, workers: int = 8, resume: bool = True):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        if bucket_name in active_scans:
+            await interaction.followup.send(embed=discord.Embed(description=f" A scan of `{bucket_name}` is already running.", color=discord.Color.orange()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            s3 = (await run_aws(get_assumed_clients, role_arn, region))['s3']
+            scan = BucketScan(s3, bucket_name, workers=max(1, min(workers, 32)), resume=resume)
+            active_scans[bucket_name] = scan
+            task = asyncio.create_task(scan.run())
+            task.add_done_callback(lambda _: active_scans.pop(bucket_name, None))
+            message = await interaction.followup.send(embed=build_scan_embed(bucket_name, scan), ephemeral=True, wait=True)
+            deadline = time.monotonic() + SCAN_FOLLOWUP_WINDOW
+            while not task.done() and time.monotonic() < deadline:
+                await asyncio.wait({task}, timeout=SCAN_PROGRESS_INTERVAL)
+                if not task.done():
+                    await message.edit(embed=build_scan_embed(bucket_name, scan))
+            if not task.done():
+                await message.edit(embed=build_scan_embed(bucket_name, scan))
+                await interaction.followup.send(embed=discord.Embed(
+                    description=f" Scan of `{bucket_name}` is still running, the report will be posted in this channel when it finishes.",
+                    color=discord.Color.blurple()), ephemeral=True)
+                await task
+                await interaction.channel.send(embed=build_scan_embed(bucket_name, scan, finished=True))
+                return
+            task.result()
+            await message.edit(embed=build_scan_embed(bucket_name, scan, finished=True))
+        except Exception as e:
+            active_scans.pop(bucket_name, None)
+            error = discord.Embed(description=format_aws_error(e), color=discord.Color.red())
+            try:
+                await interaction.followup.send(embed=error, ephemeral=True)
+            except discord.HTTPException:
+                await interaction.channel.send(embed=error)
+
+    @bot.slash_command(name='s3-inventory', description='Ingest the latest S3 Inventory report for bucket-wide statistics')
+    @admin_only()
+    @allowed_channel_only()
+    async def s3_inventory(interaction: discord.Interaction, bucket_name: str):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            s3 = (await run_aws(get_assumed_clients, role_arn, region))['s3']
+            stats = await run_aws(ingest_inventory, s3, bucket_name)
+            cached = load_bucket_stats(bucket_name)
+            embed = discord.Embed(title=f" S3 Inventory for `{bucket_name}`", description=f"From {cached['source']}", color=discord.Color.dark_blue())
+            embed.add_field(name="Objects", value=f"{stats.count:,}", inline=True)
+            embed.add_field(name="Total Size", value=format_size(stats.total_size), inline=True)
+            add_stats_fields(embed, stats)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
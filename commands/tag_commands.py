@@ -0,0 +1,63 @@
+import json
+import discord
+from app.utils import get_user_role_arn, get_user_region, format_aws_error
+from app.aws_clients import get_assumed_client, run_aws
+from app.decorators import admin_only, allowed_channel_only
+from app.export import send_export
+from app.tag_index import get_tag_index, cached_tag_index, service_counts, arn_service
+from app.scheduler import AwsBusyError
+
+def register_tag_commands(bot):
+    @bot.slash_command(name='tag-query', description='Find resources across all services by tags, e.g. env=prod team=payments')
+    @admin_only()
+    @allowed_channel_only()
+    async def tag_query(interaction: discord.Interaction, query: str, refresh: bool = False, export: str = None):
+        await interaction.response.defer(ephemeral=True)
+        role_arn = get_user_role_arn(interaction.guild_id, interaction.channel_id, interaction.user.id)
+        if not role_arn:
+            await interaction.followup.send(embed=discord.Embed(description=" No IAM role configured.", color=discord.Color.red()), ephemeral=True)
+            return
+        try:
+            region = get_user_region(interaction.guild_id, interaction.channel_id, interaction.user.id)
+            stale = False
+            try:
+                # Getting the client is queued too, so it has to sit inside the busy fallback
+                tagging = await run_aws(get_assumed_client, role_arn, region, 'resourcegroupstaggingapi')
+                index = await run_aws(get_tag_index, role_arn, region, tagging, refresh)
+            except AwsBusyError:
+                # Under load, answer from the last index rather than failing
+                index = cached_tag_index(role_arn, region)
+                if index is None:
+                    raise
+                stale = True
+            arns = index.query(query)
+            if export:
+                rows = ({'arn': arn, 'service': arn_service(arn), 'tags': json.dumps(index.arn_tags.get(arn, {}))} for arn in arns)
+                await send_export(interaction, "tag-query", rows, export)
+                return
+            if not arns:
+                await interaction.followup.send(embed=discord.Embed(description=f" No resources match `{query}`.", color=discord.Color.orange()), ephemeral=True)
+                return
+            embed = discord.Embed(
+                title=f" Resources tagged `{query}`",
+                description=f"**{len(arns)}** of {len(index.arn_tags)} tagged resources in `{region}`" + (" (cached, AWS is busy)" if stale else ""),
+                color=discord.Color.blurple()
+            )
+            embed.add_field(
+                name="Per Service",
+                value="\n".join(f"{service}: **{count}**" for service, count in service_counts(arns)[:15]),
+                inline=False
+            )
+            value = ""
+            for i, arn in enumerate(arns):
+                line = f"`{arn}`"
+                if len(value) + len(line) + 1 > 1000:
+                    value += f"\n... and {len(arns) - i} more"
+                    break
+                value = f"{value}\n{line}" if value else line
+            embed.add_field(name="Resources", value=value, inline=False)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except ValueError as e:
+            await interaction.followup.send(embed=discord.Embed(description=f" {e}", color=discord.Color.red()), ephemeral=True)
+        except Exception as e:
+            await interaction.followup.send(embed=discord.Embed(description=format_aws_error(e), color=discord.Color.red()), ephemeral=True)
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+# Commands import app.* relative to the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest.harness import SoakTest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Soak test Cloud Commander against simulated guilds and a local AWS stand-in")
+    parser.add_argument("--guilds", type=int, default=20, help="simulated guilds")
+    parser.add_argument("--accounts", type=int, default=None, help="distinct AWS accounts shared by the guilds (default: guilds / 2)")
+    parser.add_argument("--users", type=int, default=2, help="configured users per guild")
+    parser.add_argument("--rate", type=float, default=10.0, help="mean commands per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=300, help="seconds of traffic")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between reports")
+    parser.add_argument("--drain", type=float, default=60, help="seconds to wait for in-flight commands at the end")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="commands in flight before new arrivals are rejected")
+    parser.add_argument("--hot-share", type=float, default=0.0, help="share of traffic sent to a single hot guild")
+    parser.add_argument("--feed-share", type=float, default=0.0, help="share of guilds with the change feed enabled")
+    parser.add_argument("--digest-share", type=float, default=0.0, help="share of guilds with a daily digest due during the run")
+    parser.add_argument("--latency-ms", type=float, default=60, help="mean AWS call latency")
+    parser.add_argument("--jitter-ms", type=float, default=40, help="AWS call latency jitter")
+    parser.add_argument("--throttle", type=float, default=0.0, help="probability an AWS call is throttled")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability an AWS call fails with InternalError")
+    parser.add_argument("--instances", type=int, default=60)
+    parser.add_argument("--volumes", type=int, default=80)
+    parser.add_argument("--databases", type=int, default=5)
+    parser.add_argument("--stacks", type=int, default=15)
+    parser.add_argument("--functions", type=int, default=30)
+    parser.add_argument("--buckets", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default=None, help="append one NDJSON report line per interval to this file")
+    parser.add_argument("--workdir", default=None, help="directory for the generated roles.json (default: a temp dir)")
+    parser.add_argument("--tracemalloc", action="store_true", help="print the top allocation growth at the end")
+    args = parser.parse_args()
+    if args.out:
+        args.out = os.path.abspath(args.out)
+    args.workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="cc-soak-")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Soak test: {args.guilds} guilds, {args.rate}/s for {args.duration:.0f}s, working directory {args.workdir}")
+    asyncio.run(SoakTest(args).run())
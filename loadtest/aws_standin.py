@@ -0,0 +1,413 @@
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+
+PAGE_SIZE = 50
+# Points returned per metric query are capped like CloudWatch's per-call limit
+MAX_METRIC_POINTS = 1440
+
+LIST_KEYS = {
+    'describe_instances': 'Reservations',
+    'describe_volumes': 'Volumes',
+    'describe_snapshots': 'Snapshots',
+    'describe_db_instances': 'DBInstances',
+    'list_stacks': 'StackSummaries',
+    'list_functions': 'Functions',
+    'list_buckets': 'Buckets',
+    'describe_security_groups': 'SecurityGroups',
+    'describe_network_acls': 'NetworkAcls',
+    'describe_route_tables': 'RouteTables',
+    'describe_vpcs': 'Vpcs',
+    'describe_subnets': 'Subnets',
+    'describe_managed_prefix_lists': 'PrefixLists',
+    'get_managed_prefix_list_entries': 'Entries',
+    'get_resources': 'ResourceTagMappingList',
+}
+SERVICES_BY_COST = [
+    ('Amazon Elastic Compute Cloud - Compute', 40.0), ('Amazon Relational Database Service', 18.0),
+    ('Amazon Simple Storage Service', 6.0), ('AWS Lambda', 2.5), ('Amazon CloudWatch', 1.2),
+]
+
+
+class LatencyModel:
+    def __init__(self, latency_ms=60, jitter_ms=40, throttle_rate=0.0, error_rate=0.0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.calls = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def apply(self, operation):
+        with self.lock:
+            self.calls += 1
+            throttled = random.random() < self.throttle_rate
+            failed = not throttled and random.random() < self.error_rate
+            if throttled:
+                self.throttled += 1
+        # Exponential tail on top of the base latency, like a real API's long tail
+        time.sleep(self.latency + (random.expovariate(1 / self.jitter) if self.jitter else 0))
+        if throttled:
+            raise ClientError({'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, operation)
+        if failed:
+            raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'Injected failure'}}, operation)
+
+
+class Inventory:
+    def __init__(self, account, region, sizes):
+        rng = random.Random(zlib.crc32(f"{account}:{region}".encode()))
+        now = datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+        self.account = account
+        self.region = region
+        azs = [f"{region}a", f"{region}b"]
+        self.vpcs = [{'VpcId': f"vpc-{account[-4:]}{i:04x}", 'CidrBlock': f"10.{i}.0.0/16"} for i in range(2)]
+        self.subnets = [
+            {'SubnetId': f"subnet-{v['VpcId'][-6:]}{j}", 'VpcId': v['VpcId'], 'CidrBlock': f"10.{i}.{j}.0/24",
+             'AvailabilityZone': azs[j % 2]}
+            for i, v in enumerate(self.vpcs) for j in range(4)
+        ]
+        self.security_groups = [
+            {'GroupId': f"sg-{i:08x}", 'GroupName': f"sg-{i}", 'VpcId': self.vpcs[i % 2]['VpcId'],
+             'IpPermissions': [
+                 {'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port,
+                  'IpRanges': [{'CidrIp': rng.choice(['0.0.0.0/0', '10.0.0.0/8', '192.168.0.0/16'])}], 'Ipv6Ranges': []}
+                 for port in rng.sample([22, 80, 443, 3389, 5432, 8080], 3)
+             ]}
+            for i in range(8)
+        ]
+        self.network_acls = [
+            {'NetworkAclId': f"acl-{v['VpcId'][-6:]}", 'VpcId': v['VpcId'],
+             'Entries': [
+                 {'RuleNumber': 100, 'Protocol': '-1', 'RuleAction': 'allow', 'Egress': False, 'CidrBlock': '0.0.0.0/0'},
+                 {'RuleNumber': 32767, 'Protocol': '-1', 'RuleAction': 'deny', 'Egress': False, 'CidrBlock': '0.0.0.0/0'},
+             ],
+             'Associations': [{'SubnetId': s['SubnetId']} for s in self.subnets if s['VpcId'] == v['VpcId']]}
+            for v in self.vpcs
+        ]
+        self.route_tables = [
+            {'RouteTableId': f"rtb-{v['VpcId'][-6:]}", 'VpcId': v['VpcId'],
+             'Associations': [{'Main': True}],
+             'Routes': [
+                 {'DestinationCidrBlock': v['CidrBlock'], 'GatewayId': 'local', 'State': 'active'},
+                 {'DestinationCidrBlock': '0.0.0.0/0', 'GatewayId': f"igw-{v['VpcId'][-6:]}", 'State': 'active'},
+             ]}
+            for v in self.vpcs
+        ]
+        # Write calls made against this inventory, as CloudTrail and RDS events report them
+        self.trail = []
+        self.db_events = []
+        self.instances = []
+        for i in range(sizes['instances']):
+            subnet = rng.choice(self.subnets)
+            self.instances.append({
+                'InstanceId': f"i-{account[-4:]}{i:08x}",
+                'InstanceType': rng.choice(['t3.micro', 't3.large', 'm5.xlarge', 'c6g.large']),
+                'State': {'Name': rng.choice(['running', 'running', 'running', 'stopped'])},
+                'Placement': {'AvailabilityZone': subnet['AvailabilityZone']},
+                'SubnetId': subnet['SubnetId'],
+                'VpcId': subnet['VpcId'],
+                'PrivateIpAddress': f"10.0.{i // 250}.{i % 250 + 4}",
+                **({'PublicIpAddress': f"54.{i % 250}.{rng.randint(0, 250)}.{rng.randint(1, 250)}"} if rng.random() < 0.4 else {}),
+                'SecurityGroups': [{'GroupId': g['GroupId']} for g in rng.sample(self.security_groups, 2)],
+                'LaunchTime': now - timedelta(days=rng.randint(1, 400)),
+                'Tags': [{'Key': 'Name', 'Value': f"app-{i}"}, {'Key': 'env', 'Value': rng.choice(['prod', 'staging', 'dev'])}],
+            })
+        self.volumes = []
+        for i in range(sizes['volumes']):
+            attached = rng.random() < 0.8 and self.instances
+            volume = {
+                'VolumeId': f"vol-{account[-4:]}{i:08x}",
+                'Size': rng.choice([8, 20, 100, 500]),
+                'VolumeType': rng.choice(['gp2', 'gp3', 'io1', 'st1']),
+                'Iops': 3000,
+                'AvailabilityZone': rng.choice(azs),
+                'CreateTime': now - timedelta(days=rng.randint(1, 400)),
+                'State': 'in-use' if attached else 'available',
+                'Attachments': [{'InstanceId': rng.choice(self.instances)['InstanceId']}] if attached else [],
+            }
+            self.volumes.append(volume)
+        self.snapshots = [
+            {'SnapshotId': f"snap-{i:08x}", 'VolumeId': rng.choice(self.volumes)['VolumeId'] if self.volumes and rng.random() < 0.7 else f"vol-gone{i}",
+             'VolumeSize': rng.choice([8, 100]), 'State': 'completed', 'StartTime': now - timedelta(days=rng.randint(1, 400))}
+            for i in range(sizes['volumes'] // 2)
+        ]
+        self.databases = [
+            {'DBInstanceIdentifier': f"db-{i}", 'DBInstanceStatus': rng.choice(['available', 'available', 'stopped']),
+             'Engine': rng.choice(['postgres', 'mysql']), 'EngineVersion': '15.4', 'DBInstanceClass': 'db.t3.medium',
+             'AllocatedStorage': 100, 'MultiAZ': False, 'Endpoint': {'Address': f"db-{i}.{region}.rds.local"},
+             'TagList': [{'Key': 'env', 'Value': rng.choice(['prod', 'dev'])}]}
+            for i in range(sizes['databases'])
+        ]
+        self.stacks = [
+            {'StackId': f"arn:aws:cloudformation:{region}:{account}:stack/stack-{i}/{i}", 'StackName': f"stack-{i}",
+             'StackStatus': rng.choice(['CREATE_COMPLETE', 'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_COMPLETE', 'CREATE_FAILED']),
+             'CreationTime': now - timedelta(days=rng.randint(1, 300)), 'LastUpdatedTime': now - timedelta(days=rng.randint(0, 30)),
+             'Description': f"Stack {i}", 'Outputs': [{'OutputKey': 'Endpoint', 'OutputValue': f"https://stack-{i}.example"}]}
+            for i in range(sizes['stacks'])
+        ]
+        self.functions = [
+            {'FunctionName': f"fn-{i}", 'Runtime': rng.choice(['python3.12', 'nodejs20.x']), 'MemorySize': 256,
+             'Timeout': 30, 'CodeSize': 1024 * rng.randint(10, 5000), 'LastModified': (now - timedelta(days=i)).isoformat(),
+             'CodeSha256': f"sha{i}", 'Handler': 'app.handler', 'PackageType': 'Zip'}
+            for i in range(sizes['functions'])
+        ]
+        self.buckets = [
+            {'Name': f"{account}-bucket-{i}", 'CreationDate': now - timedelta(days=rng.randint(1, 900)), 'BucketRegion': region}
+            for i in range(sizes['buckets'])
+        ]
+
+    def instance_page_items(self, filters):
+        instances = self.instances
+        for f in filters or []:
+            if f['Name'] == 'instance-state-name':
+                instances = [i for i in instances if i['State']['Name'] in f['Values']]
+            elif f['Name'] == 'tag:Name':
+                instances = [i for i in instances if any(t['Key'] == 'Name' and t['Value'] in f['Values'] for t in i['Tags'])]
+            elif f['Name'] == 'instance-id':
+                instances = [i for i in instances if i['InstanceId'] in f['Values']]
+            elif f['Name'].startswith('tag:'):
+                key = f['Name'][4:]
+                instances = [i for i in instances if any(t['Key'] == key and t['Value'] in f['Values'] for t in i['Tags'])]
+        return [{'Instances': [i]} for i in instances]
+
+    def items(self, operation, kwargs):
+        if operation == 'describe_instances':
+            filters = list(kwargs.get('Filters', []))
+            if kwargs.get('InstanceIds'):
+                filters.append({'Name': 'instance-id', 'Values': kwargs['InstanceIds']})
+            return self.instance_page_items(filters)
+        if operation == 'describe_volumes':
+            statuses = next((f['Values'] for f in kwargs.get('Filters', []) if f['Name'] == 'status'), None)
+            return [v for v in self.volumes if statuses is None or v['State'] in statuses]
+        if operation == 'list_stacks':
+            statuses = kwargs.get('StackStatusFilter')
+            return [s for s in self.stacks if statuses is None or s['StackStatus'] in statuses]
+        if operation == 'describe_subnets':
+            subnets = self.subnets
+            for f in kwargs.get('Filters', []):
+                field = {'subnet-id': 'SubnetId', 'vpc-id': 'VpcId'}.get(f['Name'])
+                if field:
+                    subnets = [s for s in subnets if s[field] in f['Values']]
+            return subnets
+        if operation == 'get_resources':
+            arns = [(f"arn:aws:ec2:{self.region}:{self.account}:instance/{i['InstanceId']}", i['Tags']) for i in self.instances]
+            arns += [(f"arn:aws:rds:{self.region}:{self.account}:db:{d['DBInstanceIdentifier']}", d['TagList']) for d in self.databases]
+            return [{'ResourceARN': arn, 'Tags': tags} for arn, tags in arns]
+        return {
+            'describe_snapshots': self.snapshots,
+            'describe_db_instances': self.databases,
+            'list_functions': self.functions,
+            'list_buckets': self.buckets,
+            'describe_security_groups': self.security_groups,
+            'describe_network_acls': self.network_acls,
+            'describe_route_tables': self.route_tables,
+            'describe_vpcs': self.vpcs,
+            'describe_managed_prefix_lists': [],
+            'get_managed_prefix_list_entries': [],
+        }[operation]
+
+
+class _Exceptions:
+    def __getattr__(self, name):
+        return ClientError
+
+
+class FakePaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        with self.client.inventory.lock:
+            items = list(self.client.inventory.items(self.operation, kwargs))
+        key = LIST_KEYS[self.operation]
+        for start in range(0, max(len(items), 1), PAGE_SIZE):
+            self.client.model.apply(self.operation)
+            yield {key: items[start:start + PAGE_SIZE]}
+
+
+class FakeClient:
+    exceptions = _Exceptions()
+
+    def __init__(self, standin, service, account, region):
+        self.standin = standin
+        self.service = service
+        self.account = account
+        self.region = region
+        self.model = standin.model
+        self._inventory = None
+
+    @property
+    def inventory(self):
+        if self._inventory is None:
+            self._inventory = self.standin.inventory(self.account, self.region)
+        return self._inventory
+
+    def can_paginate(self, operation):
+        return operation in LIST_KEYS
+
+    def get_paginator(self, operation):
+        return FakePaginator(self, operation)
+
+    def __getattr__(self, operation):
+        if operation in LIST_KEYS:
+            def list_call(**kwargs):
+                pages = list(FakePaginator(self, operation).paginate(**kwargs))
+                return {LIST_KEYS[operation]: [item for page in pages for item in page[LIST_KEYS[operation]]]}
+            return list_call
+        handler = getattr(self.standin, f"op_{operation}", None)
+        if handler is None:
+            raise AttributeError(f"Stand-in {self.service} client has no operation {operation}")
+
+        def call(**kwargs):
+            self.model.apply(operation)
+            return handler(self, **kwargs)
+        return call
+
+
+# Stands in for the boto3 module as used by app.aws_clients
+class AwsStandIn:
+    def __init__(self, model, sizes):
+        self.model = model
+        self.sizes = sizes
+        self.inventories = {}
+        self.lock = threading.Lock()
+
+    def inventory(self, account, region):
+        with self.lock:
+            inv = self.inventories.get((account, region))
+            if inv is None:
+                inv = self.inventories[(account, region)] = Inventory(account, region, self.sizes)
+            return inv
+
+    def client(self, service, region_name=None, aws_access_key_id=None, **kwargs):
+        # Credentials minted by the fake assume_role carry the account id
+        account = (aws_access_key_id or 'ASIA000000000000').split('-')[-1]
+        return FakeClient(self, service, account, region_name or 'us-east-1')
+
+    def op_assume_role(self, client, RoleArn, **kwargs):
+        account = RoleArn.split(':')[4]
+        return {'Credentials': {
+            'AccessKeyId': f"ASIA-{account}", 'SecretAccessKey': 'secret', 'SessionToken': 'token',
+            'Expiration': datetime.now(timezone.utc) + timedelta(hours=1),
+        }}
+
+    def op_start_instances(self, client, InstanceIds, **kwargs):
+        return self._set_instance_state(client, InstanceIds, 'running', 'StartingInstances')
+
+    def op_stop_instances(self, client, InstanceIds, **kwargs):
+        return self._set_instance_state(client, InstanceIds, 'stopped', 'StoppingInstances')
+
+    def _set_instance_state(self, client, instance_ids, state, key):
+        changes = []
+        with client.inventory.lock:
+            for i in client.inventory.instances:
+                if i['InstanceId'] in instance_ids:
+                    changes.append({'InstanceId': i['InstanceId'], 'PreviousState': dict(i['State']), 'CurrentState': {'Name': state}})
+                    i['State'] = {'Name': state}
+            client.inventory.trail.append({
+                'EventId': f"ev-{len(client.inventory.trail)}", 'EventSource': 'ec2.amazonaws.com',
+                'EventName': 'StartInstances' if state == 'running' else 'StopInstances',
+                'EventTime': datetime.now(timezone.utc),
+            })
+        return {key: changes}
+
+    def op_start_db_instance(self, client, DBInstanceIdentifier, **kwargs):
+        return self._set_db_state(client, DBInstanceIdentifier, 'available')
+
+    def op_stop_db_instance(self, client, DBInstanceIdentifier, **kwargs):
+        return self._set_db_state(client, DBInstanceIdentifier, 'stopped')
+
+    def _set_db_state(self, client, db_id, state):
+        with client.inventory.lock:
+            for db in client.inventory.databases:
+                if db['DBInstanceIdentifier'] == db_id:
+                    db['DBInstanceStatus'] = state
+                    client.inventory.db_events.append({
+                        'SourceIdentifier': db_id, 'SourceType': 'db-instance',
+                        'Message': f"DB instance {state}", 'Date': datetime.now(timezone.utc),
+                    })
+                    return {'DBInstance': db}
+        raise ClientError({'Error': {'Code': 'DBInstanceNotFound', 'Message': f"{db_id} not found"}}, 'StopDBInstance')
+
+    def op_lookup_events(self, client, StartTime, **kwargs):
+        with client.inventory.lock:
+            return {'Events': [e for e in reversed(client.inventory.trail) if e['EventTime'] >= StartTime]}
+
+    def op_describe_events(self, client, StartTime, **kwargs):
+        with client.inventory.lock:
+            return {'Events': [e for e in client.inventory.db_events if e['Date'] >= StartTime]}
+
+    def op_describe_stacks(self, client, StackName=None, **kwargs):
+        stacks = [s for s in client.inventory.stacks if StackName in (None, s['StackName'], s['StackId'])]
+        if not stacks:
+            raise ClientError({'Error': {'Code': 'ValidationError', 'Message': f"Stack {StackName} does not exist"}}, 'DescribeStacks')
+        return {'Stacks': stacks}
+
+    def op_describe_stack_events(self, client, StackName, **kwargs):
+        stack = next(s for s in client.inventory.stacks if StackName in (s['StackName'], s['StackId']))
+        return {'StackEvents': [{
+            'EventId': f"{stack['StackName']}-0", 'StackName': stack['StackName'], 'LogicalResourceId': stack['StackName'],
+            'PhysicalResourceId': stack['StackId'],
+            'ResourceType': 'AWS::CloudFormation::Stack', 'ResourceStatus': stack['StackStatus'],
+            'Timestamp': stack['LastUpdatedTime'],
+        }]}
+
+    def op_get_function_configuration(self, client, FunctionName, **kwargs):
+        fn = next((f for f in client.inventory.functions if f['FunctionName'] == FunctionName), None)
+        if fn is None:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Function not found'}}, 'GetFunctionConfiguration')
+        return fn
+
+    def op_head_bucket(self, client, Bucket, **kwargs):
+        return {}
+
+    def op_get_bucket_location(self, client, Bucket, **kwargs):
+        return {'LocationConstraint': None if client.region == 'us-east-1' else client.region}
+
+    def op_get_metric_data(self, client, MetricDataQueries, StartTime, EndTime, **kwargs):
+        results = []
+        for q in MetricDataQueries:
+            period = q['MetricStat']['Period']
+            points = min(int((EndTime - StartTime).total_seconds() // period), MAX_METRIC_POINTS)
+            rng = random.Random(zlib.crc32(repr(q['MetricStat']['Metric']).encode()))
+            base = rng.uniform(1, 80)
+            results.append({
+                'Id': q['Id'],
+                'Timestamps': [EndTime - timedelta(seconds=period * (n + 1)) for n in range(points)],
+                'Values': [max(0.0, base + rng.gauss(0, base / 5)) for _ in range(points)],
+                'StatusCode': 'Complete',
+            })
+        return {'MetricDataResults': results}
+
+    def op_get_metric_statistics(self, client, StartTime, EndTime, Period, Statistics, **kwargs):
+        points = min(int((EndTime - StartTime).total_seconds() // Period), MAX_METRIC_POINTS)
+        return {'Datapoints': [
+            {'Timestamp': EndTime - timedelta(seconds=Period * (n + 1)), stat: random.uniform(1, 1e9), 'Unit': 'None'}
+            for n in range(points) for stat in Statistics
+        ]}
+
+    def op_get_cost_and_usage(self, client, TimePeriod, Granularity, **kwargs):
+        start = datetime.fromisoformat(TimePeriod['Start']).date()
+        end = datetime.fromisoformat(TimePeriod['End']).date()
+        rng = random.Random(zlib.crc32(client.account.encode()))
+        days = [start + timedelta(days=n) for n in range((end - start).days)] if Granularity == 'DAILY' else [start]
+        span = 1 if Granularity == 'DAILY' else max((end - start).days, 1)
+        results = []
+        for day in days:
+            groups = [
+                {'Keys': [service], 'Metrics': {'UnblendedCost': {'Amount': f"{cost * span * rng.uniform(0.8, 1.2):.4f}", 'Unit': 'USD'}}}
+                for service, cost in SERVICES_BY_COST
+            ]
+            total = sum(float(g['Metrics']['UnblendedCost']['Amount']) for g in groups)
+            results.append({
+                'TimePeriod': {'Start': day.isoformat(), 'End': (day + timedelta(days=span)).isoformat()},
+                'Groups': groups if kwargs.get('GroupBy') else [],
+                'Total': {'UnblendedCost': {'Amount': f"{total:.4f}", 'Unit': 'USD'}},
+            })
+        return {'ResultsByTime': results}
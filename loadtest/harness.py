@@ -0,0 +1,428 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+import discord
+from app import aws_clients
+from app.loop_monitor import loop_monitor, percentile
+from app.scheduler import scheduler
+from loadtest.aws_standin import AwsStandIn, LatencyModel
+from commands.alerts import register_alert_commands
+from commands.onboarding import register_onboarding_events
+from commands.misc_commands import register_misc_commands
+from commands.region_commands import register_region_commands
+from commands.role_commands import register_role_commands
+from commands.ec2_commands import register_ec2_commands
+from commands.rds_commands import register_rds_commands
+from commands.s3_commands import register_s3_commands
+from commands.lambda_commands import register_lambda_commands
+from commands.cf_commands import register_cf_commands
+from commands.ebs_commands import register_ebs_commands
+from commands.network_commands import register_network_commands
+from commands.billing_commands import register_billing_commands
+from commands.tag_commands import register_tag_commands
+from commands.feed_commands import register_feed_commands
+from commands.digest_commands import register_digest_commands
+
+REGISTER = [
+    register_onboarding_events, register_misc_commands, register_region_commands, register_role_commands,
+    register_ec2_commands, register_rds_commands, register_s3_commands, register_lambda_commands,
+    register_cf_commands, register_ebs_commands, register_network_commands, register_billing_commands,
+    register_tag_commands, register_feed_commands, register_digest_commands, register_alert_commands,
+]
+REGIONS = ['us-east-1', 'eu-west-1']
+# Commands that use red for a successful result (exposed rules found, instance stopped)
+RED_RESULTS = {'sg-exposure', 'ec2-stop'}
+ERROR_MARKERS = ('Error', 'busy', 'queue is full')
+
+# (command, weight, options builder) - options are drawn from the guild's stand-in inventory
+COMMAND_MIX = [
+    ('ec2-list', 10, lambda g, rng: {}),
+    ('ebs-list', 5, lambda g, rng: {}),
+    ('rds-list', 5, lambda g, rng: {}),
+    ('cf-list', 5, lambda g, rng: {'status': rng.choice(['all', 'failed', 'in_progress'])}),
+    ('cf-describe', 3, lambda g, rng: {'stack_name': f"stack-{rng.randrange(g.sizes['stacks'])}"}),
+    ('lambda-list', 5, lambda g, rng: {}),
+    ('lambda-fleet', 3, lambda g, rng: {'window': rng.choice(['1h', '1d'])}),
+    ('s3-list', 4, lambda g, rng: {}),
+    ('ec2-metrics', 6, lambda g, rng: {'name': f"app-{rng.randrange(g.sizes['instances'])}", 'window': rng.choice(['1h', '6h', '1d'])}),
+    ('rds-metrics', 3, lambda g, rng: {'db_id': f"db-{rng.randrange(g.sizes['databases'])}"}),
+    ('lambda-metrics', 3, lambda g, rng: {'function_name': f"fn-{rng.randrange(g.sizes['functions'])}"}),
+    ('network-status', 3, lambda g, rng: {}),
+    ('sg-exposure', 3, lambda g, rng: {}),
+    ('route-lookup', 2, lambda g, rng: {'subnet': g.subnet_id, 'ip': '8.8.8.8'}),
+    ('tag-query', 4, lambda g, rng: {'query': rng.choice(['env=prod', 'env=dev OR env=staging', 'env=* !env=prod'])}),
+    ('ebs-report', 2, lambda g, rng: {}),
+    ('billing-summary', 3, lambda g, rng: {}),
+    ('cost-forecast', 2, lambda g, rng: {}),
+    ('digest-now', 1, lambda g, rng: {}),
+    ('ec2-start', 1, lambda g, rng: {'name': f"app-{rng.randrange(g.sizes['instances'])}"}),
+    ('ec2-stop', 1, lambda g, rng: {'name': f"app-{rng.randrange(g.sizes['instances'])}"}),
+    ('view-role', 2, lambda g, rng: {}),
+    ('view-region', 2, lambda g, rng: {}),
+]
+
+ids = itertools.count(10 ** 17)
+
+
+class SimRole:
+    def __init__(self, role_id):
+        self.id = role_id
+
+
+class SimMember:
+    def __init__(self, member_id, roles):
+        self.id = member_id
+        self.roles = roles
+        self.mention = f"<@{member_id}>"
+
+
+class SimMessage:
+    def __init__(self, channel):
+        self.id = next(ids)
+        self.channel = channel
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{self.id}"
+
+    async def edit(self, **kwargs):
+        self.channel.edits += 1
+        return self
+
+    async def pin(self):
+        return None
+
+
+class SimChannel:
+    def __init__(self, guild):
+        self.id = next(ids)
+        self.guild = guild
+        self.name = "cloud-commander"
+        self.sent = 0
+        self.edits = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return SimMessage(self)
+
+
+class SimGuild:
+    def __init__(self, index, account, region, sizes, users):
+        self.id = next(ids)
+        self.index = index
+        self.account = account
+        self.region = region
+        self.sizes = sizes
+        self.admin_role = SimRole(next(ids))
+        self.channel = SimChannel(self)
+        self.text_channels = [self.channel]
+        self.members = [SimMember(next(ids), [self.admin_role]) for _ in range(users)]
+        self.roles = [self.admin_role]
+        self.subnet_id = None
+
+    @property
+    def role_arn(self):
+        return f"arn:aws:iam::{self.account}:role/CloudCommander"
+
+    def get_role(self, role_id):
+        return self.admin_role if role_id == self.admin_role.id else None
+
+    def config(self):
+        return {
+            "designated_channel": str(self.channel.id),
+            "admin_role_id": str(self.admin_role.id),
+            str(self.channel.id): {
+                str(m.id): {"roles": [self.role_arn], "region": self.region} for m in self.members
+            },
+        }
+
+
+class SimResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.interaction.acknowledged()
+
+    async def send_message(self, content=None, embed=None, **kwargs):
+        self.interaction.acknowledged()
+        self.interaction.replied(embed)
+
+
+class SimFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, embeds=None, **kwargs):
+        self.interaction.replied(embed or (embeds[0] if embeds else None))
+        return SimMessage(self.interaction.channel)
+
+
+class SimInteraction:
+    def __init__(self, guild, member, command):
+        self.id = next(ids)
+        self.command = command
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = guild.channel
+        self.channel_id = guild.channel.id
+        self.user = member
+        self.response = SimResponse(self)
+        self.followup = SimFollowup(self)
+        self.started = time.perf_counter()
+        self.ack_latency = None
+        self.reply_latency = None
+        self.error = None
+
+    def acknowledged(self):
+        self.response.done = True
+        if self.ack_latency is None:
+            self.ack_latency = time.perf_counter() - self.started
+
+    def replied(self, embed):
+        if self.reply_latency is None:
+            self.reply_latency = time.perf_counter() - self.started
+        if embed is None or embed.color != discord.Color.red() or self.error is not None:
+            return
+        text = (embed.description or embed.title or "").strip()
+        if self.command not in RED_RESULTS or any(m in text for m in ERROR_MARKERS):
+            self.error = text
+
+
+# Collects the slash commands and events the real register_* functions declare, without a gateway connection
+class SimBot:
+    def __init__(self):
+        self.commands = {}
+        self.listeners = {}
+        self.channels = {}
+        self.guilds = {}
+        self.user = SimMember(next(ids), [])
+
+    def slash_command(self, name=None, description=None, **kwargs):
+        def decorator(func):
+            self.commands[name or func.__name__] = func
+            return func
+        return decorator
+
+    def event(self, func):
+        self.listeners.setdefault(func.__name__, []).append(func)
+        return func
+
+    def add_listener(self, func, name=None):
+        self.listeners.setdefault(name or func.__name__, []).append(func)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(int(channel_id))
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(int(guild_id))
+
+    async def dispatch(self, event):
+        for listener in self.listeners.get(event, []):
+            await listener()
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def open_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+class Window:
+    def __init__(self):
+        self.latencies = []
+        self.acks = []
+        self.ok = 0
+        self.errors = 0
+        self.crashed = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+
+class SoakTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.model = LatencyModel(args.latency_ms, args.jitter_ms, args.throttle, args.error_rate)
+        self.sizes = {
+            'instances': args.instances, 'volumes': args.volumes, 'functions': args.functions,
+            'databases': args.databases, 'stacks': args.stacks, 'buckets': args.buckets,
+        }
+        self.standin = AwsStandIn(self.model, self.sizes)
+        self.bot = SimBot()
+        self.guilds = []
+        self.window = Window()
+        self.per_command = {}
+        self.error_messages = {}
+        self.inflight = set()
+        self.totals = {'ok': 0, 'errors': 0, 'crashed': 0, 'rejected': 0}
+        self.mix = [(name, build) for name, weight, build in COMMAND_MIX for _ in range(weight)]
+        self.out = open(args.out, 'a') if args.out else None
+
+    def setup(self):
+        os.makedirs(self.args.workdir, exist_ok=True)
+        os.chdir(self.args.workdir)
+        aws_clients._session = self.standin
+        accounts = [f"{100000000000 + n}" for n in range(self.args.accounts or max(1, self.args.guilds // 2))]
+        roles = {}
+        now = datetime.now(timezone.utc)
+        for index in range(self.args.guilds):
+            guild = SimGuild(index, accounts[index % len(accounts)], REGIONS[index % len(REGIONS)], self.sizes, self.args.users)
+            guild.subnet_id = self.standin.inventory(guild.account, guild.region).subnets[0]['SubnetId']
+            config = guild.config()
+            member = str(guild.members[0].id)
+            if self.rng.random() < self.args.feed_share:
+                config["change_feed"] = {"channel_id": str(guild.channel.id), "user_id": member}
+            if self.rng.random() < self.args.digest_share:
+                at = now + timedelta(seconds=self.rng.uniform(0, self.args.duration))
+                config["digest"] = {"channel_id": str(guild.channel.id), "user_id": member, "time": at.strftime('%H:%M')}
+            roles[str(guild.id)] = config
+            self.guilds.append(guild)
+            self.bot.guilds[guild.id] = guild
+            self.bot.channels[guild.channel.id] = guild.channel
+        with open("roles.json", "w") as f:
+            json.dump(roles, f, indent=4)
+        for register in REGISTER:
+            register(self.bot)
+
+    def pick_guild(self):
+        if self.args.hot_share and self.rng.random() < self.args.hot_share:
+            return self.guilds[0]
+        return self.rng.choice(self.guilds)
+
+    async def invoke(self, guild, name, options):
+        interaction = SimInteraction(guild, self.rng.choice(guild.members), name)
+        crashed = False
+        try:
+            await self.bot.commands[name](interaction, **options)
+        except Exception as e:
+            crashed = True
+            interaction.error = f"{type(e).__name__}: {e}"
+            print(f"{name} raised {interaction.error}")
+        latency = time.perf_counter() - interaction.started
+        w = self.window
+        w.latencies.append(latency)
+        if interaction.ack_latency is not None:
+            w.acks.append(interaction.ack_latency)
+        stats = self.per_command.setdefault(name, {'latencies': [], 'errors': 0})
+        stats['latencies'].append(latency)
+        if interaction.error is not None:
+            stats['errors'] += 1
+            key = (name, interaction.error[:120])
+            self.error_messages[key] = self.error_messages.get(key, 0) + 1
+        if crashed:
+            w.crashed += 1
+        elif interaction.error is not None:
+            w.errors += 1
+        else:
+            w.ok += 1
+
+    async def traffic(self, until):
+        while time.monotonic() < until:
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+            if len(self.inflight) >= self.args.max_inflight:
+                self.window.rejected += 1
+                continue
+            guild = self.pick_guild()
+            name, build = self.rng.choice(self.mix)
+            task = asyncio.create_task(self.invoke(guild, name, build(guild, self.rng)))
+            self.inflight.add(task)
+            task.add_done_callback(self.inflight.discard)
+
+    def report(self, elapsed, rss_start, rss_previous):
+        w, self.window = self.window, Window()
+        seconds = max(time.monotonic() - w.started, 1e-9)
+        latencies, acks = sorted(w.latencies), sorted(w.acks)
+        loop = loop_monitor.stats(since=w.started)
+        rss = rss_bytes()
+        for key in self.totals:
+            self.totals[key] += getattr(w, key)
+        row = {
+            'elapsed': round(elapsed, 1),
+            'throughput': round(len(latencies) / seconds, 2),
+            'ok': w.ok, 'errors': w.errors, 'crashed': w.crashed, 'rejected': w.rejected,
+            'inflight': len(self.inflight),
+            'latency_p50': percentile(latencies, 50), 'latency_p95': percentile(latencies, 95),
+            'latency_p99': percentile(latencies, 99), 'latency_max': latencies[-1] if latencies else 0.0,
+            'ack_p99': percentile(acks, 99), 'ack_max': acks[-1] if acks else 0.0,
+            'loop_lag_p50': loop['lag_p50'], 'loop_lag_p95': loop['lag_p95'],
+            'loop_lag_p99': loop['lag_p99'], 'loop_lag_max': loop['lag_max'],
+            'loop_blocked': loop['blocked'], 'loop_blocked_seconds': loop['blocked_seconds'],
+            'loop_blockers': loop['top_blockers'],
+            'rss_mb': round(rss / 2 ** 20, 1), 'rss_growth_mb': round((rss - rss_start) / 2 ** 20, 1),
+            'fds': open_fds(), 'tasks': len(asyncio.all_tasks()),
+            'aws_calls': self.model.calls, 'aws_throttled': self.model.throttled,
+            'scheduler': scheduler.stats(),
+        }
+        print(
+            f"[{row['elapsed']:>7.0f}s] {row['throughput']:6.1f} cmd/s  ok {w.ok} err {w.errors} crash {w.crashed} rej {w.rejected} | "
+            f"p50 {row['latency_p50'] * 1000:.0f}ms p95 {row['latency_p95'] * 1000:.0f}ms p99 {row['latency_p99'] * 1000:.0f}ms "
+            f"max {row['latency_max']:.1f}s | ack p99 {row['ack_p99'] * 1000:.0f}ms | "
+            f"lag p99 {row['loop_lag_p99'] * 1000:.1f}ms max {row['loop_lag_max'] * 1000:.0f}ms blocked {loop['blocked']} | "
+            f"rss {row['rss_mb']}MB ({(rss - rss_previous) / 2 ** 20:+.1f}) fds {row['fds']} tasks {row['tasks']} | "
+            f"aws {self.model.calls} calls {self.model.throttled} throttled | queued {row['scheduler']['queued']}"
+        )
+        if self.out:
+            self.out.write(json.dumps(row) + "\n")
+            self.out.flush()
+        return rss
+
+    def summary(self):
+        print(f"\nTotals: {self.totals}")
+        print(f"{'command':<18}{'count':>8}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        rows = []
+        for name, stats in self.per_command.items():
+            latencies = sorted(stats['latencies'])
+            rows.append((percentile(latencies, 99), name, len(latencies), stats['errors'], percentile(latencies, 50), percentile(latencies, 95)))
+        for p99, name, count, errors, p50, p95 in sorted(rows, reverse=True):
+            print(f"{name:<18}{count:>8}{errors:>8}{p50 * 1000:>9.0f}{p95 * 1000:>9.0f}{p99 * 1000:>9.0f}")
+        blockers = loop_monitor.stats()['top_blockers']
+        if blockers:
+            print("\nEvent loop blocked by:")
+            for b in blockers:
+                print(f"  {b['count']:>6}x  {b['seconds']:.2f}s total, max {b['max'] * 1000:.0f}ms  {b['culprit']}")
+                print("".join(f"          {line}\n" for line in loop_monitor.stack(b['culprit']).splitlines()), end="")
+        if self.error_messages:
+            print("\nMost common error replies:")
+            for (name, message), count in sorted(self.error_messages.items(), key=lambda e: -e[1])[:10]:
+                print(f"  {count:>6}  {name}: {message}")
+
+    async def run(self):
+        if self.args.tracemalloc:
+            tracemalloc.start(10)
+        self.setup()
+        await self.bot.dispatch("on_ready")
+        start = time.monotonic()
+        until = start + self.args.duration
+        traffic_task = asyncio.create_task(self.traffic(until))
+        baseline = tracemalloc.take_snapshot() if self.args.tracemalloc else None
+        rss_start = rss_previous = rss_bytes()
+        while time.monotonic() < until:
+            await asyncio.sleep(min(self.args.interval, max(until - time.monotonic(), 0)))
+            rss_previous = self.report(time.monotonic() - start, rss_start, rss_previous)
+        await traffic_task
+        if self.inflight:
+            await asyncio.wait(self.inflight, timeout=self.args.drain)
+        self.report(time.monotonic() - start, rss_start, rss_previous)
+        self.summary()
+        if baseline is not None:
+            print("\nTop allocation growth since start:")
+            for stat in tracemalloc.take_snapshot().compare_to(baseline, 'lineno')[:10]:
+                print(f"  {stat}")
+        if self.out:
+            self.out.close()
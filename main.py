@@ -16,6 +16,9 @@ from commands.cf_commands import register_cf_commands
 from commands.ebs_commands import register_ebs_commands
 from commands.network_commands import register_network_commands
 from commands.billing_commands import register_billing_commands
+from commands.tag_commands import register_tag_commands
+from commands.feed_commands import register_feed_commands
+from commands.digest_commands import register_digest_commands
 
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
@@ -41,6 +44,9 @@ register_cf_commands(bot)
 register_ebs_commands(bot)
 register_network_commands(bot)
 register_billing_commands(bot)
+register_tag_commands(bot)
+register_feed_commands(bot)
+register_digest_commands(bot)
 register_alert_commands(bot)
 
 if __name__ == "__main__":